@@ -43,7 +43,11 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
-    'django.middleware.gzip.GZipMiddleware',  # Add this at the top
+    # Outermost, so that it times the whole middleware stack
+    'merlinapp.metrics.MetricsMiddleware',
+    # Outside the rest of the stack, so that it compresses the final response
+    # body; it leaves Server-Sent Event streams alone
+    'merlinapp.middleware.GZipMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -86,6 +90,24 @@ DATABASES = {
     }
 }
 
+# Applied to every new SQLite connection (merlinapp.db.configure_sqlite).
+# journal_mode is stored in the database file, so it is only applied to a
+# new, empty database; switch an existing one with
+# `sqlite3 db.sqlite3 "PRAGMA journal_mode = WAL"`.
+# WAL lets reads run alongside the writer, and NORMAL sync is durable in WAL
+# mode except on power loss. Writers wait up to busy_timeout ms for the lock
+# instead of failing with "database is locked".
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 5000,
+    'mmap_size': 268435456,  # 256 MB
+    'cache_size': -65536,  # 64 MB (negative is in KiB)
+    'temp_store': 'MEMORY',
+}
+# Queue the write transactions of a process on a lock (merlinapp.db.atomic_write)
+SQLITE_SERIALIZE_WRITES = False
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -205,4 +227,80 @@ LOGGING = {
             'propagate': True,
         },
     },
-}
\ No newline at end of file
+}
+
+# Google Sheets sync settings
+# 'google' talks to the real sheet; 'fake' uses the in-process fake in
+# merlinapp.fake_sheets (no network or credentials needed)
+SHEETS_BACKEND = 'google'
+# Fake backend only: seconds of latency per call and per-minute call quotas
+# (None means unlimited); exceeding a quota raises a 429 APIError
+FAKE_SHEETS_LATENCY = 0.0
+FAKE_SHEETS_READ_QUOTA = None
+FAKE_SHEETS_WRITE_QUOTA = None
+
+# Every Sheets API call waits for a token from a per-minute read or write
+# budget (Google's default per-user quota is 60 of each); calls that are
+# still throttled are retried with jittered exponential backoff
+SHEETS_READS_PER_MINUTE = 60
+SHEETS_WRITES_PER_MINUTE = 60
+SHEETS_MAX_RETRIES = 5
+SHEETS_BACKOFF_BASE = 1.0
+SHEETS_BACKOFF_MAX = 32.0
+
+# Write endpoints queue sheet writes in an outbox that is drained in batches
+# by merlinapp.tasks.drain_sheet_sync_outbox or `manage.py drain_sheet_outbox --loop`
+SHEET_OUTBOX_BATCH_SIZE = 100
+# Changes to the same MAWB are merged into one row write once the MAWB has
+# been quiet for this many seconds (0 pushes every change as soon as possible)
+SHEET_SYNC_COALESCE_SECONDS = 5
+# ...but no change waits longer than this
+SHEET_SYNC_MAX_DELAY_SECONDS = 30
+# A MAWB whose write fails is retried after 2s, 4s, 8s, ... (at most 300s).
+# Entries that still fail after SHEET_SYNC_MAX_ATTEMPTS are set aside (failed_at)
+# for an operator to retry from the admin; API outages never set entries aside
+SHEET_SYNC_RETRY_BASE_SECONDS = 2
+SHEET_SYNC_RETRY_MAX_SECONDS = 300
+SHEET_SYNC_MAX_ATTEMPTS = 8
+# Processed entries are deleted after this long (merlinapp.tasks.prune_sheet_sync_outbox)
+SHEET_OUTBOX_RETENTION_HOURS = 24
+
+# Startup does no network I/O. Set this to build the Sheets client and the
+# MAWB row index in a background thread shortly after a web server process
+# starts (never in management commands or Celery workers). Web server
+# processes log the time from startup to their first request.
+SHEETS_WARMUP_ON_STARTUP = False
+SHEETS_WARMUP_DELAY_SECONDS = 1.0
+
+# Upstream flight feeds (merlinapp.upstream)
+# 'local' generates flights in-process like the /api/redwatch/ and
+# /api/smartkargo/ stubs; 'http' fetches them from the URLs below
+UPSTREAM_BACKEND = 'local'
+REDWATCH_FEED_URL = 'http://localhost:8000/api/redwatch/'
+SMARTKARGO_FEED_URL = 'http://localhost:8000/api/smartkargo/'
+# (connect, read) timeouts in seconds and pooled connections per host
+UPSTREAM_TIMEOUT = (3.05, 10)
+UPSTREAM_POOL_SIZE = 10
+# Flights fetched per merge_data call / scheduled_data_merge run
+UPSTREAM_FLIGHTS_PER_POLL = 100
+
+# Delta sync (/api/sync/, merlinapp.sync)
+# Changes younger than this are held back for the next sync, so that a
+# write still committing is not skipped by an earlier watermark
+SYNC_SETTLE_SECONDS = 2
+# Tombstones of deleted records are kept this long; a client whose
+# watermark is older gets a full snapshot instead
+SYNC_TOMBSTONE_RETENTION_DAYS = 7
+
+# Server push (/api/async/events/, merlinapp.push)
+# Events queued per connected screen before it is sent "reset" and dropped
+PUSH_MAX_PENDING_EVENTS = 100
+PUSH_KEEPALIVE_SECONDS = 15
+# Streams are closed after this long and reconnected by the client, so the
+# connections of screens that went away without closing do not pile up
+PUSH_MAX_STREAM_SECONDS = 300
+PUSH_RETRY_MILLISECONDS = 2000
+
+# Request metrics (/api/metrics/, merlinapp.metrics)
+# Send each request's database and Sheets time in a Server-Timing header
+METRICS_DEBUG_HEADER = DEBUG
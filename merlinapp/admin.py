@@ -1,7 +1,35 @@
 from django.contrib import admin
-from .models import FlightRecord
+from .models import FlightRecord, FlightSummary, RecordTombstone, ScanEvent, SheetSyncEntry
 
 @admin.register(FlightRecord)
 class FlightRecordAdmin(admin.ModelAdmin):
     list_display = ('mawb', 'flight_number', 'pcs_awb', 'pcs_received', 'discrepancy')
     search_fields = ('mawb', 'flight_number')
+
+@admin.register(SheetSyncEntry)
+class SheetSyncEntryAdmin(admin.ModelAdmin):
+    list_display = ('mawb', 'created_at', 'processed_at', 'attempts', 'retry_at', 'failed_at', 'last_error')
+    list_filter = ('processed_at', 'failed_at')
+    search_fields = ('mawb',)
+    actions = ['retry_entries']
+
+    @admin.action(description="Retry selected entries now")
+    def retry_entries(self, request, queryset):
+        retried = queryset.filter(processed_at__isnull=True).update(attempts=0, retry_at=None, failed_at=None)
+        self.message_user(request, f"{retried} entries will be retried on the next drain.")
+
+@admin.register(ScanEvent)
+class ScanEventAdmin(admin.ModelAdmin):
+    list_display = ('mawb', 'kind', 'staff_id', 'team_name', 'pcs_received', 'bt_number', 'occurred_at')
+    list_filter = ('kind',)
+    search_fields = ('mawb', 'staff_id', 'team_name')
+
+@admin.register(FlightSummary)
+class FlightSummaryAdmin(admin.ModelAdmin):
+    list_display = ('flight_number', 'awb_count', 'pcs_expected', 'pcs_received', 'open_discrepancies', 'towing_started', 'updated_at')
+    search_fields = ('flight_number',)
+
+@admin.register(RecordTombstone)
+class RecordTombstoneAdmin(admin.ModelAdmin):
+    list_display = ('mawb', 'deleted_at')
+    search_fields = ('mawb',)
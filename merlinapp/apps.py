@@ -1,4 +1,14 @@
+import os
+import sys
+import threading
+import time
+
 from django.apps import AppConfig
+from django.conf import settings
+from django.core.signals import request_started
+
+# When Django started loading the app registry in this process
+STARTED = time.monotonic()
 
 
 class MerlinappConfig(AppConfig):
@@ -8,13 +18,40 @@ class MerlinappConfig(AppConfig):
     def ready(self):
         """
         This method is called when the application is ready.
-        We'll use it to initialize our Google Sheet with data if needed.
+        Startup does no network I/O: seed the sheet explicitly with
+        `manage.py seed_dummy_data`. In web server processes, the time to the
+        first request is logged, and if SHEETS_WARMUP_ON_STARTUP is set, the
+        Sheets client and row index are built in a background thread.
         """
-        # Import here to avoid circular imports
-        from .utils import populate_sheet_with_dummy_data
+        from . import signals  # noqa: F401
         
-        # Populate the sheet with dummy data
-        # Only in non-testing environments
-        import sys
+        if not self._serves_requests():
+            return
+        request_started.connect(log_first_request, dispatch_uid='merlinapp.log_first_request')
+        
+        if getattr(settings, 'SHEETS_WARMUP_ON_STARTUP', False):
+            # Import here to avoid circular imports
+            from .utils import warm_up_google_sheets
+            
+            delay = getattr(settings, 'SHEETS_WARMUP_DELAY_SECONDS', 1.0)
+            timer = threading.Timer(delay, warm_up_google_sheets)
+            timer.daemon = True
+            timer.start()
+    
+    @staticmethod
+    def _serves_requests():
+        """
+        True in web server processes: runserver (but not its autoreloader
+        parent), and WSGI/ASGI servers, which set Django up while importing
+        merlin.wsgi or merlin.asgi. False for management commands, Celery
+        workers and shells.
+        """
         if 'runserver' in sys.argv:
-            populate_sheet_with_dummy_data()
+            return os.environ.get('RUN_MAIN') == 'true' or '--noreload' in sys.argv
+        return any(module in sys.modules for module in ('merlin.wsgi', 'merlin.asgi'))
+
+
+def log_first_request(sender, **kwargs):
+    """Logs how long after startup the process got its first request, once."""
+    if request_started.disconnect(dispatch_uid='merlinapp.log_first_request'):
+        print(f"First request {time.monotonic() - STARTED:.2f}s after startup (pid {os.getpid()})")
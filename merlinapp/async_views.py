@@ -0,0 +1,244 @@
+"""
+Async variants of the hot scanner endpoints, served under /api/async/.
+
+These are plain Django async views. Under ASGI (merlin/asgi.py) one worker
+process can keep hundreds of scans in flight, whereas each WSGI request
+holds a worker thread. They reach the database through the async ORM.
+Sheet writes go through the outbox, so the request path makes no Google
+API calls. The one exception is the rare fallback for a MAWB that has not
+been imported yet, which runs in a worker thread. Request and response
+bodies match the DRF views in merlinapp.views.
+
+/api/async/events/ has no sync variant: it keeps a connection open per
+screen and pushes record changes to it (merlinapp.push).
+"""
+import json
+import logging
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.http import JsonResponse, StreamingHttpResponse
+from rest_framework.exceptions import Throttled
+from rest_framework.settings import api_settings
+
+from .models import FlightRecord
+from .push import event_stream
+from .serializers import FlightRecordSerializer
+from .sheet_import import fetch_record_from_sheet
+from .suggestions import get_mawb_index, mawb_index
+from .utils import handle_sheets_error
+from .views import arrival_window_filters, parse_limit, save_bt_number, save_received
+
+logger = logging.getLogger(__name__)
+
+
+def throttled_response(request):
+    """
+    Runs DRF's DEFAULT_THROTTLE_CLASSES on a plain Django request, as
+    APIView does, and returns DRF's 429 response if one of them refuses it.
+    The throttles use the cache and may load the user, so call it from a
+    worker thread.
+    """
+    throttles = [throttle_class() for throttle_class in api_settings.DEFAULT_THROTTLE_CLASSES]
+    refused = [throttle for throttle in throttles if not throttle.allow_request(request, None)]
+    if not refused:
+        return None
+    waits = [wait for wait in (throttle.wait() for throttle in refused) if wait is not None]
+    throttled = Throttled(max(waits, default=None))
+    response = JsonResponse({"detail": str(throttled.detail)}, status=throttled.status_code)
+    if throttled.wait is not None:
+        response["Retry-After"] = str(throttled.wait)
+    return response
+
+
+def async_api_view(methods):
+    """
+    Restricts an async view to `methods`, applies DRF's default throttles
+    (sharing their counters with the sync views) and exempts it from CSRF
+    checks, like DRF's @api_view. Django's own decorators wrap async views
+    in a sync function, so they cannot be used here.
+    """
+    def decorator(view):
+        @wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            throttled = await sync_to_async(throttled_response)(request)
+            if throttled is not None:
+                return throttled
+            if request.method not in methods:
+                return JsonResponse({"detail": f'Method "{request.method}" not allowed.'}, status=405)
+            return await view(request, *args, **kwargs)
+        wrapper.csrf_exempt = True
+        return wrapper
+    return decorator
+
+
+def parse_json(request):
+    """Returns the JSON object in the request body. Raises ValueError if there is none."""
+    try:
+        data = json.loads(request.body or b"{}")
+    except (ValueError, UnicodeDecodeError):
+        raise ValueError("Invalid JSON body")
+    if not isinstance(data, dict):
+        raise ValueError("Expected a JSON object")
+    return data
+
+
+async def find_record(mawb):
+    """
+    Returns the FlightRecord for a MAWB, falling back to an unsaved record
+    built from its sheet row, or None if neither has it.
+    """
+    record = await FlightRecord.objects.filter(mawb=mawb).afirst()
+    if record is None:
+        record = await sync_to_async(fetch_record_from_sheet, thread_sensitive=False)(mawb)
+    return record
+
+
+@async_api_view(['POST'])
+async def update_received(request):
+    """Async variant of views.update_received."""
+    try:
+        data = parse_json(request)
+    except ValueError as e:
+        return JsonResponse({"error": str(e)}, status=400)
+    mawb = data.get("mawb")
+    pcs_received = data.get("pcs_received")
+
+    if not mawb or pcs_received is None:
+        return JsonResponse({"error": "Missing mawb or pcs_received"}, status=400)
+
+    try:
+        pcs_received = int(pcs_received)
+    except (ValueError, TypeError):
+        return JsonResponse({"error": "pcs_received must be a number"}, status=400)
+
+    try:
+        record = await find_record(mawb)
+        if record is None:
+            return JsonResponse({"error": f"MAWB {mawb} not found in records"}, status=404)
+
+        # The save and the outbox insert share a transaction, which needs one thread
+        await sync_to_async(save_received)(record, pcs_received, data.get("checker_id", ""), data.get("team_name", ""))
+        return JsonResponse({"status": "success", "data": FlightRecordSerializer(record).data})
+    except Exception as e:
+        message = await sync_to_async(handle_sheets_error)(e)
+        if message:
+            return JsonResponse({"error": message}, status=503)
+        logger.exception(f"Error updating record: {e}")
+        return JsonResponse({"error": str(e)}, status=500)
+
+
+@async_api_view(['POST'])
+async def update_bt_number(request):
+    """Async variant of views.update_bt_number."""
+    try:
+        data = parse_json(request)
+    except ValueError as e:
+        return JsonResponse({"error": str(e)}, status=400)
+    mawb = data.get("mawb")
+    bt_number = data.get("bt_number")
+
+    if not mawb or not bt_number:
+        return JsonResponse({"error": "Missing mawb or bt_number"}, status=400)
+
+    try:
+        record = await find_record(mawb)
+        if record is None:
+            return JsonResponse({"error": f"MAWB {mawb} not found in records"}, status=404)
+
+        timestamp_start = await sync_to_async(save_bt_number)(record, bt_number, data.get("employee_id", ""))
+        return JsonResponse({
+            "status": "success",
+            "message": f"Updated BT number for MAWB {mawb}",
+            "timestamp": timestamp_start
+        })
+    except Exception as e:
+        message = await sync_to_async(handle_sheets_error)(e)
+        if message:
+            return JsonResponse({"error": message}, status=503)
+        logger.exception(f"Error updating BT number: {e}")
+        return JsonResponse({"error": str(e)}, status=500)
+
+
+@async_api_view(['GET'])
+async def mawb_suggestions(request):
+    """Async variant of views.mawb_suggestions."""
+    query = request.GET.get('query', '').strip()
+    if not query:
+        return JsonResponse([], safe=False)
+
+    try:
+        limit = parse_limit(request.GET, 20, 100)
+    except ValueError as e:
+        return JsonResponse({"error": str(e)}, status=400)
+
+    # Only a stale index touches the database
+    index = mawb_index if not mawb_index.is_stale() else await sync_to_async(get_mawb_index)()
+    return JsonResponse(index.search(query, limit), safe=False)
+
+
+@async_api_view(['GET'])
+async def flight_suggestions(request):
+    """Async variant of views.flight_suggestions."""
+    query = request.GET.get('query', '').strip()
+    if not query:
+        return JsonResponse([], safe=False)
+
+    try:
+        limit = parse_limit(request.GET, 20, 100)
+        window = arrival_window_filters(request.GET)
+    except ValueError as e:
+        return JsonResponse({"error": str(e)}, status=400)
+
+    flights = FlightRecord.objects.filter(**window).order_by('flight_number').values_list('flight_number', flat=True).distinct()
+    prefix = query.upper()
+    result = [flight async for flight in flights.filter(flight_number__gte=prefix, flight_number__lt=prefix + '\uffff')[:limit]]
+    if len(result) < limit:
+        result += [
+            flight async for flight in
+            flights.filter(flight_number__icontains=query).exclude(flight_number__in=result)[:limit - len(result)]
+        ]
+    return JsonResponse(result, safe=False)
+
+
+@async_api_view(['GET'])
+async def mawb_by_flight(request):
+    """Async variant of views.mawb_by_flight."""
+    flight = request.GET.get('flight', '').strip()
+    if not flight:
+        return JsonResponse([], safe=False)
+
+    try:
+        limit = parse_limit(request.GET, 500, 2000)
+        window = arrival_window_filters(request.GET)
+    except ValueError as e:
+        return JsonResponse({"error": str(e)}, status=400)
+
+    mawbs = FlightRecord.objects.filter(flight_number=flight, **window).order_by('mawb').values_list('mawb', flat=True)
+    return JsonResponse([mawb async for mawb in mawbs[:limit]], safe=False)
+
+
+@async_api_view(['GET'])
+async def record_events(request):
+    """
+    Server-Sent Events stream of the changes to the records of
+    ?flight=BA123,EK5,... (at most 20 flights). Each change is a "record"
+    event with the MAWB's current state or a "deleted" event with its MAWB.
+    A "reset" event means that events were dropped; reload the flights.
+    Needs an ASGI server: a WSGI worker would be held for the whole stream.
+    """
+    if not isinstance(request, ASGIRequest):
+        return JsonResponse({"error": "The event stream is only served over ASGI"}, status=501)
+
+    flights = {flight.strip() for flight in request.GET.get('flight', '').split(',') if flight.strip()}
+    if not flights:
+        return JsonResponse({"error": "Missing flight"}, status=400)
+    if len(flights) > 20:
+        return JsonResponse({"error": "At most 20 flights per stream"}, status=400)
+
+    response = StreamingHttpResponse(event_stream(flights), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    # Tell nginx not to buffer the stream
+    response["X-Accel-Buffering"] = "no"
+    return response
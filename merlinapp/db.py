@@ -0,0 +1,76 @@
+"""
+SQLite connection profile and write serialization.
+
+configure_sqlite() applies settings.SQLITE_PRAGMAS to every new SQLite
+connection (connected in merlinapp.signals). journal_mode is the
+exception: it is stored in the database file, so it is only set on a
+database that is still empty, and an existing file is never rewritten just
+by opening it. atomic_write() is
+transaction.atomic() for the write paths: with SQLITE_SERIALIZE_WRITES set
+it also makes the write transactions of a process queue on a lock.
+SQLite runs one writer at a time anyway. A deferred transaction that
+reads first and then writes fails with "database is locked" when another
+writer got there in between, and busy_timeout cannot help with that.
+Writers in other processes still rely on busy_timeout.
+"""
+import os
+import shutil
+import tempfile
+import threading
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import connections, transaction
+
+_write_lock = threading.RLock()
+
+# Pragmas that are saved in the database file rather than the connection
+PERSISTENT_PRAGMAS = {'journal_mode'}
+
+
+def configure_sqlite(connection):
+    """
+    Runs the SQLITE_PRAGMAS on a freshly opened SQLite connection. The
+    PERSISTENT_PRAGMAS are skipped unless the database has no pages yet.
+    """
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute("PRAGMA page_count")
+        is_new = cursor.fetchone()[0] == 0
+        for name, value in getattr(settings, 'SQLITE_PRAGMAS', {}).items():
+            if name in PERSISTENT_PRAGMAS and not is_new:
+                continue
+            cursor.execute(f"PRAGMA {name} = {value}")
+
+
+@contextmanager
+def atomic_write(using=None):
+    """A transaction.atomic() block that queues behind other writers when SQLITE_SERIALIZE_WRITES is set."""
+    if getattr(settings, 'SQLITE_SERIALIZE_WRITES', False):
+        with _write_lock, transaction.atomic(using=using):
+            yield
+    else:
+        with transaction.atomic(using=using):
+            yield
+
+
+@contextmanager
+def temporary_database(alias='default'):
+    """
+    Points `alias` at a freshly migrated throwaway SQLite file for the
+    duration of the block, like the test runner does, and deletes it after.
+    Used by the benchmark commands so they never touch the app database.
+    """
+    connection = connections[alias]
+    tmpdir = tempfile.mkdtemp()
+    old_test_settings = connection.settings_dict['TEST']
+    connection.settings_dict['TEST'] = {**old_test_settings, 'NAME': os.path.join(tmpdir, 'benchmark.sqlite3')}
+    old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+    try:
+        yield connection
+    finally:
+        connection.close()
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        connection.settings_dict['TEST'] = old_test_settings
+        shutil.rmtree(tmpdir, ignore_errors=True)
@@ -0,0 +1,77 @@
+"""
+Streaming export of FlightRecord as CSV or NDJSON.
+
+Rows are read with values_list().iterator(), so neither the queryset cache
+nor model instances hold the result. Each chunk of rows is encoded and
+yielded as one string, so memory stays flat however many rows are
+exported. GZipMiddleware compresses the stream on the fly when the client
+accepts gzip.
+"""
+import csv
+import json
+
+from .models import FlightRecord
+
+EXPORT_FIELDS = [
+    "mawb", "flight_number", "scheduled_arrival_time", "actual_arrival_time",
+    "flight_origin", "flight_destination", "pcs_awb", "pcs_received", "discrepancy",
+    "gross_weight", "commodity_type", "bt_number", "timestamp_start", "trolley_staff_id",
+    "created_at", "updated_at",
+]
+EXPORT_CHUNK_SIZE = 2000
+
+CONTENT_TYPES = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+}
+
+
+class Echo:
+    """File-like object whose write() returns the line csv.writer gives it."""
+    def write(self, value):
+        return value
+
+
+def export_rows(queryset, chunk_size=EXPORT_CHUNK_SIZE):
+    """Yields lists of up to `chunk_size` value tuples, in EXPORT_FIELDS order."""
+    chunk = []
+    for row in queryset.values_list(*EXPORT_FIELDS).iterator(chunk_size=chunk_size):
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def iso(value):
+    """Formats dates and datetimes as full-precision ISO 8601, like the sheet."""
+    return value.isoformat() if hasattr(value, "isoformat") else value
+
+
+def csv_stream(queryset, chunk_size=EXPORT_CHUNK_SIZE):
+    writer = csv.writer(Echo())
+    yield writer.writerow(EXPORT_FIELDS)
+    for chunk in export_rows(queryset, chunk_size):
+        yield "".join(writer.writerow([iso(value) for value in row]) for row in chunk)
+
+
+def ndjson_stream(queryset, chunk_size=EXPORT_CHUNK_SIZE):
+    for chunk in export_rows(queryset, chunk_size):
+        yield "".join(json.dumps(dict(zip(EXPORT_FIELDS, map(iso, row)))) + "\n" for row in chunk)
+
+
+STREAMS = {
+    "csv": csv_stream,
+    "ndjson": ndjson_stream,
+}
+
+
+def export_queryset(flight_number=None, discrepancy_only=False, **arrival_window):
+    """The records to export, oldest first. arrival_window takes arrival_window_filters() lookups."""
+    records = FlightRecord.objects.filter(**arrival_window)
+    if flight_number:
+        records = records.filter(flight_number=flight_number)
+    if discrepancy_only:
+        records = records.filter(discrepancy=True)
+    return records.order_by('id')
@@ -0,0 +1,314 @@
+"""
+In-process stand-in for the part of gspread that merlinapp uses.
+
+Select it with SHEETS_BACKEND = 'fake' to run and benchmark the service
+without a network or credentials. Every call can be slowed down by
+FAKE_SHEETS_LATENCY seconds, reads and writes are limited to
+FAKE_SHEETS_READ_QUOTA / FAKE_SHEETS_WRITE_QUOTA calls per minute (raising
+the same 429 APIError as Google), and every call is counted. Tests can
+make chosen calls fail with FakeSheetsBackend.fail().
+"""
+import json
+import threading
+import time
+from collections import Counter, deque
+
+import gspread
+import requests
+from django.conf import settings
+from gspread.utils import a1_to_rowcol, numericise_all, rowcol_to_a1
+
+READ_METHODS = {
+    "open_by_key", "worksheet", "get_all_records", "get_all_values",
+    "row_values", "col_values", "batch_get",
+}
+
+
+def api_error(code, message, status):
+    """Builds an APIError like the ones gspread raises for error responses."""
+    response = requests.Response()
+    response.status_code = code
+    response._content = json.dumps({"error": {"code": code, "message": message, "status": status}}).encode()
+    return gspread.exceptions.APIError(response)
+
+
+def quota_error(kind):
+    """Builds the APIError Google returns when a per-minute quota is exhausted."""
+    return api_error(429, f"Quota exceeded for quota metric '{kind} requests' per minute (fake backend)", "RESOURCE_EXHAUSTED")
+
+
+class FakeSheetsBackend:
+    """Shared state of the fake: latency, quotas and call counters."""
+    def __init__(self, latency=0.0, read_quota=None, write_quota=None):
+        self.latency = latency
+        self.read_quota = read_quota
+        self.write_quota = write_quota
+        self.calls = Counter()
+        self.quota_errors = 0
+        self.faults = []
+        self._recent = {"read": deque(), "write": deque()}
+        self._lock = threading.Lock()
+
+    def fail(self, method, code=400, times=None, when=None):
+        """
+        Makes calls of `method` raise an APIError with `code`: the next
+        `times` of them, or all if None. `when` limits this to the calls
+        whose positional arguments it returns True for.
+        """
+        with self._lock:
+            self.faults.append({"method": method, "code": code, "times": times, "when": when})
+
+    def _take_fault(self, method, args):
+        for fault in self.faults:
+            if fault["method"] == method and (fault["when"] is None or fault["when"](*args)):
+                if fault["times"] is not None:
+                    fault["times"] -= 1
+                    if not fault["times"]:
+                        self.faults.remove(fault)
+                return fault
+        return None
+
+    def record_call(self, method, *args):
+        """
+        Counts a call, enforces the per-minute quota, sleeps for the
+        configured latency and raises any injected fault.
+        """
+        kind = "read" if method in READ_METHODS else "write"
+        quota = self.read_quota if kind == "read" else self.write_quota
+        with self._lock:
+            now = time.monotonic()
+            recent = self._recent[kind]
+            while recent and now - recent[0] >= 60:
+                recent.popleft()
+            if quota is not None and len(recent) >= quota:
+                self.quota_errors += 1
+                raise quota_error(kind)
+            recent.append(now)
+            self.calls[method] += 1
+            fault = self._take_fault(method, args)
+        if self.latency:
+            time.sleep(self.latency)
+        if fault:
+            raise api_error(fault["code"], f"Injected {method} failure (fake backend)", "FAILED_PRECONDITION")
+
+    def stats(self):
+        """Returns the call counters."""
+        with self._lock:
+            reads = sum(count for method, count in self.calls.items() if method in READ_METHODS)
+            return {
+                "calls": dict(self.calls),
+                "reads": reads,
+                "writes": sum(self.calls.values()) - reads,
+                "quota_errors": self.quota_errors,
+            }
+
+    def reset_stats(self):
+        with self._lock:
+            self.calls.clear()
+            self.quota_errors = 0
+            self.faults.clear()
+            for recent in self._recent.values():
+                recent.clear()
+
+
+def parse_range(range_name):
+    """Turns 'A1:Q2' or 'B3' into (first row, first col, last row, last col)."""
+    range_name = range_name.split("!")[-1]
+    start, _, end = range_name.partition(":")
+    first_row, first_col = a1_to_rowcol(start)
+    last_row, last_col = a1_to_rowcol(end) if end else (first_row, first_col)
+    return first_row, first_col, last_row, last_col
+
+
+class FakeWorksheet:
+    """A worksheet kept as a list of rows of strings."""
+    def __init__(self, backend, title, rows=1000, cols=26):
+        self.backend = backend
+        self.title = title
+        self.row_count = rows
+        self.col_count = cols
+        self.rows = []
+        self.formats = {}
+        self.merges = []
+        self._lock = threading.RLock()
+
+    def _read(self, first_row, first_col, last_row, last_col):
+        values = []
+        for row in self.rows[first_row - 1:last_row]:
+            cells = row[first_col - 1:last_col]
+            while cells and cells[-1] == "":
+                cells.pop()
+            values.append(cells)
+        while values and not values[-1]:
+            values.pop()
+        return values
+
+    def _write(self, range_name, values):
+        first_row, first_col, _, _ = parse_range(range_name)
+        for offset, values_row in enumerate(values):
+            while len(self.rows) < first_row + offset:
+                self.rows.append([])
+            row = self.rows[first_row + offset - 1]
+            needed = first_col - 1 + len(values_row)
+            row.extend([""] * (needed - len(row)))
+            row[first_col - 1:needed] = ["" if value is None else str(value) for value in values_row]
+        self.row_count = max(self.row_count, len(self.rows))
+
+    def get_all_values(self, *args, **kwargs):
+        self.backend.record_call("get_all_values")
+        with self._lock:
+            width = max((len(row) for row in self.rows), default=0)
+            return [row + [""] * (width - len(row)) for row in self.rows]
+
+    def get_all_records(self, head=1, default_blank="", **kwargs):
+        self.backend.record_call("get_all_records")
+        with self._lock:
+            if len(self.rows) < head:
+                return []
+            keys = self.rows[head - 1]
+            records = []
+            for row in self.rows[head:]:
+                values = numericise_all(row + [""] * (len(keys) - len(row)), default_blank=default_blank)
+                records.append(dict(zip(keys, values)))
+            return records
+
+    def row_values(self, row, **kwargs):
+        self.backend.record_call("row_values")
+        with self._lock:
+            values = self._read(row, 1, row, max(self.col_count, len(self.rows[row - 1]) if row <= len(self.rows) else 0))
+            return values[0] if values else []
+
+    def col_values(self, col, **kwargs):
+        self.backend.record_call("col_values")
+        with self._lock:
+            values = [row[col - 1] if len(row) >= col else "" for row in self.rows]
+            while values and values[-1] == "":
+                values.pop()
+            return values
+
+    def batch_get(self, ranges, **kwargs):
+        self.backend.record_call("batch_get")
+        with self._lock:
+            return [self._read(*parse_range(range_name)) for range_name in ranges]
+
+    def update(self, values, range_name=None, **kwargs):
+        # Accept both update(range, values) and update(values, range) like gspread
+        if isinstance(values, str):
+            values, range_name = range_name, values
+        self.backend.record_call("update", range_name, values)
+        with self._lock:
+            self._write(range_name or "A1", values)
+        return {"updatedRange": f"'{self.title}'!{range_name or 'A1'}"}
+
+    def batch_update(self, data, **kwargs):
+        self.backend.record_call("batch_update", data)
+        with self._lock:
+            for item in data:
+                self._write(item["range"], item["values"])
+        return {"totalUpdatedRows": sum(len(item["values"]) for item in data)}
+
+    def append_rows(self, values, **kwargs):
+        self.backend.record_call("append_rows", values)
+        return self._append(values)
+
+    def append_row(self, values, **kwargs):
+        self.backend.record_call("append_row", values)
+        return self._append([values])
+
+    def _append(self, values):
+        with self._lock:
+            # Like the API, append after the last row that has any content
+            last = len(self.rows)
+            while last and not any(self.rows[last - 1]):
+                last -= 1
+            del self.rows[last:]
+            first_row = last + 1
+            self._write(f"A{first_row}", values)
+            last_cell = rowcol_to_a1(first_row + len(values) - 1, max(len(row) for row in values) or 1)
+            return {"updates": {"updatedRange": f"'{self.title}'!A{first_row}:{last_cell}", "updatedRows": len(values)}}
+
+    def delete_rows(self, start_index, end_index=None):
+        self.backend.record_call("delete_rows")
+        with self._lock:
+            del self.rows[start_index - 1:(end_index or start_index)]
+
+    def batch_clear(self, ranges):
+        self.backend.record_call("batch_clear")
+        with self._lock:
+            for range_name in ranges:
+                first_row, first_col, last_row, last_col = parse_range(range_name)
+                for row in self.rows[first_row - 1:last_row]:
+                    for col in range(first_col - 1, min(last_col, len(row))):
+                        row[col] = ""
+
+    def merge_cells(self, name, merge_type="MERGE_ALL"):
+        self.backend.record_call("merge_cells")
+        with self._lock:
+            self.merges.append(name)
+
+    def format(self, ranges, format):
+        self.backend.record_call("format")
+        with self._lock:
+            for range_name in [ranges] if isinstance(ranges, str) else ranges:
+                self.formats[range_name] = format
+
+    def batch_format(self, formats):
+        self.backend.record_call("batch_format")
+        with self._lock:
+            for item in formats:
+                self.formats[item["range"]] = item["format"]
+
+
+class FakeSpreadsheet:
+    def __init__(self, backend, key):
+        self.backend = backend
+        self.id = key
+        self.worksheets = {}
+
+    def worksheet(self, title):
+        self.backend.record_call("worksheet")
+        if title not in self.worksheets:
+            raise gspread.exceptions.WorksheetNotFound(title)
+        return self.worksheets[title]
+
+    def add_worksheet(self, title, rows=1000, cols=26, **kwargs):
+        self.backend.record_call("add_worksheet")
+        self.worksheets[title] = FakeWorksheet(self.backend, title, rows, cols)
+        return self.worksheets[title]
+
+
+class FakeClient:
+    """Drop-in for the gspread client returned by gspread.authorize()."""
+    def __init__(self, backend):
+        self.backend = backend
+        self.spreadsheets = {}
+
+    def open_by_key(self, key):
+        self.backend.record_call("open_by_key")
+        if key not in self.spreadsheets:
+            self.spreadsheets[key] = FakeSpreadsheet(self.backend, key)
+        return self.spreadsheets[key]
+
+
+_fake_client = None
+_fake_client_lock = threading.Lock()
+
+
+def get_fake_client():
+    """Returns the process-wide fake client, so data survives re-authentication."""
+    global _fake_client
+    with _fake_client_lock:
+        if _fake_client is None:
+            _fake_client = FakeClient(FakeSheetsBackend(
+                latency=getattr(settings, 'FAKE_SHEETS_LATENCY', 0.0),
+                read_quota=getattr(settings, 'FAKE_SHEETS_READ_QUOTA', None),
+                write_quota=getattr(settings, 'FAKE_SHEETS_WRITE_QUOTA', None),
+            ))
+        return _fake_client
+
+
+def reset_fake_client():
+    """Throws away all fake data and counters."""
+    global _fake_client
+    with _fake_client_lock:
+        _fake_client = None
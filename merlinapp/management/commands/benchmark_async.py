@@ -0,0 +1,119 @@
+import asyncio
+import json
+import random
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test import AsyncClient, Client, override_settings
+
+from merlinapp.models import FlightRecord
+
+# endpoint -> (WSGI path, ASGI path, method)
+ENDPOINTS = {
+    "update": ("/api/update/", "/api/async/update/", "post"),
+    "update-bt": ("/api/update-bt/", "/api/async/update-bt/", "post"),
+    "mawb-suggestions": ("/api/mawb-suggestions/", "/api/async/mawb-suggestions/", "get"),
+    "flight-suggestions": ("/api/flight-suggestions/", "/api/async/flight-suggestions/", "get"),
+    "mawb-by-flight": ("/api/mawb-by-flight/", "/api/async/mawb-by-flight/", "get"),
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Compares the sync (WSGI) and async (ASGI) variants of an endpoint under the same "
+        "number of concurrent requests, in-process through Django's full handler stack. "
+        "Write endpoints modify existing records, so run it against dummy data "
+        "(`manage.py seed_dummy_data`)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--endpoint', choices=sorted(ENDPOINTS), default='update')
+        parser.add_argument('--requests', type=int, default=500, help="Requests per run.")
+        parser.add_argument(
+            '--concurrency', type=int, default=32,
+            help="Requests in flight at once: WSGI worker threads, and in-flight requests on the ASGI event loop.",
+        )
+
+    def handle(self, *args, **options):
+        records = list(FlightRecord.objects.exclude(flight_number=None).values_list('mawb', 'flight_number')[:1000])
+        if not records:
+            raise CommandError("No flight records to benchmark against; run `manage.py seed_dummy_data` first.")
+        wsgi_path, asgi_path, method = ENDPOINTS[options['endpoint']]
+        requests = [self.build_request(options['endpoint'], i, *random.choice(records)) for i in range(options['requests'])]
+
+        self.stdout.write(f"{options['endpoint']}: {options['requests']} requests, {options['concurrency']} concurrent")
+        # The test clients send requests for the 'testserver' host
+        with override_settings(ALLOWED_HOSTS=settings.ALLOWED_HOSTS + ['testserver']):
+            self.report("WSGI", *self.run_wsgi(wsgi_path, method, requests, options['concurrency']))
+            self.report("ASGI", *self.run_asgi(asgi_path, method, requests, options['concurrency']))
+
+    def build_request(self, endpoint, i, mawb, flight_number):
+        """
+        Returns (data, headers) for one request. Every simulated scanner has
+        its own address, so the per-client rate limit does not kick in.
+        """
+        headers = {"X-Forwarded-For": f"10.{i // 65536 % 256}.{i // 256 % 256}.{i % 256}"}
+        if endpoint == "update":
+            data = {"mawb": mawb, "pcs_received": random.randint(50, 300), "checker_id": "BENCH", "team_name": "Bench"}
+        elif endpoint == "update-bt":
+            data = {"mawb": mawb, "bt_number": f"BT{random.randint(1000, 9999)}", "employee_id": "BENCH"}
+        elif endpoint == "mawb-suggestions":
+            data = {"query": mawb[:-2]}
+        elif endpoint == "flight-suggestions":
+            data = {"query": flight_number[:4]}
+        else:
+            data = {"flight": flight_number}
+        return data, headers
+
+    def run_wsgi(self, path, method, requests, threads):
+        local = threading.local()
+
+        def send(request):
+            data, headers = request
+            if not hasattr(local, "client"):
+                local.client = Client()
+            started = time.perf_counter()
+            if method == "post":
+                response = local.client.post(path, json.dumps(data), content_type="application/json", headers=headers)
+            else:
+                response = local.client.get(path, data, headers=headers)
+            return time.perf_counter() - started, response.status_code
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            results = list(executor.map(send, requests))
+        return time.perf_counter() - started, results
+
+    def run_asgi(self, path, method, requests, concurrency):
+        async def run():
+            client = AsyncClient()
+            semaphore = asyncio.Semaphore(concurrency)
+
+            async def send(request):
+                data, headers = request
+                async with semaphore:
+                    started = time.perf_counter()
+                    if method == "post":
+                        response = await client.post(path, json.dumps(data), content_type="application/json", headers=headers)
+                    else:
+                        response = await client.get(path, data, headers=headers)
+                    return time.perf_counter() - started, response.status_code
+
+            started = time.perf_counter()
+            results = await asyncio.gather(*(send(request) for request in requests))
+            return time.perf_counter() - started, results
+        return asyncio.run(run())
+
+    def report(self, name, elapsed, results):
+        latencies = sorted(latency * 1000 for latency, _ in results)
+        errors = sum(1 for _, status in results if status >= 400)
+        quantiles = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else latencies * 99
+        self.stdout.write(
+            f"{name}: {len(results) / elapsed:8.1f} req/s  "
+            f"p50 {quantiles[49]:7.1f} ms  p95 {quantiles[94]:7.1f} ms  p99 {quantiles[98]:7.1f} ms  "
+            f"errors {errors}"
+        )
@@ -0,0 +1,83 @@
+import random
+import threading
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connections
+from django.test import override_settings
+
+from merlinapp.db import temporary_database
+from merlinapp.models import FlightRecord
+from merlinapp.views import save_received
+
+
+class Command(BaseCommand):
+    help = (
+        "Measures update_received write throughput at several numbers of concurrent writers, "
+        "with SQLite's default journal, with SQLITE_PRAGMAS, and with SQLITE_PRAGMAS plus "
+        "SQLITE_SERIALIZE_WRITES. Runs against a throwaway database file, not the app database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--writers', type=int, nargs='+', default=[1, 8, 32], help="Concurrent writer threads per run.")
+        parser.add_argument('--writes', type=int, default=2000, help="Writes per run, split across the writers.")
+        parser.add_argument('--records', type=int, default=1000, help="Records to seed.")
+
+    def handle(self, *args, **options):
+        if connections['default'].vendor != 'sqlite':
+            raise CommandError("This benchmark is for the SQLite backend.")
+
+        with temporary_database() as connection:
+            FlightRecord.objects.bulk_create([
+                FlightRecord(mawb=f"BENCH{i:06d}", flight_number=f"BN{i % 50}", pcs_awb=100)
+                for i in range(options['records'])
+            ])
+            mawbs = list(FlightRecord.objects.values_list('mawb', flat=True))
+
+            profiles = [
+                ("default", {'journal_mode': 'DELETE'}, False),
+                ("tuned", settings.SQLITE_PRAGMAS, False),
+                ("tuned + serialized", settings.SQLITE_PRAGMAS, True),
+            ]
+            for label, pragmas, serialize in profiles:
+                with override_settings(SQLITE_PRAGMAS=pragmas, SQLITE_SERIALIZE_WRITES=serialize):
+                    # Reconnect so the profile's pragmas are applied
+                    connection.close()
+                    connection.ensure_connection()
+                    for writers in options['writers']:
+                        elapsed, done, errors = self.run(writers, options['writes'] // writers, mawbs)
+                        self.stdout.write(
+                            f"{label:>20}  {writers:3d} writers: {done / elapsed:8.1f} writes/s  "
+                            f"{errors} errors ({done + errors} attempted in {elapsed:.2f}s)"
+                        )
+
+    def run(self, writers, writes, mawbs):
+        """Runs `writers` threads doing `writes` updates each; returns (seconds, writes, errors)."""
+        results = []
+        start = threading.Barrier(writers + 1)
+
+        def writer():
+            done = errors = 0
+            try:
+                start.wait()
+                for _ in range(writes):
+                    try:
+                        record = FlightRecord.objects.get(mawb=random.choice(mawbs))
+                        save_received(record, random.randint(50, 300), "BENCH", "Bench")
+                        done += 1
+                    except OperationalError:
+                        errors += 1
+            finally:
+                connections.close_all()
+                results.append((done, errors))
+
+        threads = [threading.Thread(target=writer) for _ in range(writers)]
+        for thread in threads:
+            thread.start()
+        start.wait()
+        started = time.perf_counter()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+        return elapsed, sum(done for done, _ in results), sum(errors for _, errors in results)
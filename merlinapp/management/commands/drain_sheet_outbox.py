@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from merlinapp.outbox import drain_sheet_outbox, run_sheet_outbox_worker
+
+
+class Command(BaseCommand):
+    help = "Pushes pending FlightRecord changes from the outbox to the Google Sheet."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true', help="Keep draining until interrupted.")
+        parser.add_argument('--interval', type=float, default=2.0, help="Seconds to wait when the outbox is empty.")
+        parser.add_argument('--batch-size', type=int, default=None, help="Entries per batched sheet write.")
+        parser.add_argument('--flush', action='store_true', help="Push everything now, ignoring the coalescing window.")
+
+    def handle(self, *args, **options):
+        if options['loop']:
+            self.stdout.write(f"Draining sheet outbox every {options['interval']}s (Ctrl+C to stop)")
+            try:
+                run_sheet_outbox_worker(options['interval'], options['batch_size'])
+            except KeyboardInterrupt:
+                pass
+            return
+
+        synced = drain_sheet_outbox(options['batch_size'], force=options['flush'])
+        self.stdout.write(self.style.SUCCESS(f"Synced {synced} outbox entries"))
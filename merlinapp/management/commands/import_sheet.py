@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from merlinapp.sheet_import import import_sheet_records
+
+
+class Command(BaseCommand):
+    help = "Imports (upserts) every Google Sheet row into FlightRecord in one pass."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help="Rows per bulk upsert statement.")
+
+    def handle(self, *args, **options):
+        created, updated = import_sheet_records(options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Imported sheet: {created} records created, {updated} updated"))
@@ -0,0 +1,23 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from merlinapp.upstream import ingest_flights
+
+
+class Command(BaseCommand):
+    help = "Fetches a batch of flights from the upstream feeds and upserts them into FlightRecord."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, default=None, help="Flights to fetch (default UPSTREAM_FLIGHTS_PER_POLL).")
+        parser.add_argument('--batch-size', type=int, default=500, help="Rows per bulk upsert statement.")
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        created, updated = ingest_flights(options['count'], options['batch_size'])
+        elapsed = time.perf_counter() - started
+        total = created + updated
+        self.stdout.write(self.style.SUCCESS(
+            f"Ingested {total} flights ({created} created, {updated} updated) "
+            f"in {elapsed:.2f}s ({total / elapsed if elapsed else 0:.0f} flights/s)"
+        ))
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from merlinapp.models import FlightSummary
+from merlinapp.summaries import refresh_flight_summaries
+
+
+class Command(BaseCommand):
+    help = "Recomputes FlightSummary rows from FlightRecord (all flights, or the given ones)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('flights', nargs='*', help="Flight numbers to refresh; all flights if omitted.")
+
+    def handle(self, *args, **options):
+        refresh_flight_summaries(options['flights'] or None)
+        self.stdout.write(self.style.SUCCESS(f"Flight summaries refreshed ({FlightSummary.objects.count()} flights)"))
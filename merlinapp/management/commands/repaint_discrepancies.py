@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from merlinapp.utils import authenticate_google_sheets, highlight_discrepancies
+
+
+class Command(BaseCommand):
+    help = "Repaints the discrepancy highlighting of every row in the Google Sheet in one batched call."
+
+    def handle(self, *args, **options):
+        worksheet = authenticate_google_sheets()
+        painted = highlight_discrepancies(worksheet)
+        self.stdout.write(self.style.SUCCESS(f"Repainted {painted} rows"))
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from merlinapp.utils import authenticate_google_sheets, clear_sheet_data, populate_sheet_with_dummy_data
+
+
+class Command(BaseCommand):
+    help = "Populates the Google Sheet (and FlightRecord) with dummy data."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--num-records', type=int, default=20, help="Number of dummy records to add.")
+        parser.add_argument('--clear', action='store_true', help="Delete the existing data rows first.")
+        parser.add_argument('--sheet-only', action='store_true', help="Do not create matching FlightRecords.")
+
+    def handle(self, *args, **options):
+        if options['clear']:
+            clear_sheet_data(authenticate_google_sheets())
+
+        if not populate_sheet_with_dummy_data(options['num_records'], create_records=not options['sheet_only']):
+            raise CommandError("Failed to populate the sheet")
+        self.stdout.write(self.style.SUCCESS(f"Added {options['num_records']} dummy records"))
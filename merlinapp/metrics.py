@@ -0,0 +1,281 @@
+"""
+Request-level performance metrics, served in Prometheus text format at
+/api/metrics/.
+
+MetricsMiddleware times every request by route, method and status. For
+the duration of the request it also makes a RequestMetrics available
+through a context variable. The database execute wrapper (installed on
+every connection, see signals.py) and SheetsScheduler.call add their
+query and API call counts and times to it; a retried Sheets call counts
+once per attempt. A response hook on the gspread HTTP session adds the
+bytes sent and received. The totals are added to the per-route counters
+when the response is returned. With METRICS_DEBUG_HEADER on, they are
+also sent back in a Server-Timing header.
+
+Everything is kept in process memory, so each worker reports its own
+counters. Recording costs a couple of dict updates under a lock per
+request, plus a perf_counter pair per query and API call.
+"""
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+# Request latency buckets in seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_lock = threading.Lock()
+
+
+def format_labels(names, values):
+    if not names:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for value in values)
+    return "{" + ",".join(f'{name}="{value}"' for name, value in zip(names, escaped)) + "}"
+
+
+class Counter:
+    def __init__(self, name, help, labelnames):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self.values = defaultdict(float)
+
+    def inc(self, labels, value=1):
+        with _lock:
+            self.values[labels] += value
+
+    def render(self):
+        with _lock:
+            values = sorted(self.values.items())
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        lines += [f"{self.name}{format_labels(self.labelnames, labels)} {value:g}" for labels, value in values]
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help, labelnames, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+        self.buckets = buckets
+        # labels -> [count per bucket..., count above the last bucket, sum]
+        self.values = {}
+
+    def observe(self, labels, value):
+        bucket = bisect_left(self.buckets, value)
+        with _lock:
+            counts = self.values.get(labels)
+            if counts is None:
+                counts = self.values[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            counts[bucket] += 1
+            counts[-1] += value
+
+    def render(self):
+        with _lock:
+            values = sorted((labels, list(counts)) for labels, counts in self.values.items())
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        names = self.labelnames + ("le",)
+        for labels, counts in values:
+            total = 0
+            for bound, count in zip(self.buckets + ("+Inf",), counts):
+                total += count
+                lines.append(f"{self.name}_bucket{format_labels(names, labels + (bound,))} {total}")
+            lines.append(f"{self.name}_sum{format_labels(self.labelnames, labels)} {counts[-1]:g}")
+            lines.append(f"{self.name}_count{format_labels(self.labelnames, labels)} {total}")
+        return lines
+
+
+def sampled(name, help, kind, samples):
+    """Renders a metric from (labelnames, labels, value) samples read at scrape time."""
+    lines = [f"# HELP {name} {help}", f"# TYPE {name} {kind}"]
+    lines += [f"{name}{format_labels(names, labels)} {value:g}" for names, labels, value in samples]
+    return lines
+
+
+def gauge(name, help, samples):
+    return sampled(name, help, "gauge", samples)
+
+
+def counter(name, help, samples):
+    """A counter kept elsewhere (e.g. by SheetsScheduler); `name` should end in _total."""
+    return sampled(name, help, "counter", samples)
+
+
+REQUEST_LATENCY = Histogram(
+    "merlin_http_request_duration_seconds",
+    "Time to produce the response (to the first byte for streams), by route.",
+    ("route", "method", "status"),
+)
+REQUEST_DB_QUERIES = Counter("merlin_http_db_queries_total", "Database queries run by requests, by route.", ("route",))
+REQUEST_DB_SECONDS = Counter("merlin_http_db_query_seconds_total", "Time requests spent in database queries, by route.", ("route",))
+REQUEST_SHEETS_CALLS = Counter("merlin_http_sheets_calls_total", "Sheets API calls made by requests, by route.", ("route",))
+REQUEST_SHEETS_SECONDS = Counter("merlin_http_sheets_call_seconds_total", "Time requests spent in Sheets API calls, by route.", ("route",))
+REQUEST_SHEETS_BYTES = Counter("merlin_http_sheets_bytes_total", "Sheets API bytes sent and received by requests, by route.", ("route", "direction"))
+SHEETS_CALLS = Counter("merlin_sheets_calls_total", "Sheets API calls, including background ones, by quota and method.", ("kind", "method"))
+SHEETS_SECONDS = Counter("merlin_sheets_call_seconds_total", "Time spent in Sheets API calls, by quota and method.", ("kind", "method"))
+SHEETS_BYTES = Counter("merlin_sheets_bytes_total", "Sheets API bytes sent and received.", ("direction",))
+
+# SheetsScheduler.stats() -> help text
+SCHEDULER_COUNTERS = {
+    "calls": "Sheets API call attempts made through the scheduler.",
+    "retries": "Sheets API calls retried after a quota or server error.",
+    "failures": "Sheets API calls that failed after any retries.",
+    "throttled_seconds": "Time callers spent waiting for quota or backing off before a retry.",
+}
+SCHEDULER_GAUGES = {
+    "queue_depth": "Callers waiting for Sheets quota right now.",
+    "max_queue_depth": "Most callers waiting for Sheets quota at once since the process started.",
+}
+
+METRICS = [
+    REQUEST_LATENCY, REQUEST_DB_QUERIES, REQUEST_DB_SECONDS, REQUEST_SHEETS_CALLS,
+    REQUEST_SHEETS_SECONDS, REQUEST_SHEETS_BYTES, SHEETS_CALLS, SHEETS_SECONDS, SHEETS_BYTES,
+]
+
+
+class RequestMetrics:
+    """What one request has spent so far."""
+    __slots__ = ("db_queries", "db_seconds", "sheets_calls", "sheets_seconds", "sheets_bytes_sent", "sheets_bytes_received")
+
+    def __init__(self):
+        self.db_queries = self.sheets_calls = 0
+        self.db_seconds = self.sheets_seconds = 0.0
+        self.sheets_bytes_sent = self.sheets_bytes_received = 0
+
+
+_current = ContextVar("request_metrics", default=None)
+
+
+def record_query(execute, sql, params, many, context):
+    """Database execute wrapper: times the queries run for a request."""
+    metrics = _current.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.db_queries += 1
+        metrics.db_seconds += time.perf_counter() - started
+
+
+def timed_sheets_call(kind, func, *args, **kwargs):
+    """Runs one Sheets API call (one attempt) and records its time."""
+    started = time.perf_counter()
+    try:
+        return func(*args, **kwargs)
+    finally:
+        seconds = time.perf_counter() - started
+        method = getattr(func, "__name__", "unknown")
+        SHEETS_CALLS.inc((kind, method))
+        SHEETS_SECONDS.inc((kind, method), seconds)
+        metrics = _current.get()
+        if metrics is not None:
+            metrics.sheets_calls += 1
+            metrics.sheets_seconds += seconds
+
+
+def record_sheets_response(response, *args, **kwargs):
+    """requests response hook for the gspread session: counts the bytes on the wire."""
+    sent = len(response.request.body or b"")
+    received = len(response.content)
+    SHEETS_BYTES.inc(("sent",), sent)
+    SHEETS_BYTES.inc(("received",), received)
+    metrics = _current.get()
+    if metrics is not None:
+        metrics.sheets_bytes_sent += sent
+        metrics.sheets_bytes_received += received
+    return response
+
+
+def instrument_sheets_client(client):
+    """Adds the byte-counting hook to a gspread client's HTTP session, if it has one."""
+    session = getattr(getattr(client, "http_client", None), "session", None)
+    if session is not None:
+        session.hooks["response"].append(record_sheets_response)
+    return client
+
+
+def server_timing(metrics, seconds):
+    """The Server-Timing header value for one request's breakdown."""
+    return (
+        f'db;dur={metrics.db_seconds * 1000:.1f};desc="{metrics.db_queries} queries", '
+        f'sheets;dur={metrics.sheets_seconds * 1000:.1f};desc="{metrics.sheets_calls} calls, '
+        f'{metrics.sheets_bytes_sent} B sent, {metrics.sheets_bytes_received} B received", '
+        f'total;dur={seconds * 1000:.1f}'
+    )
+
+
+class MetricsMiddleware:
+    """Records latency, database and Sheets metrics for each request."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.debug_header = getattr(settings, 'METRICS_DEBUG_HEADER', False)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, metrics, time.perf_counter() - started)
+
+    async def __acall__(self, request):
+        metrics = RequestMetrics()
+        token = _current.set(metrics)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, metrics, time.perf_counter() - started)
+
+    def finish(self, request, response, metrics, seconds):
+        match = getattr(request, "resolver_match", None)
+        # The route pattern, not the path, keeps the label set small
+        route = (match.route or match.view_name) if match else "unmatched"
+        REQUEST_LATENCY.observe((route, request.method, str(response.status_code)), seconds)
+        if metrics.db_queries:
+            REQUEST_DB_QUERIES.inc((route,), metrics.db_queries)
+            REQUEST_DB_SECONDS.inc((route,), metrics.db_seconds)
+        if metrics.sheets_calls:
+            REQUEST_SHEETS_CALLS.inc((route,), metrics.sheets_calls)
+            REQUEST_SHEETS_SECONDS.inc((route,), metrics.sheets_seconds)
+            REQUEST_SHEETS_BYTES.inc((route, "sent"), metrics.sheets_bytes_sent)
+            REQUEST_SHEETS_BYTES.inc((route, "received"), metrics.sheets_bytes_received)
+        if self.debug_header:
+            response["Server-Timing"] = server_timing(metrics, seconds)
+        return response
+
+
+def render_metrics():
+    """All metrics in Prometheus text exposition format."""
+    from .push import broker
+    from .sheets_scheduler import get_scheduler
+
+    lines = []
+    for metric in METRICS:
+        lines += metric.render()
+    stats = get_scheduler().stats()
+    for stat, help in SCHEDULER_COUNTERS.items():
+        lines += counter(f"merlin_sheets_scheduler_{stat}_total", help, [((), (), stats[stat])])
+    for stat, help in SCHEDULER_GAUGES.items():
+        lines += gauge(f"merlin_sheets_scheduler_{stat}", help, [((), (), stats[stat])])
+    lines += gauge("merlin_push_subscribers", "Screens connected to /api/async/events/ in this process.", [
+        ((), (), broker.subscriber_count()),
+    ])
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,13 @@
+from django.middleware.gzip import GZipMiddleware as BaseGZipMiddleware
+
+
+class GZipMiddleware(BaseGZipMiddleware):
+    """
+    Django's GZipMiddleware, minus event streams: it would compress each
+    event as a gzip member of its own, which clients may not decode
+    incrementally, and each event must reach the client as it is sent.
+    """
+    def process_response(self, request, response):
+        if response.get('Content-Type', '').startswith('text/event-stream'):
+            return response
+        return super().process_response(request, response)
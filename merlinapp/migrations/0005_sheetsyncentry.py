@@ -0,0 +1,28 @@
+# Generated by Django 4.2.30 on 2026-10-18 01:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('merlinapp', '0004_flightrecord_trolley_staff_id'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SheetSyncEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('mawb', models.CharField(max_length=20)),
+                ('fields', models.JSONField(blank=True, default=dict)),
+                ('attempts', models.IntegerField(default=0)),
+                ('last_error', models.TextField(blank=True, default='')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('processed_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['processed_at', 'id'], name='sheetsync_pending_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-18 01:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('merlinapp', '0005_sheetsyncentry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sheetsyncentry',
+            name='section',
+            field=models.CharField(blank=True, default='', max_length=20),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 4.2.30 on 2026-10-18 01:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('merlinapp', '0006_sheetsyncentry_section'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='flightrecord',
+            index=models.Index(fields=['flight_number'], name='flightrecord_flight_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='flightrecord',
+            index=models.Index(fields=['flight_number', 'mawb'], name='flightrecord_flight_mawb_idx'),
+        ),
+    ]
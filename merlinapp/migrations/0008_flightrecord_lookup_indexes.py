@@ -0,0 +1,37 @@
+# Generated by Django 4.2.30 on 2026-10-18 01:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('merlinapp', '0007_flightrecord_flight_indexes'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='flightrecord',
+            name='flightrecord_flight_idx',
+        ),
+        migrations.AddIndex(
+            model_name='flightrecord',
+            index=models.Index(fields=['actual_arrival_time', 'flight_number'], name='flightrecord_arrival_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='flightrecord',
+            index=models.Index(fields=['updated_at', 'id'], name='flightrecord_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='flightrecord',
+            index=models.Index(condition=models.Q(('discrepancy', True)), fields=['flight_number', 'mawb'], name='flightrecord_open_disc_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='flightrecord',
+            index=models.Index(condition=models.Q(('bt_number__isnull', False)), fields=['bt_number'], name='flightrecord_bt_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='flightrecord',
+            index=models.Index(condition=models.Q(('trolley_staff_id__isnull', False)), fields=['trolley_staff_id', 'timestamp_start'], name='flightrecord_trolley_staff_idx'),
+        ),
+    ]
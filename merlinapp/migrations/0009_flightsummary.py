@@ -0,0 +1,50 @@
+# Generated by Django 4.2.30 on 2026-10-18 01:18
+
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import Coalesce
+
+
+def build_flight_summaries(apps, schema_editor):
+    FlightRecord = apps.get_model('merlinapp', 'FlightRecord')
+    FlightSummary = apps.get_model('merlinapp', 'FlightSummary')
+    totals = FlightRecord.objects.exclude(flight_number=None).values('flight_number').annotate(
+        awb_count=Count('id'),
+        pcs_expected=Coalesce(Sum('pcs_awb'), 0),
+        # Named apart from the pcs_received field, which the next filter refers to
+        pcs_received_total=Coalesce(Sum('pcs_received'), 0),
+        awbs_received=Count('id', filter=Q(pcs_received__isnull=False)),
+        open_discrepancies=Count('id', filter=Q(discrepancy=True)),
+        towing_started=Count('id', filter=Q(bt_number__isnull=False) & ~Q(bt_number='')),
+    ).order_by()
+    FlightSummary.objects.bulk_create([
+        FlightSummary(pcs_received=row.pop('pcs_received_total'), **row) for row in totals
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('merlinapp', '0008_flightrecord_lookup_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FlightSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('flight_number', models.CharField(max_length=10, unique=True)),
+                ('awb_count', models.IntegerField(default=0)),
+                ('pcs_expected', models.IntegerField(default=0)),
+                ('pcs_received', models.IntegerField(default=0)),
+                ('awbs_received', models.IntegerField(default=0)),
+                ('open_discrepancies', models.IntegerField(default=0)),
+                ('towing_started', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name_plural': 'flight summaries',
+            },
+        ),
+        migrations.RunPython(build_flight_summaries, migrations.RunPython.noop),
+    ]
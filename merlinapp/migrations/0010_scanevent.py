@@ -0,0 +1,31 @@
+# Generated by Django 4.2.30 on 2026-10-18 01:19
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('merlinapp', '0009_flightsummary'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ScanEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('mawb', models.CharField(max_length=20)),
+                ('flight_number', models.CharField(blank=True, max_length=10, null=True)),
+                ('kind', models.CharField(choices=[('breakdown', 'Breakdown'), ('towing', 'Towing')], max_length=10)),
+                ('staff_id', models.CharField(blank=True, default='', max_length=50)),
+                ('team_name', models.CharField(blank=True, default='', max_length=50)),
+                ('pcs_received', models.IntegerField(blank=True, null=True)),
+                ('bt_number', models.CharField(blank=True, max_length=20, null=True)),
+                ('occurred_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['kind', 'occurred_at'], name='scanevent_kind_time_idx'), models.Index(fields=['mawb', 'kind', 'occurred_at'], name='scanevent_mawb_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.2.30 on 2026-10-18 01:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('merlinapp', '0011_recordtombstone'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sheetsyncentry',
+            name='failed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='sheetsyncentry',
+            name='retry_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -1,4 +1,5 @@
 from django.db import models
+from django.utils import timezone
 
 class FlightRecord(models.Model):
     flight_number = models.CharField(max_length=10, null=True, blank=True)
@@ -18,5 +19,133 @@ class FlightRecord(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        # mawb lookups use the unique constraint's index
+        indexes = [
+            # Flight lookups and flight number prefixes, MAWBs of a flight in order
+            models.Index(fields=['flight_number', 'mawb'], name='flightrecord_flight_mawb_idx'),
+            # Arrival time windows; covers the flight numbers for suggestions
+            models.Index(fields=['actual_arrival_time', 'flight_number'], name='flightrecord_arrival_idx'),
+            # Change feeds: records changed since a point, in (updated_at, id) order
+            models.Index(fields=['updated_at', 'id'], name='flightrecord_updated_idx'),
+            # Open discrepancies only, by flight; a small fraction of the table
+            models.Index(
+                fields=['flight_number', 'mawb'], name='flightrecord_open_disc_idx',
+                condition=models.Q(discrepancy=True),
+            ),
+            # Towing lookups; most records have not been towed yet
+            models.Index(
+                fields=['bt_number'], name='flightrecord_bt_idx',
+                condition=models.Q(bt_number__isnull=False),
+            ),
+            models.Index(
+                fields=['trolley_staff_id', 'timestamp_start'], name='flightrecord_trolley_staff_idx',
+                condition=models.Q(trolley_staff_id__isnull=False),
+            ),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remembered so that moving a record to another flight also refreshes the old flight's summary
+        instance._loaded_flight_number = instance.__dict__.get('flight_number')
+        return instance
+
     def __str__(self):
         return f"{self.mawb} - {self.flight_number}"
+
+
+class RecordTombstone(models.Model):
+    """
+    Marks a deleted FlightRecord so that /sync/ can tell handhelds to drop
+    it from their local copy. Written by a post_delete signal and pruned
+    after SYNC_TOMBSTONE_RETENTION_DAYS.
+    """
+    mawb = models.CharField(max_length=20)
+    deleted_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['deleted_at'], name='tombstone_deleted_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.mawb} deleted at {self.deleted_at}"
+
+
+class ScanEvent(models.Model):
+    """
+    Append-only log of scans: one row per pieces-received (breakdown) or BT
+    number (towing) submission, never updated. FlightRecord only keeps the
+    latest values; this keeps the history for throughput and latency.
+    """
+    BREAKDOWN = 'breakdown'
+    TOWING = 'towing'
+    KIND_CHOICES = [(BREAKDOWN, 'Breakdown'), (TOWING, 'Towing')]
+
+    mawb = models.CharField(max_length=20)
+    flight_number = models.CharField(max_length=10, null=True, blank=True)
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    staff_id = models.CharField(max_length=50, blank=True, default="")  # checker or trolley staff ID
+    team_name = models.CharField(max_length=50, blank=True, default="")
+    pcs_received = models.IntegerField(null=True, blank=True)
+    bt_number = models.CharField(max_length=20, null=True, blank=True)
+    occurred_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            # Windowed aggregates over one kind of scan
+            models.Index(fields=['kind', 'occurred_at'], name='scanevent_kind_time_idx'),
+            # Scan history of a MAWB
+            models.Index(fields=['mawb', 'kind', 'occurred_at'], name='scanevent_mawb_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.mawb} {self.kind} at {self.occurred_at}"
+
+
+class SheetSyncEntry(models.Model):
+    """
+    Outbox of pending Google Sheet writes. Views add an entry in the same
+    transaction as the FlightRecord save; a background drainer pushes them
+    to the sheet in batches.
+    """
+    mawb = models.CharField(max_length=20)
+    section = models.CharField(max_length=20, blank=True, default="")  # columns to write; empty for the whole row
+    fields = models.JSONField(default=dict, blank=True)  # keyword arguments for build_sheet_cells
+    attempts = models.IntegerField(default=0)
+    last_error = models.TextField(blank=True, default="")
+    created_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+    retry_at = models.DateTimeField(null=True, blank=True)  # not retried before this after a failure
+    failed_at = models.DateTimeField(null=True, blank=True)  # given up on after SHEET_SYNC_MAX_ATTEMPTS
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['processed_at', 'id'], name='sheetsync_pending_idx'),
+        ]
+
+    def __str__(self):
+        status = 'done' if self.processed_at else 'failed' if self.failed_at else 'pending'
+        return f"{self.mawb} ({status})"
+
+
+class FlightSummary(models.Model):
+    """
+    Per-flight totals for the supervisor dashboard. Maintained from
+    FlightRecord by merlinapp.summaries; never edited directly.
+    """
+    flight_number = models.CharField(max_length=10, unique=True)
+    awb_count = models.IntegerField(default=0)
+    pcs_expected = models.IntegerField(default=0)
+    pcs_received = models.IntegerField(default=0)
+    awbs_received = models.IntegerField(default=0)  # AWBs with pieces received recorded
+    open_discrepancies = models.IntegerField(default=0)
+    towing_started = models.IntegerField(default=0)  # AWBs with a BT number
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name_plural = "flight summaries"
+
+    def __str__(self):
+        return f"{self.flight_number}: {self.awb_count} AWBs"
@@ -0,0 +1,185 @@
+import logging
+import threading
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Max, Min, Q
+from django.utils import timezone
+
+from .models import FlightRecord, SheetSyncEntry
+from .sheets_scheduler import is_transient_error
+from .utils import sync_records_to_sheet
+
+logger = logging.getLogger(__name__)
+
+# Only one drain runs at a time per process
+_drain_lock = threading.Lock()
+
+
+def sheet_sync_entry(record, section="", checker_id=None, team_name=None, bt_number=None, timestamp_start=None, trolley_staff_id=None, timestamp_breakdown=None):
+    """Builds an unsaved outbox entry for a FlightRecord."""
+    fields = {
+        "checker_id": checker_id,
+        "team_name": team_name,
+        "bt_number": bt_number,
+        "timestamp_start": timestamp_start,
+        "trolley_staff_id": trolley_staff_id,
+        "timestamp_breakdown": timestamp_breakdown,
+    }
+    return SheetSyncEntry(
+        mawb=record.mawb,
+        section=section,
+        fields={key: value for key, value in fields.items() if value is not None},
+    )
+
+
+def enqueue_sheet_sync(record, section="", **fields):
+    """
+    Queues a Google Sheet write for a FlightRecord.
+    section ('towing' or 'breakdown') limits the write to the columns that
+    update owns; leave it empty to write the whole row. The other keyword
+    arguments are those of sheet_sync_entry().
+    Call this inside the same transaction as the record save so that the
+    two are committed (or rolled back) together.
+    """
+    entry = sheet_sync_entry(record, section, **fields)
+    entry.save()
+    return entry
+
+
+def enqueue_sheet_syncs(records, section="", **fields):
+    """Queues the same kind of Google Sheet write for many records in one insert."""
+    return SheetSyncEntry.objects.bulk_create(
+        [sheet_sync_entry(record, section, **fields) for record in records]
+    )
+
+
+def ready_entries(force=False):
+    """
+    Returns the pending outbox entries that are due to be pushed: neither
+    set aside nor waiting to be retried.
+    Changes to the same MAWB are coalesced: a MAWB is held back until it has
+    been quiet for SHEET_SYNC_COALESCE_SECONDS, but never for longer than
+    SHEET_SYNC_MAX_DELAY_SECONDS after its oldest pending change.
+    """
+    now = timezone.now()
+    pending = SheetSyncEntry.objects.filter(processed_at__isnull=True, failed_at__isnull=True).exclude(retry_at__gt=now)
+    window = getattr(settings, 'SHEET_SYNC_COALESCE_SECONDS', 0)
+    if force or not window:
+        return pending
+    
+    max_delay = getattr(settings, 'SHEET_SYNC_MAX_DELAY_SECONDS', 30)
+    due_mawbs = (
+        pending.values('mawb')
+        .annotate(last_change=Max('created_at'), first_change=Min('created_at'))
+        .filter(Q(last_change__lte=now - timedelta(seconds=window)) | Q(first_change__lte=now - timedelta(seconds=max_delay)))
+        .values('mawb')
+    )
+    return pending.filter(mawb__in=due_mawbs)
+
+
+def retry_delay(attempts):
+    """Seconds to wait before retrying an entry that has failed `attempts` times."""
+    base = getattr(settings, 'SHEET_SYNC_RETRY_BASE_SECONDS', 2)
+    return min(getattr(settings, 'SHEET_SYNC_RETRY_MAX_SECONDS', 300), base * 2 ** (attempts - 1))
+
+
+def sync_entries(entries, records):
+    """
+    Writes the entries to the sheet in one batched sync and marks them
+    processed. Entries whose record has been deleted since are dropped as done.
+    """
+    items = [(records[entry.mawb], entry.fields, entry.section) for entry in entries if entry.mawb in records]
+    if items:
+        sync_records_to_sheet(items)
+    SheetSyncEntry.objects.filter(id__in=[entry.id for entry in entries]).update(processed_at=timezone.now())
+
+
+def defer_entries(entries, error, give_up=True):
+    """
+    Schedules failed entries for a retry with exponential backoff. With
+    give_up, entries that have used up SHEET_SYNC_MAX_ATTEMPTS are set aside.
+    """
+    now = timezone.now()
+    max_attempts = getattr(settings, 'SHEET_SYNC_MAX_ATTEMPTS', 8)
+    for entry in entries:
+        entry.attempts += 1
+        entry.last_error = str(error)
+        entry.retry_at = now + timedelta(seconds=retry_delay(entry.attempts))
+        if give_up and entry.attempts >= max_attempts:
+            entry.failed_at = now
+            logger.error(f"Giving up on outbox entry {entry.id} for MAWB {entry.mawb} after {entry.attempts} attempts: {error}")
+    SheetSyncEntry.objects.bulk_update(entries, ['attempts', 'last_error', 'retry_at', 'failed_at'])
+
+
+def drain_sheet_outbox(batch_size=None, force=False):
+    """
+    Pushes the oldest due outbox entries to the sheet in one batched sync.
+    All pending changes of a MAWB in the batch are merged into a single row
+    write with the record's final state. Pass force=True to skip the
+    coalescing window. Returns the number of entries synced.
+
+    If the API is throttled or unavailable, the whole batch is retried later.
+    If the batch is rejected, each MAWB is retried on its own so that one bad
+    entry cannot hold back the others; the ones that still fail back off and
+    are set aside after SHEET_SYNC_MAX_ATTEMPTS.
+    """
+    batch_size = batch_size or getattr(settings, 'SHEET_OUTBOX_BATCH_SIZE', 100)
+    if not _drain_lock.acquire(blocking=False):
+        return 0
+    try:
+        entries = list(ready_entries(force).order_by('id')[:batch_size])
+        if not entries:
+            return 0
+        
+        records = FlightRecord.objects.in_bulk({entry.mawb for entry in entries}, field_name='mawb')
+        try:
+            sync_entries(entries, records)
+            return len(entries)
+        except Exception as e:
+            if is_transient_error(e):
+                logger.warning(f"Sheet sync unavailable for {len(entries)} outbox entries: {e}")
+                defer_entries(entries, e, give_up=False)
+                return 0
+            logger.warning(f"Sheet sync failed for {len(entries)} outbox entries, retrying each MAWB on its own: {e}")
+        
+        by_mawb = {}
+        for entry in entries:
+            by_mawb.setdefault(entry.mawb, []).append(entry)
+        groups = list(by_mawb.values())
+        synced = 0
+        for i, mawb_entries in enumerate(groups):
+            try:
+                sync_entries(mawb_entries, records)
+                synced += len(mawb_entries)
+            except Exception as e:
+                if is_transient_error(e):
+                    # The API went away; the rest waits for the next run
+                    defer_entries([entry for group in groups[i:] for entry in group], e, give_up=False)
+                    break
+                defer_entries(mawb_entries, e)
+        return synced
+    finally:
+        _drain_lock.release()
+
+
+def prune_sheet_outbox():
+    """Deletes entries processed more than SHEET_OUTBOX_RETENTION_HOURS ago; returns how many."""
+    cutoff = timezone.now() - timedelta(hours=getattr(settings, 'SHEET_OUTBOX_RETENTION_HOURS', 24))
+    deleted, _ = SheetSyncEntry.objects.filter(processed_at__lt=cutoff).delete()
+    return deleted
+
+
+def run_sheet_outbox_worker(interval=2.0, batch_size=None, stop_event=None):
+    """Drains the outbox in a loop until stop_event is set."""
+    stop_event = stop_event or threading.Event()
+    while not stop_event.is_set():
+        try:
+            synced = drain_sheet_outbox(batch_size)
+        except Exception as e:
+            logger.exception(f"Error draining sheet outbox: {e}")
+            synced = 0
+        # Keep going straight away while there is a backlog
+        if not synced:
+            stop_event.wait(interval)
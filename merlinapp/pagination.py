@@ -0,0 +1,48 @@
+"""
+Keyset (cursor) pagination over (updated_at, id).
+
+A cursor is the opaque encoding of the last (updated_at, id) a client has
+seen; the next page is the rows after it in (updated_at, id) order, which
+the (updated_at, id) index serves without an OFFSET scan. Records move to
+the end when they change, so polling with the last cursor returns what
+changed since.
+"""
+import base64
+import json
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+
+
+def encode_cursor(updated_at, pk):
+    payload = json.dumps([updated_at.isoformat(), pk], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    """Returns (updated_at, id) from a cursor. Raises ValueError if it is malformed."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        updated_at, pk = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        updated_at = parse_datetime(updated_at)
+        if updated_at is None or not isinstance(pk, int):
+            raise ValueError
+    except (ValueError, TypeError, UnicodeDecodeError):
+        raise ValueError("Invalid cursor")
+    return updated_at, pk
+
+
+def keyset_page(queryset, cursor, limit):
+    """
+    Returns (rows, next_cursor, has_more) for the page after `cursor` (the
+    first page if None). next_cursor is the cursor to ask for next; with no
+    new rows it is the cursor passed in, so pollers can keep using it.
+    """
+    if cursor:
+        updated_at, pk = decode_cursor(cursor)
+        queryset = queryset.filter(Q(updated_at__gt=updated_at) | Q(updated_at=updated_at, id__gt=pk))
+    rows = list(queryset.order_by('updated_at', 'id')[:limit + 1])
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    next_cursor = encode_cursor(rows[-1].updated_at, rows[-1].id) if rows else cursor
+    return rows, next_cursor, has_more
@@ -0,0 +1,195 @@
+"""
+Server push of FlightRecord changes to floor screens, per flight, over
+Server-Sent Events (GET /api/async/events/?flight=BA123,... under ASGI).
+
+Write paths hand their changed records to push_records() or
+push_changed_mawbs(). After the transaction commits, each change is
+serialized once and fanned out by the process-wide `broker` to the
+connections following its flight. Each connection has its own bounded
+queue. A screen that falls behind gets a "reset" event and is
+disconnected. EventSource reconnects on its own, and the screen should
+then reload its flights from /api/mawb-by-flight/ or /api/sync/.
+
+The broker is in-process: a screen sees the writes served by the same
+process it is connected to. Writes commit on request threads, so each
+change is handed to the subscribers' event loop with
+call_soon_threadsafe. Nothing is sent or queried when no screen is
+connected.
+"""
+import asyncio
+import json
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import transaction
+
+from .models import FlightRecord
+from .serializers import FlightRecordReadSerializer
+
+# What floor screens show for each MAWB
+PUSH_FIELDS = [
+    "mawb", "flight_number", "pcs_awb", "pcs_received", "discrepancy",
+    "bt_number", "trolley_staff_id", "timestamp_start", "updated_at",
+]
+
+
+def sse_message(event, data):
+    """Formats one Server-Sent Event."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+class Subscription:
+    """One connected screen: the flights it follows and its pending events."""
+    def __init__(self, flights, loop, max_pending):
+        self.flights = frozenset(flights)
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize=max_pending)
+        self.overflowed = False
+
+    def deliver(self, message):
+        # Runs on self.loop
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            self.overflowed = True
+
+
+def deliver_all(subscriptions, message):
+    for subscription in subscriptions:
+        subscription.deliver(message)
+
+
+class RecordBroker:
+    """Fans messages out to the subscriptions following a flight. Thread-safe."""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._by_flight = defaultdict(set)
+
+    def subscribe(self, flights, max_pending=None):
+        """Subscribes the running event loop to `flights`; returns the Subscription."""
+        if max_pending is None:
+            max_pending = getattr(settings, 'PUSH_MAX_PENDING_EVENTS', 100)
+        subscription = Subscription(flights, asyncio.get_running_loop(), max_pending)
+        with self._lock:
+            for flight in subscription.flights:
+                self._by_flight[flight].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            for flight in subscription.flights:
+                subscribers = self._by_flight.get(flight)
+                if subscribers is not None:
+                    subscribers.discard(subscription)
+                    if not subscribers:
+                        del self._by_flight[flight]
+
+    def has_subscribers(self):
+        return bool(self._by_flight)
+
+    def subscriber_count(self):
+        with self._lock:
+            return len(set().union(*self._by_flight.values()))
+
+    def publish(self, flights, message):
+        """Queues `message` for every subscription following one of `flights`."""
+        with self._lock:
+            targets = set().union(*(self._by_flight.get(flight, ()) for flight in flights))
+        # One wake-up per event loop, however many screens it serves
+        by_loop = defaultdict(list)
+        for subscription in targets:
+            by_loop[subscription.loop].append(subscription)
+        for loop, subscriptions in by_loop.items():
+            try:
+                loop.call_soon_threadsafe(deliver_all, subscriptions, message)
+            except RuntimeError:
+                # The loop has shut down; its subscriptions go with it
+                pass
+
+
+broker = RecordBroker()
+
+
+def record_message(record):
+    return sse_message("record", FlightRecordReadSerializer(record, fields=PUSH_FIELDS).data)
+
+
+def publish_records(records, previous_flights=None):
+    """
+    Publishes each record to its flight, and to the flight it moved from
+    (`previous_flights`: MAWB -> flight number) if that is different.
+    """
+    previous_flights = previous_flights or {}
+    for record in records:
+        flights = {record.flight_number, previous_flights.get(record.mawb)} - {None}
+        if flights:
+            broker.publish(flights, record_message(record))
+
+
+def push_records(records):
+    """
+    Pushes saved FlightRecord instances once the current transaction
+    commits. They must hold all of PUSH_FIELDS.
+    """
+    records = list(records)
+
+    def publish():
+        if broker.has_subscribers():
+            publish_records(records, {
+                record.mawb: getattr(record, '_loaded_flight_number', None) for record in records
+            })
+    transaction.on_commit(publish)
+
+
+def push_changed_mawbs(mawbs, previous_flights=None):
+    """
+    Pushes the current state of `mawbs` once the current transaction
+    commits, for bulk writes whose instances are not fully loaded. Reads
+    them back only if a screen is connected.
+    """
+    mawbs = list(mawbs)
+
+    def publish():
+        if broker.has_subscribers():
+            publish_records(FlightRecord.objects.filter(mawb__in=mawbs).only(*PUSH_FIELDS), previous_flights)
+    transaction.on_commit(publish)
+
+
+def push_deleted_record(record):
+    def publish():
+        if broker.has_subscribers() and record.flight_number:
+            broker.publish([record.flight_number], sse_message("deleted", {"mawb": record.mawb}))
+    transaction.on_commit(publish)
+
+
+async def event_stream(flights):
+    """
+    Subscribes to `flights` and yields their events as SSE, with a keepalive
+    comment every PUSH_KEEPALIVE_SECONDS. Ends after PUSH_MAX_STREAM_SECONDS
+    so that the connections of vanished clients do not pile up; EventSource
+    reconnects by itself. The subscription only exists while the stream is
+    being iterated, so a client that goes away before the first event
+    leaves nothing behind.
+    """
+    keepalive = getattr(settings, 'PUSH_KEEPALIVE_SECONDS', 15)
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + getattr(settings, 'PUSH_MAX_STREAM_SECONDS', 300)
+    subscription = broker.subscribe(flights)
+    try:
+        yield f"retry: {getattr(settings, 'PUSH_RETRY_MILLISECONDS', 2000)}\n\n"
+        while True:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                message = await asyncio.wait_for(subscription.queue.get(), min(keepalive, remaining))
+            except asyncio.TimeoutError:
+                yield ": keepalive\n\n"
+                continue
+            if subscription.overflowed:
+                yield sse_message("reset", {})
+                break
+            yield message
+    finally:
+        broker.unsubscribe(subscription)
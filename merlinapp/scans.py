@@ -0,0 +1,79 @@
+"""
+Scan event log (ScanEvent) and the aggregates computed from it.
+
+save_received() and save_bt_number() in merlinapp.views append an event in
+the same transaction as the FlightRecord save; batch updates insert theirs
+with one bulk_create. The aggregates are single grouped queries served by
+the (kind, occurred_at) and (mawb, kind, occurred_at) indexes.
+"""
+from django.db.models import Count, DurationField, ExpressionWrapper, F, Min, Q, Sum
+from django.db.models.functions import TruncMinute
+
+from .models import ScanEvent
+
+# What scans_per_minute() can group by
+SCAN_GROUPS = {"team": "team_name", "checker": "staff_id"}
+
+
+def breakdown_event(record, checker_id="", team_name=""):
+    """An unsaved event for a pieces-received submission on a record."""
+    return ScanEvent(
+        mawb=record.mawb,
+        flight_number=record.flight_number,
+        kind=ScanEvent.BREAKDOWN,
+        staff_id=checker_id or "",
+        team_name=team_name or "",
+        pcs_received=record.pcs_received,
+    )
+
+
+def towing_event(record, employee_id=""):
+    """An unsaved event for a BT number submission on a record."""
+    return ScanEvent(
+        mawb=record.mawb,
+        flight_number=record.flight_number,
+        kind=ScanEvent.TOWING,
+        staff_id=employee_id or "",
+        bt_number=record.bt_number,
+    )
+
+
+def scans_per_minute(start, end, kind=ScanEvent.BREAKDOWN, group_by="team"):
+    """
+    Returns [{minute, group, scans, pieces}] for `kind` scans in [start, end),
+    one row per minute and team (or checker), in time order.
+    """
+    group_field = SCAN_GROUPS[group_by]
+    return (
+        ScanEvent.objects
+        .filter(kind=kind, occurred_at__gte=start, occurred_at__lt=end)
+        .annotate(minute=TruncMinute('occurred_at'), group=F(group_field))
+        .values('minute', 'group')
+        .annotate(scans=Count('id'), pieces=Sum('pcs_received'))
+        .order_by('minute', 'group')
+    )
+
+
+def handover_latencies(start, end, flight_number=None):
+    """
+    Returns [{mawb, flight_number, handover, breakdown, latency}] for MAWBs
+    whose first breakdown scan falls in [start, end): the time from their
+    first towing scan (handover) to that breakdown, longest first. MAWBs
+    that were never towed are left out.
+    """
+    broken_down = ScanEvent.objects.filter(kind=ScanEvent.BREAKDOWN, occurred_at__gte=start, occurred_at__lt=end)
+    if flight_number:
+        broken_down = broken_down.filter(flight_number=flight_number)
+    return (
+        ScanEvent.objects
+        .filter(mawb__in=broken_down.values('mawb'))
+        .values('mawb')
+        .annotate(
+            flight_number=Min('flight_number'),
+            handover=Min('occurred_at', filter=Q(kind=ScanEvent.TOWING)),
+            breakdown=Min('occurred_at', filter=Q(kind=ScanEvent.BREAKDOWN)),
+        )
+        .filter(handover__isnull=False, breakdown__gte=start, breakdown__lt=end)
+        .annotate(latency=ExpressionWrapper(F('breakdown') - F('handover'), output_field=DurationField()))
+        .order_by('-latency', 'mawb')
+    )
@@ -1,3 +1,4 @@
+from django.db import models
 from rest_framework import serializers
 from .models import FlightRecord
 
@@ -5,3 +6,27 @@ class FlightRecordSerializer(serializers.ModelSerializer):
     class Meta:
         model = FlightRecord
         fields = '__all__'
+
+class FlightRecordReadSerializer(serializers.BaseSerializer):
+    """
+    Lean read-only FlightRecord serializer for list endpoints. It renders
+    only the requested fields (all by default), with the same output as
+    FlightRecordSerializer but without building and validating a field per
+    attribute for every record.
+    """
+    FIELDS = [field.name for field in FlightRecord._meta.concrete_fields]
+    DATETIME_FIELDS = {field.name for field in FlightRecord._meta.concrete_fields if isinstance(field, models.DateTimeField)}
+    datetime_field = serializers.DateTimeField()
+
+    def __init__(self, *args, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.render_fields = fields or self.FIELDS
+
+    def to_representation(self, instance):
+        data = {}
+        for name in self.render_fields:
+            value = getattr(instance, name)
+            if value is not None and name in self.DATETIME_FIELDS:
+                value = self.datetime_field.to_representation(value)
+            data[name] = value
+        return data
@@ -0,0 +1,213 @@
+"""
+Importing Google Sheet rows into FlightRecord.
+
+import_sheet_records() upserts the whole sheet in one pass and is run
+periodically (merlinapp.tasks.scheduled_sheet_import or
+`manage.py import_sheet`), so write endpoints find their MAWB in the
+database. fetch_record_from_sheet() is the rare fallback for a MAWB that
+has not been imported yet: a single-row lookup through the MAWB index.
+"""
+from datetime import datetime
+from functools import lru_cache
+
+from django.core.cache import cache
+from django.db.models import Case, F, Q, Value, When
+from django.utils import timezone
+
+from .db import atomic_write
+from .models import FlightRecord, SheetSyncEntry
+from .push import push_changed_mawbs
+from .summaries import refresh_flight_summaries
+from .utils import FIRST_DATA_ROW, authenticate_google_sheets, handle_sheets_error, sheet_columns, sheet_row_index
+
+# Sheet column -> FlightRecord field for the AWB information columns. These
+# come from the flight feeds, so the sheet may update them on existing records.
+AWB_FIELDS = {
+    "Flight #": "flight_number",
+    "Scheduled Arrival Time": "scheduled_arrival_time",
+    "Actual Arrival Time": "actual_arrival_time",
+    "Flight Origin": "flight_origin",
+    "Flight Destination": "flight_destination",
+    "No. of Pcs (AWB)": "pcs_awb",
+    "Gross Weight": "gross_weight",
+    "Commodity Type": "commodity_type",
+}
+# Towing and breakdown columns are owned by the app (the sheet lags behind
+# the outbox), so they are only taken from the sheet for new records
+SCAN_FIELDS = {
+    "BT Number": "bt_number",
+    "Timestamp Handover": "timestamp_start",
+    "Trolley Staff ID": "trolley_staff_id",
+    "No. of Pcs (Received)": "pcs_received",
+}
+
+# How long a MAWB that is not in the sheet is remembered as missing
+MISSING_MAWB_TIMEOUT = 60
+
+
+@lru_cache(maxsize=4096)
+def parse_sheet_datetime(value):
+    """Parses an ISO timestamp from the sheet; cached since flights share their times."""
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value)
+    except (ValueError, TypeError):
+        print(f"Warning: Could not parse timestamp: {value}")
+        return None
+    return parsed if timezone.is_aware(parsed) else timezone.make_aware(parsed)
+
+
+def parse_sheet_int(value):
+    if value in ("", None):
+        return None
+    try:
+        return int(float(value))
+    except (ValueError, TypeError):
+        print(f"Warning: Could not parse number: {value}")
+        return None
+
+
+def parse_sheet_float(value):
+    if value in ("", None):
+        return None
+    try:
+        return float(value)
+    except (ValueError, TypeError):
+        print(f"Warning: Could not parse number: {value}")
+        return None
+
+
+def parse_sheet_text(value):
+    return value or None
+
+
+PARSERS = {
+    "flight_number": parse_sheet_text,
+    "scheduled_arrival_time": parse_sheet_datetime,
+    "actual_arrival_time": parse_sheet_datetime,
+    "flight_origin": parse_sheet_text,
+    "flight_destination": parse_sheet_text,
+    "pcs_awb": parse_sheet_int,
+    "gross_weight": parse_sheet_float,
+    "commodity_type": parse_sheet_text,
+    "bt_number": parse_sheet_text,
+    "timestamp_start": parse_sheet_datetime,
+    "trolley_staff_id": parse_sheet_text,
+    "pcs_received": parse_sheet_int,
+}
+
+
+def parse_sheet_rows(rows):
+    """
+    Turns sheet rows into {MAWB: {field: value}}, parsing one column at a
+    time with a single converter per column. Later duplicates of a MAWB win.
+    """
+    mawb_col = sheet_columns.column("MAWB") - 1
+    rows = [row for row in rows if len(row) > mawb_col and row[mawb_col]]
+    mawbs = [row[mawb_col] for row in rows]
+
+    columns = {}
+    for header, field in {**AWB_FIELDS, **SCAN_FIELDS}.items():
+        col = sheet_columns.column(header) - 1
+        parse = PARSERS[field]
+        columns[field] = [parse(row[col] if len(row) > col else "") for row in rows]
+
+    return {
+        mawb: {field: values[i] for field, values in columns.items()}
+        for i, mawb in enumerate(mawbs)
+    }
+
+
+def discrepancy_expression():
+    """SQL expression for the discrepancy flag, as check_discrepancy computes it."""
+    return Case(
+        When(Q(pcs_awb__isnull=False, pcs_received__isnull=False) & ~Q(pcs_awb=F('pcs_received')), then=Value(True)),
+        default=Value(False),
+    )
+
+
+def import_sheet_records(batch_size=500):
+    """
+    Upserts every sheet row into FlightRecord in one pass: one sheet read,
+    one query for the existing records, and bulk upserts of only the rows
+    that are new or whose AWB information changed. MAWBs with pending
+    outbox entries keep their database values, which the sheet has not
+    caught up with yet. The same read refreshes the MAWB row index.
+    Returns (created, updated).
+    """
+    try:
+        worksheet = authenticate_google_sheets()
+        data = worksheet.get_all_values()
+    except Exception as e:
+        handle_sheets_error(e)
+        raise
+    sheet_row_index.load(data)
+    parsed = parse_sheet_rows(data[FIRST_DATA_ROW - 1:])
+
+    awb_fields = list(AWB_FIELDS.values())
+    existing = {
+        record.mawb: record
+        for record in FlightRecord.objects.filter(mawb__in=list(parsed)).only('mawb', *awb_fields)
+    }
+
+    changed = []
+    created = 0
+    for mawb, fields in parsed.items():
+        record = existing.get(mawb)
+        if record is None:
+            created += 1
+            changed.append(FlightRecord(mawb=mawb, **fields))
+        elif any(getattr(record, field) != fields[field] for field in awb_fields):
+            changed.append(FlightRecord(mawb=mawb, **fields))
+
+    with atomic_write():
+        # The sheet lags behind the outbox: while a MAWB has undrained
+        # writes, its database row is newer than its sheet row
+        pending = set(SheetSyncEntry.objects.filter(processed_at__isnull=True).values_list('mawb', flat=True))
+        changed = [record for record in changed if record.mawb not in existing or record.mawb not in pending]
+        if changed:
+            FlightRecord.objects.bulk_create(
+                changed,
+                batch_size=batch_size,
+                update_conflicts=True,
+                unique_fields=['mawb'],
+                update_fields=awb_fields + ['updated_at'],
+            )
+            # pcs_awb may have changed under an existing pcs_received
+            FlightRecord.objects.filter(mawb__in=[record.mawb for record in changed]).update(
+                discrepancy=discrepancy_expression()
+            )
+            # Bulk writes send no post_save; refresh the new and the previous flights
+            refresh_flight_summaries(
+                {record.flight_number for record in changed}
+                | {existing[record.mawb].flight_number for record in changed if record.mawb in existing}
+            )
+            push_changed_mawbs(
+                [record.mawb for record in changed],
+                previous_flights={mawb: record.flight_number for mawb, record in existing.items()},
+            )
+    return created, len(changed) - created
+
+
+def fetch_record_from_sheet(mawb):
+    """
+    Builds an unsaved FlightRecord from the sheet row of a MAWB that is not in
+    the database yet, or returns None if the sheet does not have it either.
+    Uses the MAWB index (at most a MAWB column read and a one-row read) and
+    remembers misses for a minute so repeated lookups stay cheap. The MAWB
+    cell of the row is checked in the same read, so a row that moved since
+    the index was built makes it revalidate instead of returning another MAWB.
+    """
+    cache_key = f"sheet-missing-mawb:{mawb}"
+    if cache.get(cache_key):
+        return None
+
+    worksheet = authenticate_google_sheets()
+    row_number, values = sheet_row_index.lookup_many(worksheet, [mawb], verify=True).get(mawb, (None, None))
+    fields = parse_sheet_rows([values]).get(mawb) if row_number is not None else None
+    if fields is None:
+        cache.set(cache_key, True, MISSING_MAWB_TIMEOUT)
+        return None
+
+    return FlightRecord(mawb=mawb, **fields)
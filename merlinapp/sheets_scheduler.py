@@ -0,0 +1,198 @@
+"""
+Quota-aware scheduling of Google Sheets API calls.
+
+Sheets enforces separate per-minute quotas for read and write requests.
+Every gspread call made through the client returned by
+utils.get_sheets_client() goes through the process-wide scheduler below:
+callers wait for a token from the read or write bucket, and calls that
+still hit a quota (or a transient server error) are retried with jittered
+exponential backoff instead of failing.
+"""
+import random
+import threading
+import time
+
+import gspread
+import requests
+from django.conf import settings
+
+from .metrics import timed_sheets_call
+
+# gspread methods that hit the API, by the quota they count against
+READ_METHODS = {
+    "open_by_key", "open", "worksheet", "worksheets", "get_all_records", "get_all_values",
+    "get_values", "get", "row_values", "col_values", "batch_get", "acell", "cell", "find", "findall",
+}
+WRITE_METHODS = {
+    "update", "batch_update", "append_row", "append_rows", "format", "batch_format",
+    "delete_rows", "batch_clear", "merge_cells", "add_worksheet", "clear",
+    "insert_row", "insert_rows", "update_cell", "update_cells", "update_acell",
+}
+
+# Quota errors and transient server errors are worth retrying
+RETRYABLE_CODES = {429, 500, 502, 503, 504}
+# Calls that add rows each time they run. A 5xx can come back after the
+# server has applied the call, so retrying one could add the rows twice;
+# they are only retried on 429, which Google returns before doing anything
+NON_IDEMPOTENT_METHODS = {"append_row", "append_rows", "insert_row", "insert_rows", "add_worksheet"}
+
+
+def is_transient_error(error):
+    """True for errors that say the API is throttled or unavailable, not that the request was bad."""
+    if isinstance(error, gspread.exceptions.APIError):
+        return getattr(error, "code", None) in RETRYABLE_CODES
+    return isinstance(error, (requests.exceptions.ConnectionError, requests.exceptions.Timeout))
+
+
+class TokenBucket:
+    """Refills `rate` tokens per second up to `capacity`."""
+    def __init__(self, per_minute, burst=None):
+        self.rate = per_minute / 60.0
+        self.capacity = burst or max(1, per_minute // 6)
+        self.tokens = float(self.capacity)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def try_acquire(self):
+        """Takes a token and returns 0, or returns how long to wait for the next one."""
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return 0
+            return (1 - self.tokens) / self.rate
+
+
+class SheetsScheduler:
+    """Hands out read/write tokens and retries throttled calls."""
+    def __init__(self, reads_per_minute, writes_per_minute, max_retries=5, backoff_base=1.0, backoff_max=32.0):
+        self.buckets = {
+            "read": TokenBucket(reads_per_minute),
+            "write": TokenBucket(writes_per_minute),
+        }
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._lock = threading.Lock()
+        self._stats = {
+            "calls": 0, "retries": 0, "failures": 0,
+            "queue_depth": 0, "max_queue_depth": 0, "throttled_seconds": 0.0,
+        }
+
+    def _add(self, key, value):
+        with self._lock:
+            self._stats[key] += value
+
+    def wait_for_token(self, kind):
+        bucket = self.buckets[kind]
+        wait = bucket.try_acquire()
+        if not wait:
+            return
+        with self._lock:
+            self._stats["queue_depth"] += 1
+            self._stats["max_queue_depth"] = max(self._stats["max_queue_depth"], self._stats["queue_depth"])
+        started = time.monotonic()
+        try:
+            while wait:
+                time.sleep(wait)
+                wait = bucket.try_acquire()
+        finally:
+            with self._lock:
+                self._stats["queue_depth"] -= 1
+                self._stats["throttled_seconds"] += time.monotonic() - started
+
+    def call(self, kind, func, *args, **kwargs):
+        """
+        Runs one API call under the `kind` quota, retrying quota and server
+        errors (only quota errors for NON_IDEMPOTENT_METHODS).
+        """
+        retryable = {429} if getattr(func, "__name__", "") in NON_IDEMPOTENT_METHODS else RETRYABLE_CODES
+        attempt = 0
+        while True:
+            self.wait_for_token(kind)
+            self._add("calls", 1)
+            try:
+                return timed_sheets_call(kind, func, *args, **kwargs)
+            except gspread.exceptions.APIError as e:
+                if getattr(e, "code", None) not in retryable or attempt >= self.max_retries:
+                    self._add("failures", 1)
+                    raise
+                # Full jitter keeps concurrent callers from retrying in lockstep
+                delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+                print(f"Sheets {kind} throttled ({e.code}), retrying in {delay:.2f}s")
+                attempt += 1
+                self._add("retries", 1)
+                self._add("throttled_seconds", delay)
+                time.sleep(delay)
+
+    def stats(self):
+        """Returns call, retry and throttling counters, plus the current queue depth."""
+        with self._lock:
+            return dict(self._stats)
+
+
+class ScheduledProxy:
+    """
+    Wraps a gspread client, spreadsheet or worksheet so that its API calls go
+    through the scheduler. Objects returned by those calls are wrapped too.
+    """
+    def __init__(self, target, scheduler):
+        self._target = target
+        self._scheduler = scheduler
+
+    def __getattr__(self, name):
+        attr = getattr(self._target, name)
+        if name in READ_METHODS:
+            kind = "read"
+        elif name in WRITE_METHODS:
+            kind = "write"
+        else:
+            return attr
+
+        def scheduled(*args, **kwargs):
+            result = self._scheduler.call(kind, attr, *args, **kwargs)
+            return wrap_result(result, self._scheduler)
+        return scheduled
+
+    def __repr__(self):
+        return f"ScheduledProxy({self._target!r})"
+
+
+def wrap_result(result, scheduler):
+    """Wraps spreadsheets and worksheets returned by an API call."""
+    if hasattr(result, "worksheet") or hasattr(result, "row_values"):
+        return ScheduledProxy(result, scheduler)
+    return result
+
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler():
+    """Returns the process-wide scheduler, configured from settings."""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = SheetsScheduler(
+                reads_per_minute=getattr(settings, 'SHEETS_READS_PER_MINUTE', 60),
+                writes_per_minute=getattr(settings, 'SHEETS_WRITES_PER_MINUTE', 60),
+                max_retries=getattr(settings, 'SHEETS_MAX_RETRIES', 5),
+                backoff_base=getattr(settings, 'SHEETS_BACKOFF_BASE', 1.0),
+                backoff_max=getattr(settings, 'SHEETS_BACKOFF_MAX', 32.0),
+            )
+        return _scheduler
+
+
+def scheduled(client):
+    """Returns the client with all of its API calls routed through the scheduler."""
+    return ScheduledProxy(client, get_scheduler())
+
+
+def reset_scheduler():
+    """Drops the process-wide scheduler, so the next call rebuilds it from settings."""
+    global _scheduler
+    with _scheduler_lock:
+        _scheduler = None
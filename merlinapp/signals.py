@@ -0,0 +1,68 @@
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .db import configure_sqlite
+from .metrics import record_query
+from .models import FlightRecord, RecordTombstone
+from .push import push_deleted_record, push_records
+from .suggestions import mawb_index
+from .summaries import refresh_flight_summaries
+
+# FlightRecord fields that FlightSummary totals depend on
+SUMMARY_SOURCE_FIELDS = {'flight_number', 'pcs_awb', 'pcs_received', 'discrepancy', 'bt_number'}
+
+
+@receiver(post_save, sender=FlightRecord)
+def index_saved_record(sender, instance, **kwargs):
+    """Keeps the MAWB autocomplete index current on every save."""
+    mawb_index.add(instance.mawb)
+
+
+@receiver(post_delete, sender=FlightRecord)
+def unindex_deleted_record(sender, instance, **kwargs):
+    mawb_index.remove(instance.mawb)
+
+
+@receiver(post_delete, sender=FlightRecord)
+def record_tombstone(sender, instance, **kwargs):
+    """Leaves a tombstone so that /sync/ clients drop the record too."""
+    RecordTombstone.objects.create(mawb=instance.mawb)
+
+
+@receiver(post_save, sender=FlightRecord)
+def refresh_saved_flight(sender, instance, update_fields=None, **kwargs):
+    """Refreshes the flight summary (and the previous flight's, if it moved) after commit."""
+    if update_fields is not None and not SUMMARY_SOURCE_FIELDS & set(update_fields):
+        return
+    flights = {instance.flight_number, getattr(instance, '_loaded_flight_number', None)}
+    transaction.on_commit(lambda: refresh_flight_summaries(flights))
+
+
+@receiver(post_delete, sender=FlightRecord)
+def refresh_deleted_flight(sender, instance, **kwargs):
+    transaction.on_commit(lambda: refresh_flight_summaries([instance.flight_number]))
+
+
+@receiver(post_save, sender=FlightRecord)
+def push_saved_record(sender, instance, **kwargs):
+    """Pushes the saved record to the screens following its flight after commit."""
+    push_records([instance])
+
+
+@receiver(post_delete, sender=FlightRecord)
+def push_deleted(sender, instance, **kwargs):
+    push_deleted_record(instance)
+
+
+@receiver(connection_created)
+def tune_database_connection(sender, connection, **kwargs):
+    """Applies the SQLite pragmas (WAL, busy timeout, ...) to each new connection."""
+    configure_sqlite(connection)
+
+
+@receiver(connection_created)
+def instrument_database_connection(sender, connection, **kwargs):
+    """Counts and times the queries each request runs on the connection."""
+    connection.execute_wrappers.append(record_query)
@@ -0,0 +1,134 @@
+"""
+In-memory index behind the /mawb-suggestions/ autocomplete.
+"""
+import bisect
+import threading
+import time
+
+
+class MawbIndex:
+    """
+    Per-process sorted list of MAWB numbers, kept case-folded so a prefix
+    lookup is a binary search. Results rank prefix matches first, then
+    other substring matches, both in sorted order. Writers replace the list
+    instead of changing it, so a search can go through the list it started
+    with without holding the lock.
+    """
+    def __init__(self, max_age=60):
+        self.max_age = max_age
+        self._lock = threading.RLock()
+        self._keys = []  # sorted (folded, original) pairs
+        self._members = set()
+        self._loaded_at = None
+
+    def is_loaded(self):
+        return self._loaded_at is not None
+
+    def is_stale(self):
+        return self._loaded_at is None or time.monotonic() - self._loaded_at > self.max_age
+
+    def load(self, mawbs):
+        """Replaces the contents of the index."""
+        members = {mawb for mawb in mawbs if mawb}
+        keys = sorted((mawb.casefold(), mawb) for mawb in members)
+        with self._lock:
+            self._members, self._keys = members, keys
+            self._loaded_at = time.monotonic()
+
+    def reload(self, source):
+        """
+        Replaces the contents with the MAWBs returned by source(), keeping
+        the ones added while it ran. If another load finished in the meantime
+        its contents are newer and are kept instead. Returns True if loaded.
+        """
+        with self._lock:
+            started, before = time.monotonic(), set(self._members)
+        mawbs = source()
+        with self._lock:
+            if self._loaded_at is not None and self._loaded_at >= started:
+                return False
+            self.load(set(mawbs) | (self._members - before))
+            self._loaded_at = started
+            return True
+
+    def add(self, mawb):
+        with self._lock:
+            if mawb and mawb not in self._members:
+                keys = list(self._keys)
+                bisect.insort(keys, (mawb.casefold(), mawb))
+                self._members.add(mawb)
+                self._keys = keys
+
+    def add_many(self, mawbs):
+        with self._lock:
+            new = {mawb for mawb in mawbs if mawb} - self._members
+            if not new:
+                return
+            if len(new) > 100:
+                self.load(self._members | new)
+                return
+            keys = list(self._keys)
+            for mawb in new:
+                bisect.insort(keys, (mawb.casefold(), mawb))
+            self._members |= new
+            self._keys = keys
+
+    def remove(self, mawb):
+        with self._lock:
+            if mawb in self._members:
+                self._members.discard(mawb)
+                key = (mawb.casefold(), mawb)
+                i = bisect.bisect_left(self._keys, key)
+                if i < len(self._keys) and self._keys[i] == key:
+                    self._keys = self._keys[:i] + self._keys[i + 1:]
+
+    def search(self, query, limit=20):
+        """Returns up to `limit` MAWBs containing `query`, prefix matches first."""
+        folded = query.casefold()
+        if not folded:
+            return []
+        with self._lock:
+            keys = self._keys
+        results = []
+        i = bisect.bisect_left(keys, (folded,))
+        while i < len(keys) and len(results) < limit and keys[i][0].startswith(folded):
+            results.append(keys[i][1])
+            i += 1
+        if len(results) < limit:
+            for key, mawb in keys:
+                if folded in key and not key.startswith(folded):
+                    results.append(mawb)
+                    if len(results) >= limit:
+                        break
+        return results
+
+
+mawb_index = MawbIndex()
+_reload_lock = threading.Lock()
+
+
+def current_mawbs():
+    """All MAWBs in FlightRecord and in the sheet rows we already know about."""
+    # Import here to avoid circular imports
+    from .models import FlightRecord
+    from .utils import sheet_row_index
+
+    mawbs = set(FlightRecord.objects.values_list('mawb', flat=True))
+    mawbs.update(sheet_row_index.known_mawbs())
+    return mawbs
+
+
+def get_mawb_index():
+    """
+    Returns the MAWB index, (re)loading it when it is empty or older than
+    max_age. Only one thread reloads it at a time; meanwhile the others keep
+    searching the previous contents, or wait if there are none yet.
+    """
+    if mawb_index.is_stale() and _reload_lock.acquire(blocking=not mawb_index.is_loaded()):
+        try:
+            # Another thread may have reloaded it while we waited
+            if mawb_index.is_stale():
+                mawb_index.reload(current_mawbs)
+        finally:
+            _reload_lock.release()
+    return mawb_index
@@ -0,0 +1,94 @@
+"""
+Per-flight totals (FlightSummary), kept current as FlightRecords change.
+
+Single-record saves and deletes refresh their flight once the transaction
+commits (merlinapp.signals). Bulk writes send no signals, so the bulk
+paths call refresh_flight_summaries() with the flights they touched. A
+refresh recomputes only the given flights, reading their records through
+the flight number index, so its cost does not grow with the table.
+"""
+from django.core.cache import cache
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import Coalesce
+
+from .db import atomic_write
+from .models import FlightRecord, FlightSummary
+
+SUMMARY_FIELDS = ["awb_count", "pcs_expected", "pcs_received", "awbs_received", "open_discrepancies", "towing_started"]
+
+# Summaries are cached per flight; a refresh drops the cached copy, other
+# processes see it within this many seconds
+SUMMARY_CACHE_TIMEOUT = 10
+
+
+def summary_cache_key(flight_number):
+    return f"flight-summary:{flight_number}"
+
+
+def refresh_flight_summaries(flight_numbers=None, batch_size=500):
+    """
+    Recomputes the summaries of the given flights (all flights if None) with
+    one grouped query, upserts them and drops flights without records.
+    """
+    records = FlightRecord.objects.exclude(flight_number=None)
+    if flight_numbers is not None:
+        flight_numbers = {flight for flight in flight_numbers if flight}
+        if not flight_numbers:
+            return
+        records = records.filter(flight_number__in=flight_numbers)
+
+    totals = records.values('flight_number').annotate(
+        awb_count=Count('id'),
+        pcs_expected=Coalesce(Sum('pcs_awb'), 0),
+        # Named apart from the pcs_received field, which the next filter refers to
+        pcs_received_total=Coalesce(Sum('pcs_received'), 0),
+        awbs_received=Count('id', filter=Q(pcs_received__isnull=False)),
+        open_discrepancies=Count('id', filter=Q(discrepancy=True)),
+        towing_started=Count('id', filter=Q(bt_number__isnull=False) & ~Q(bt_number='')),
+    ).order_by()
+    emptied = FlightSummary.objects.all()
+    if flight_numbers is not None:
+        emptied = emptied.filter(flight_number__in=flight_numbers)
+    # Read the totals in the same transaction as the upsert, so that two
+    # refreshes of a flight cannot store totals older than the other's
+    with atomic_write():
+        summaries = [FlightSummary(pcs_received=row.pop('pcs_received_total'), **row) for row in totals]
+        refreshed = {summary.flight_number for summary in summaries}
+        FlightSummary.objects.bulk_create(
+            summaries,
+            batch_size=batch_size,
+            update_conflicts=True,
+            unique_fields=['flight_number'],
+            update_fields=SUMMARY_FIELDS + ['updated_at'],
+        )
+        emptied = emptied.exclude(flight_number__in=refreshed)
+        removed = set(emptied.values_list('flight_number', flat=True))
+        emptied.delete()
+    cache.delete_many([summary_cache_key(flight) for flight in refreshed | removed])
+
+
+def summary_data(summary):
+    data = {field: getattr(summary, field) for field in SUMMARY_FIELDS}
+    data["flight_number"] = summary.flight_number
+    data["updated_at"] = summary.updated_at.isoformat()
+    return data
+
+
+def get_flight_summaries(flight_numbers):
+    """
+    Returns {flight: summary dict} for the given flights from the cache,
+    loading the missing ones with a single query. Unknown flights are left out.
+    """
+    keys = {summary_cache_key(flight): flight for flight in flight_numbers}
+    cached = cache.get_many(keys)
+    result = {keys[key]: data for key, data in cached.items()}
+
+    missing = [flight for key, flight in keys.items() if key not in cached]
+    if missing:
+        loaded = {
+            summary.flight_number: summary_data(summary)
+            for summary in FlightSummary.objects.filter(flight_number__in=missing)
+        }
+        cache.set_many({summary_cache_key(flight): data for flight, data in loaded.items()}, SUMMARY_CACHE_TIMEOUT)
+        result.update(loaded)
+    return result
@@ -0,0 +1,77 @@
+"""
+Delta sync for handhelds that keep a local copy of FlightRecord.
+
+A client sends the watermark of its last sync and gets back the records
+changed since (by updated_at), the MAWBs deleted since (RecordTombstone),
+and a new watermark. Without a watermark it gets a full snapshot.
+
+updated_at is set when a record is saved, just before its transaction
+commits. Changes younger than SYNC_SETTLE_SECONDS are therefore left for
+the next sync. Otherwise a transaction that commits after a sync, with a
+timestamp before that sync's watermark, would never be sent.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import FlightRecord, RecordTombstone
+
+
+def sync_horizon():
+    """The newest point in time that is safe to hand out as a watermark."""
+    return timezone.now() - timedelta(seconds=getattr(settings, 'SYNC_SETTLE_SECONDS', 2))
+
+
+def tombstone_cutoff():
+    """Tombstones older than this are pruned; older watermarks need a full sync."""
+    return timezone.now() - timedelta(days=getattr(settings, 'SYNC_TOMBSTONE_RETENTION_DAYS', 7))
+
+
+def changes_since(since=None, limit=1000, fields=None):
+    """
+    Returns {records, deleted, watermark, has_more, reset}: up to about
+    `limit` records changed after `since` in (updated_at, id) order, the
+    MAWBs deleted in the same span, and the watermark for the next call.
+    With has_more the client should call again straight away. Records that
+    share the last updated_at all go in one page, so a page never ends in
+    the middle of a timestamp. reset means `since` was too old (or
+    missing) and the response is a full snapshot to replace the local copy.
+    """
+    horizon = sync_horizon()
+    reset = since is None or since < tombstone_cutoff()
+    if reset:
+        since = None
+    elif since >= horizon:
+        return {"records": [], "deleted": [], "watermark": since, "has_more": False, "reset": False}
+
+    records = FlightRecord.objects.filter(updated_at__lte=horizon)
+    if fields:
+        records = records.only('id', 'updated_at', *fields)
+    if since is not None:
+        records = records.filter(updated_at__gt=since)
+    records = records.order_by('updated_at', 'id')
+
+    page = list(records[:limit + 1])
+    has_more = len(page) > limit
+    if has_more:
+        page = page[:limit]
+        last = page[-1]
+        page += list(records.filter(updated_at=last.updated_at, id__gt=last.id))
+        watermark = last.updated_at
+    else:
+        watermark = horizon
+
+    deleted = []
+    if since is not None:
+        deleted = list(
+            RecordTombstone.objects.filter(deleted_at__gt=since, deleted_at__lte=watermark)
+            .order_by('deleted_at', 'id').values_list('mawb', flat=True)
+        )
+    return {"records": page, "deleted": deleted, "watermark": watermark, "has_more": has_more, "reset": reset}
+
+
+def prune_tombstones():
+    """Deletes tombstones past their retention; returns how many."""
+    deleted, _ = RecordTombstone.objects.filter(deleted_at__lt=tombstone_cutoff()).delete()
+    return deleted
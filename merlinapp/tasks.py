@@ -1,10 +1,35 @@
 from celery import shared_task
-from .views import merge_data
-from django.http import HttpRequest
+from .outbox import drain_sheet_outbox, prune_sheet_outbox
+from .sheet_import import import_sheet_records
+from .sync import prune_tombstones
+from .upstream import ingest_flights
 
 @shared_task
 def scheduled_data_merge():
-    """Task to periodically call the merge_data function"""
-    request = HttpRequest()
-    merge_data(request)
-    return "Data merge completed successfully"
\ No newline at end of file
+    """Task to periodically ingest a batch of flights from the upstream feeds"""
+    created, updated = ingest_flights()
+    return f"Data merge completed: {created} created, {updated} updated"
+
+@shared_task
+def drain_sheet_sync_outbox():
+    """Task to periodically push queued FlightRecord changes to the Google Sheet"""
+    synced = drain_sheet_outbox()
+    return f"Synced {synced} outbox entries"
+
+@shared_task
+def scheduled_sheet_import():
+    """Task to periodically upsert the Google Sheet into FlightRecord"""
+    created, updated = import_sheet_records()
+    return f"Imported sheet: {created} created, {updated} updated"
+
+@shared_task
+def prune_record_tombstones():
+    """Task to periodically delete sync tombstones past their retention"""
+    pruned = prune_tombstones()
+    return f"Pruned {pruned} record tombstones"
+
+@shared_task
+def prune_sheet_sync_outbox():
+    """Task to periodically delete processed outbox entries past their retention"""
+    pruned = prune_sheet_outbox()
+    return f"Pruned {pruned} outbox entries"
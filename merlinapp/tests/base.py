@@ -0,0 +1,62 @@
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from ..fake_sheets import get_fake_client, reset_fake_client
+from ..models import FlightRecord
+from ..sheets_scheduler import reset_scheduler
+from ..suggestions import mawb_index
+from ..utils import authenticate_google_sheets, build_sheet_cells, invalidate_google_sheets_cache, sheet_columns
+
+
+@override_settings(
+    SHEETS_BACKEND='fake',
+    SHEET_SYNC_COALESCE_SECONDS=0,
+    SHEETS_READS_PER_MINUTE=60000,
+    SHEETS_WRITES_PER_MINUTE=60000,
+    SHEETS_BACKOFF_BASE=0.001,
+    SHEETS_BACKOFF_MAX=0.01,
+)
+class FakeSheetsTestCase(TestCase):
+    """
+    Runs against the in-process fake Sheets backend with a fresh, empty
+    worksheet, unthrottled quotas and no outbox coalescing window.
+    """
+    def setUp(self):
+        reset_fake_client()
+        reset_scheduler()
+        invalidate_google_sheets_cache()
+        cache.clear()
+        mawb_index.load([])
+        mawb_index._loaded_at = None
+        self.addCleanup(invalidate_google_sheets_cache)
+        self.addCleanup(reset_scheduler)
+        self.addCleanup(reset_fake_client)
+        self.sheet = authenticate_google_sheets()._target
+        self.calls().clear()
+
+    def reset_sheets_client(self):
+        """Rebuilds the scheduler and the client around the same fake, to pick up changed settings."""
+        reset_scheduler()
+        invalidate_google_sheets_cache()
+
+    def calls(self):
+        """The fake backend's per-method call counter."""
+        return get_fake_client().backend.calls
+
+    def sheet_rows(self):
+        """Data rows of the worksheet as {MAWB: {header: value}}."""
+        return {
+            cells["MAWB"]: cells
+            for cells in map(sheet_columns.to_cells, self.sheet.rows[2:])
+            if cells["MAWB"]
+        }
+
+    def add_sheet_rows(self, records):
+        """Appends FlightRecords (saved or not) to the sheet as rows, bypassing the app."""
+        self.sheet._append([sheet_columns.to_row(build_sheet_cells(record)) for record in records])
+
+    def create_records(self, count, prefix="MAWB", **fields):
+        return FlightRecord.objects.bulk_create([
+            FlightRecord(mawb=f"{prefix}{i:04d}", flight_number=f"BA{100 + i % 5}", pcs_awb=100, **fields)
+            for i in range(count)
+        ])
@@ -0,0 +1,28 @@
+import sys
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from ..apps import MerlinappConfig
+
+
+class ServesRequestsTests(SimpleTestCase):
+    def serves_requests(self, argv, modules=(), run_main=None):
+        environ = {"RUN_MAIN": run_main} if run_main else {}
+        with mock.patch.object(sys, "argv", argv), \
+                mock.patch.dict(sys.modules, {module: mock.Mock() for module in modules}), \
+                mock.patch.dict("os.environ", environ):
+            for module in {"merlin.wsgi", "merlin.asgi"} - set(modules):
+                sys.modules.pop(module, None)
+            return MerlinappConfig._serves_requests()
+
+    def test_web_servers(self):
+        self.assertTrue(self.serves_requests(["gunicorn", "merlin.wsgi"], ["merlin.wsgi"]))
+        self.assertTrue(self.serves_requests(["uvicorn", "merlin.asgi:application"], ["merlin.asgi"]))
+        self.assertTrue(self.serves_requests(["manage.py", "runserver"], run_main="true"))
+
+    def test_other_processes(self):
+        self.assertFalse(self.serves_requests(["celery", "-A", "merlin", "worker"]))
+        self.assertFalse(self.serves_requests(["manage.py", "drain_sheet_outbox", "--loop"]))
+        # The autoreloader parent of runserver
+        self.assertFalse(self.serves_requests(["manage.py", "runserver"]))
@@ -0,0 +1,63 @@
+from django.core.cache import cache
+from django.test import TestCase
+
+from .. import utils
+from ..fake_sheets import get_fake_client
+from ..models import FlightRecord
+from ..push import broker, event_stream
+from ..utils import SHEETS_ERROR_MESSAGES
+from .base import FakeSheetsTestCase
+
+
+class AsyncThrottleTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    async def test_async_views_share_the_anonymous_rate_limit(self):
+        # 'anon': '100/minute', counted across the sync and async views
+        for _ in range(50):
+            self.assertEqual((await self.async_client.get("/api/async/mawb-by-flight/", {"flight": "BA100"})).status_code, 200)
+        for _ in range(50):
+            self.assertEqual((await self.async_client.get("/api/mawb-by-flight/", {"flight": "BA100"})).status_code, 200)
+
+        response = await self.async_client.get("/api/async/mawb-by-flight/", {"flight": "BA100"})
+        self.assertEqual(response.status_code, 429)
+        self.assertIn("Request was throttled", response.json()["detail"])
+        self.assertTrue(response.has_header("Retry-After"))
+        # Other clients are not affected
+        response = await self.async_client.get(
+            "/api/async/mawb-by-flight/", {"flight": "BA100"}, headers={"X-Forwarded-For": "10.0.0.2"}
+        )
+        self.assertEqual(response.status_code, 200)
+
+
+class RecordEventsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    async def test_subscribes_only_while_the_stream_is_read(self):
+        response = await self.async_client.get("/api/async/events/", {"flight": "BA100"})
+        self.assertEqual(response.status_code, 200)
+        # A client that goes away before the first event leaves no subscription
+        self.assertFalse(broker.has_subscribers())
+
+        stream = event_stream(["BA100"])
+        self.assertTrue((await anext(stream)).startswith("retry: "))
+        self.assertEqual(broker.subscriber_count(), 1)
+        await stream.aclose()
+        self.assertFalse(broker.has_subscribers())
+
+
+class AsyncSheetsErrorTests(FakeSheetsTestCase):
+    def setUp(self):
+        super().setUp()
+        self.add_sheet_rows([FlightRecord(mawb="MAWB0001", flight_number="BA100", pcs_awb=10)])
+
+    async def test_auth_errors_are_a_clear_503(self):
+        get_fake_client().backend.fail("get_all_values", 403, times=1)
+        response = await self.async_client.post(
+            "/api/async/update-bt/", {"mawb": "MAWB0001", "bt_number": "BT7"}, content_type="application/json"
+        )
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.json(), {"error": SHEETS_ERROR_MESSAGES[403]})
+        self.assertIsNone(utils._sheets_worksheet)
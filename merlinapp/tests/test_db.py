@@ -0,0 +1,37 @@
+import os
+import sqlite3
+import tempfile
+
+from django.db import connection
+from django.test import SimpleTestCase
+
+
+class ConfigureSqliteTests(SimpleTestCase):
+    def setUp(self):
+        tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmpdir.cleanup)
+        self.path = os.path.join(tmpdir.name, "db.sqlite3")
+
+    def journal_mode(self):
+        """Opens the file through Django, as the app does, and returns its journal mode."""
+        wrapper = connection.copy()
+        wrapper.settings_dict["NAME"] = self.path
+        try:
+            with wrapper.cursor() as cursor:
+                cursor.execute("PRAGMA journal_mode")
+                return cursor.fetchone()[0]
+        finally:
+            wrapper.close()
+
+    def test_new_databases_use_wal(self):
+        self.assertEqual(self.journal_mode(), "wal")
+
+    def test_existing_databases_are_not_rewritten(self):
+        with sqlite3.connect(self.path) as db:
+            db.execute("CREATE TABLE t (id INTEGER)")
+        with open(self.path, "rb") as f:
+            header = f.read(100)
+
+        self.assertEqual(self.journal_mode(), "delete")
+        with open(self.path, "rb") as f:
+            self.assertEqual(f.read(100), header)
@@ -0,0 +1,125 @@
+from datetime import timedelta
+
+from django.test import override_settings
+from django.utils import timezone
+
+from ..models import FlightRecord, SheetSyncEntry
+from ..outbox import drain_sheet_outbox, enqueue_sheet_sync, prune_sheet_outbox
+from .base import FakeSheetsTestCase
+
+
+def writes_row(row_number):
+    """`when` predicate for batch_update calls that write to a given sheet row."""
+    return lambda data: any(item["range"].endswith(f"{row_number}") for item in data)
+
+
+@override_settings(SHEET_SYNC_RETRY_BASE_SECONDS=0, SHEET_SYNC_MAX_ATTEMPTS=3)
+class DrainSheetOutboxTests(FakeSheetsTestCase):
+    def setUp(self):
+        super().setUp()
+        self.records = self.create_records(3)
+        # Rows 3, 4 and 5
+        self.add_sheet_rows(self.records)
+        self.calls().clear()
+
+    def receive(self, record, pcs_received):
+        record.pcs_received = pcs_received
+        record.save()
+        return enqueue_sheet_sync(record, "breakdown", checker_id="C1", team_name="Team A")
+
+    def test_merges_the_changes_of_a_mawb_into_one_write(self):
+        record = self.records[0]
+        self.receive(record, 90)
+        record.bt_number = "BT1"
+        record.save()
+        enqueue_sheet_sync(record, "towing", bt_number="BT1", trolley_staff_id="T1")
+
+        self.assertEqual(drain_sheet_outbox(), 2)
+        row = self.sheet_rows()[record.mawb]
+        self.assertEqual((row["No. of Pcs (Received)"], row["Checker ID"], row["BT Number"]), ("90", "C1", "BT1"))
+        self.assertEqual(self.calls()["batch_update"], 1)
+        self.assertFalse(SheetSyncEntry.objects.filter(processed_at__isnull=True).exists())
+
+    @override_settings(SHEET_SYNC_COALESCE_SECONDS=5, SHEET_SYNC_MAX_DELAY_SECONDS=30)
+    def test_coalesces_until_the_mawb_is_quiet(self):
+        entry = self.receive(self.records[0], 90)
+        self.assertEqual(drain_sheet_outbox(), 0)
+        self.assertEqual(drain_sheet_outbox(force=True), 1)
+
+        first = self.receive(self.records[1], 80)
+        SheetSyncEntry.objects.filter(id=first.id).update(created_at=timezone.now() - timedelta(seconds=6))
+        self.assertEqual(drain_sheet_outbox(), 1)
+
+        # A MAWB that keeps changing is still pushed after the maximum delay
+        oldest = self.receive(self.records[2], 70)
+        SheetSyncEntry.objects.filter(id=oldest.id).update(created_at=timezone.now() - timedelta(seconds=31))
+        self.receive(self.records[2], 71)
+        self.assertEqual(drain_sheet_outbox(), 2)
+        self.assertEqual(self.sheet_rows()[self.records[2].mawb]["No. of Pcs (Received)"], "71")
+        self.assertFalse(SheetSyncEntry.objects.filter(id=entry.id, processed_at__isnull=True).exists())
+
+    def test_a_rejected_entry_does_not_hold_back_the_others(self):
+        poisoned = self.receive(self.records[1], 1)
+        for record in (self.records[0], self.records[2]):
+            self.receive(record, 99)
+        self.sheet.backend.fail("batch_update", 400, when=writes_row(4))
+
+        # The batch fails, then each MAWB is retried on its own
+        self.assertEqual(drain_sheet_outbox(), 2)
+        rows = self.sheet_rows()
+        self.assertEqual(rows[self.records[0].mawb]["No. of Pcs (Received)"], "99")
+        self.assertEqual(rows[self.records[1].mawb]["No. of Pcs (Received)"], "")
+        poisoned.refresh_from_db()
+        self.assertEqual(poisoned.attempts, 1)
+        self.assertIsNotNone(poisoned.retry_at)
+        self.assertIn("Injected", poisoned.last_error)
+
+        # Set aside after SHEET_SYNC_MAX_ATTEMPTS
+        self.assertEqual(drain_sheet_outbox(), 0)
+        self.assertEqual(drain_sheet_outbox(), 0)
+        poisoned.refresh_from_db()
+        self.assertEqual(poisoned.attempts, 3)
+        self.assertIsNotNone(poisoned.failed_at)
+        self.calls().clear()
+        self.assertEqual(drain_sheet_outbox(), 0)
+        self.assertEqual(sum(self.calls().values()), 0)
+
+        # ...and later changes to other MAWBs still go through
+        self.receive(self.records[0], 98)
+        self.assertEqual(drain_sheet_outbox(), 1)
+
+    @override_settings(SHEETS_MAX_RETRIES=0, SHEET_SYNC_RETRY_BASE_SECONDS=60)
+    def test_an_outage_backs_off_without_giving_up(self):
+        self.reset_sheets_client()
+        for record in self.records:
+            self.receive(record, 99)
+        self.sheet.backend.fail("batch_update", 503, times=3)
+
+        self.assertEqual(drain_sheet_outbox(), 0)
+        # The whole batch waits; nothing was retried one by one
+        self.assertEqual(self.calls()["batch_update"], 1)
+        entries = SheetSyncEntry.objects.all()
+        self.assertTrue(all(entry.attempts == 1 and entry.failed_at is None for entry in entries))
+        self.assertTrue(all(entry.retry_at > timezone.now() + timedelta(seconds=50) for entry in entries))
+        self.assertEqual(drain_sheet_outbox(), 0)
+
+        for _ in range(3):
+            SheetSyncEntry.objects.update(retry_at=None)
+            drain_sheet_outbox()
+        self.assertFalse(SheetSyncEntry.objects.filter(failed_at__isnull=False).exists())
+        self.assertEqual(SheetSyncEntry.objects.filter(processed_at__isnull=False).count(), 3)
+
+    def test_entries_of_deleted_records_are_dropped(self):
+        self.receive(self.records[0], 90)
+        FlightRecord.objects.filter(mawb=self.records[0].mawb).delete()
+        self.assertEqual(drain_sheet_outbox(), 1)
+        self.assertEqual(sum(self.calls().values()), 0)
+
+    def test_prunes_processed_entries(self):
+        done = self.receive(self.records[0], 90)
+        drain_sheet_outbox()
+        pending = self.receive(self.records[1], 90)
+        SheetSyncEntry.objects.filter(id=done.id).update(processed_at=timezone.now() - timedelta(hours=25))
+
+        self.assertEqual(prune_sheet_outbox(), 1)
+        self.assertEqual(list(SheetSyncEntry.objects.values_list('id', flat=True)), [pending.id])
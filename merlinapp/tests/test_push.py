@@ -0,0 +1,69 @@
+import asyncio
+import json
+
+from django.db import transaction
+from django.test import TestCase
+
+from ..models import FlightRecord
+from ..push import broker
+
+
+class RecordPushTests(TestCase):
+    """Events queued for a screen following BA100, as its event loop receives them."""
+    def setUp(self):
+        self.loop = asyncio.new_event_loop()
+        self.addCleanup(self.loop.close)
+        self.subscription = self.loop.run_until_complete(self.subscribe(["BA100"]))
+        self.addCleanup(broker.unsubscribe, self.subscription)
+        self.record = FlightRecord.objects.create(mawb="MAWB0001", flight_number="BA100", pcs_awb=10)
+
+    async def subscribe(self, flights):
+        return broker.subscribe(flights)
+
+    def events(self):
+        """Lets the loop run the deliveries handed to it, then returns the queued (event, data) pairs."""
+        self.loop.run_until_complete(asyncio.sleep(0))
+        events = []
+        while not self.subscription.queue.empty():
+            event, data = self.subscription.queue.get_nowait().splitlines()[:2]
+            events.append((event.removeprefix("event: "), json.loads(data.removeprefix("data: "))))
+        return events
+
+    def test_pushes_a_saved_record_after_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.record.pcs_received = 9
+            self.record.save()
+            self.assertEqual(self.events(), [])
+
+        [(event, data)] = self.events()
+        self.assertEqual((event, data["mawb"], data["pcs_received"], data["discrepancy"]), ("record", "MAWB0001", 9, False))
+
+    def test_pushes_nothing_for_a_rolled_back_save(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            with self.assertRaises(ValueError), transaction.atomic():
+                self.record.save()
+                raise ValueError
+        self.assertEqual(self.events(), [])
+
+    def test_pushes_only_to_the_flights_involved(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            FlightRecord.objects.create(mawb="MAWB0002", flight_number="BA101", pcs_awb=10)
+            # Moving a record away tells its old flight too
+            record = FlightRecord.objects.get(mawb="MAWB0001")
+            record.flight_number = "BA101"
+            record.save()
+        self.assertEqual([(event, data["mawb"], data["flight_number"]) for event, data in self.events()], [
+            ("record", "MAWB0001", "BA101"),
+        ])
+
+    def test_pushes_deletions_and_batch_updates(self):
+        FlightRecord.objects.create(mawb="MAWB0002", flight_number="BA100", pcs_awb=10)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post("/api/batch-update/", {
+                "records": [{"mawb": "MAWB0001", "pcs_received": 10}, {"mawb": "MAWB0002", "pcs_received": 5}],
+            }, content_type="application/json")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.record.delete()
+        self.assertEqual([(event, data["mawb"], data.get("pcs_received")) for event, data in self.events()], [
+            ("record", "MAWB0001", 10), ("record", "MAWB0002", 5), ("deleted", "MAWB0001", None),
+        ])
@@ -0,0 +1,178 @@
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from ..models import FlightRecord, RecordTombstone, ScanEvent
+from ..scans import breakdown_event, towing_event
+from ..suggestions import mawb_index
+
+TABLES = (FlightRecord._meta.db_table, ScanEvent._meta.db_table, RecordTombstone._meta.db_table)
+
+
+def query_plan(sql, params=()):
+    """Returns the detail column of SQLite's EXPLAIN QUERY PLAN for a statement."""
+    with connection.cursor() as cursor:
+        cursor.execute(f"EXPLAIN QUERY PLAN {sql}", params)
+        return [row[-1] for row in cursor.fetchall()]
+
+
+class QueryPlanTests(TestCase):
+    """
+    Every query the endpoints run against FlightRecord and ScanEvent must be
+    served by an index search. A SCAN step reads the whole table, or the
+    whole of an index (even a covering one), and gets slower with every row,
+    so it fails unless the test names the index it expects to be walked.
+    """
+    @classmethod
+    def setUpTestData(cls):
+        now = timezone.now()
+        FlightRecord.objects.bulk_create([
+            FlightRecord(
+                mawb=f"MAWB{i:04d}",
+                flight_number=f"BA{100 + i % 20}",
+                actual_arrival_time=now + timedelta(minutes=i),
+                pcs_awb=100,
+                pcs_received=100 if i % 10 else 90,
+                discrepancy=not i % 10,
+                bt_number=f"BT{i}" if i % 3 == 0 else None,
+                trolley_staff_id=f"T{i % 5}" if i % 3 == 0 else None,
+            )
+            for i in range(200)
+        ])
+        records = FlightRecord.objects.filter(bt_number__isnull=False)
+        ScanEvent.objects.bulk_create(
+            [towing_event(record, record.trolley_staff_id) for record in records]
+            + [breakdown_event(record, "C1", "Team A") for record in records]
+        )
+
+    def setUp(self):
+        # Keep the rate limit and the MAWB index from leaking between tests
+        cache.clear()
+        mawb_index.load([])
+        mawb_index._loaded_at = None
+
+    def assertUsesIndex(self, plan, index=None, sql="", scans=()):
+        """
+        Checks that every step on our tables is a SEARCH, apart from SCANs of
+        the indexes in `scans`, and that `index`, if given, is searched.
+        """
+        steps = [step for step in plan if any(table in step for table in TABLES)]
+        self.assertTrue(steps, f"No step on {TABLES} in plan {plan} for {sql}")
+        for step in steps:
+            if step.startswith("SCAN"):
+                self.assertTrue(
+                    any(step.endswith(f"INDEX {name}") for name in scans), f"Unexpected scan in plan {plan} for {sql}"
+                )
+            else:
+                self.assertTrue(step.startswith("SEARCH"), f"Unexpected step in plan {plan} for {sql}")
+        if index:
+            self.assertTrue(
+                any(step.startswith("SEARCH") and f"INDEX {index} (" in step for step in steps),
+                f"{index} not searched in plan {plan} for {sql}",
+            )
+
+    def assertEndpointUsesIndexes(self, method, path, data=None, scans=()):
+        with CaptureQueriesContext(connection) as queries:
+            if method == "get":
+                response = self.client.get(path, data)
+            else:
+                response = self.client.post(path, data, content_type="application/json")
+        self.assertLess(response.status_code, 400, response.content)
+        checked = 0
+        for query in queries.captured_queries:
+            sql = query["sql"]
+            if any(table in sql for table in TABLES) and sql.startswith(("SELECT", "UPDATE", "DELETE")):
+                self.assertUsesIndex(query_plan(sql), sql=sql, scans=scans)
+                checked += 1
+        self.assertTrue(checked, f"{path} ran no FlightRecord or ScanEvent queries")
+
+    def test_mawb_suggestions(self):
+        # Loading the in-memory MAWB index reads every MAWB, once a minute at most
+        self.assertEndpointUsesIndexes(
+            "get", "/api/mawb-suggestions/", {"query": "MAWB01"}, scans=("sqlite_autoindex_merlinapp_flightrecord_1",)
+        )
+        # Served from memory once loaded
+        self.assertNumQueries(0, self.client.get, "/api/mawb-suggestions/", {"query": "MAWB01"})
+
+    def test_flight_suggestions(self):
+        # Enough prefix matches: only the range scan runs
+        self.assertEndpointUsesIndexes("get", "/api/flight-suggestions/", {"query": "BA1"})
+        # Too few: the substring fallback walks the whole index
+        self.assertEndpointUsesIndexes(
+            "get", "/api/flight-suggestions/", {"query": "05"}, scans=("flightrecord_flight_mawb_idx",)
+        )
+        self.assertEqual(self.client.get("/api/flight-suggestions/", {"query": "ba10", "limit": 3}).json(), [
+            "BA100", "BA101", "BA102",
+        ])
+        self.assertEqual(self.client.get("/api/flight-suggestions/", {"query": "05"}).json(), ["BA105"])
+        self.assertEqual(self.client.get("/api/flight-suggestions/", {"query": "A11"}).json(), [
+            f"BA11{i}" for i in range(10)
+        ])
+
+    def test_flight_suggestions_in_arrival_window(self):
+        now = timezone.now()
+        self.assertEndpointUsesIndexes("get", "/api/flight-suggestions/", {
+            "query": "BA1",
+            "arrival_after": now.isoformat(),
+            "arrival_before": (now + timedelta(hours=1)).isoformat(),
+        })
+
+    def test_mawb_by_flight(self):
+        self.assertEndpointUsesIndexes("get", "/api/mawb-by-flight/", {"flight": "BA105"})
+        self.assertEndpointUsesIndexes("get", "/api/mawb-by-flight/", {
+            "flight": "BA105", "arrival_after": timezone.now().isoformat(),
+        })
+
+    def test_update_received(self):
+        self.assertEndpointUsesIndexes("post", "/api/update/", {"mawb": "MAWB0005", "pcs_received": 3})
+
+    def test_batch_update_received(self):
+        self.assertEndpointUsesIndexes("post", "/api/batch-update/", {
+            "records": [{"mawb": "MAWB0005", "pcs_received": 3}, {"mawb": "MAWB0006", "pcs_received": 4}],
+        })
+
+    def test_update_bt_number(self):
+        self.assertEndpointUsesIndexes("post", "/api/update-bt/", {"mawb": "MAWB0005", "bt_number": "BT9"})
+
+    def test_list_records(self):
+        # The first page walks the index in order and stops at the limit
+        self.assertEndpointUsesIndexes(
+            "get", "/api/records/", {"fields": "mawb,pcs_received"}, scans=("flightrecord_updated_idx",)
+        )
+        cursor = self.client.get("/api/records/", {"limit": 10}).json()["next_cursor"]
+        self.assertEndpointUsesIndexes("get", "/api/records/", {"cursor": cursor, "limit": 10})
+
+    def test_sync_records(self):
+        FlightRecord.objects.filter(mawb="MAWB0199").delete()
+        self.assertEndpointUsesIndexes("get", "/api/sync/", {"limit": 10})
+        since = (timezone.now() - timedelta(hours=1)).isoformat()
+        self.assertEndpointUsesIndexes("get", "/api/sync/", {"since": since, "fields": "pcs_received"})
+
+    def test_scan_rate(self):
+        self.assertEndpointUsesIndexes("get", "/api/scan-rate/")
+        self.assertEndpointUsesIndexes("get", "/api/scan-rate/", {"kind": "towing", "group_by": "checker"})
+
+    def test_handover_latency(self):
+        self.assertEndpointUsesIndexes("get", "/api/handover-latency/")
+        self.assertEndpointUsesIndexes("get", "/api/handover-latency/", {"flight": "BA100"})
+
+    def test_lookup_indexes(self):
+        since = timezone.now() - timedelta(hours=1)
+        lookups = {
+            "flightrecord_flight_mawb_idx": FlightRecord.objects.filter(flight_number="BA105").order_by("mawb"),
+            "flightrecord_arrival_idx": FlightRecord.objects.filter(
+                actual_arrival_time__gte=since, actual_arrival_time__lt=since + timedelta(hours=2)
+            ),
+            "flightrecord_updated_idx": FlightRecord.objects.filter(updated_at__gt=since).order_by("updated_at", "id"),
+            "flightrecord_open_disc_idx": FlightRecord.objects.filter(discrepancy=True, flight_number="BA100"),
+            "flightrecord_bt_idx": FlightRecord.objects.filter(bt_number="BT3"),
+            "flightrecord_trolley_staff_idx": FlightRecord.objects.filter(trolley_staff_id="T1").order_by("timestamp_start"),
+        }
+        for index, queryset in lookups.items():
+            with self.subTest(index=index):
+                sql, params = queryset.query.sql_with_params()
+                self.assertUsesIndex(query_plan(sql, params), index, sql)
@@ -0,0 +1,86 @@
+import gspread
+
+from .. import utils
+from ..fake_sheets import get_fake_client
+from ..models import FlightRecord
+from ..outbox import drain_sheet_outbox, enqueue_sheet_sync
+from ..sheet_import import fetch_record_from_sheet, import_sheet_records
+from ..utils import authenticate_google_sheets, sheet_row_index
+from .base import FakeSheetsTestCase
+
+
+class ImportSheetRecordsTests(FakeSheetsTestCase):
+    def setUp(self):
+        super().setUp()
+        self.add_sheet_rows([
+            FlightRecord(mawb=f"MAWB{i:04d}", flight_number="BA157", pcs_awb=10 + i)
+            for i in range(5)
+        ])
+
+    def test_creates_records_then_is_idempotent(self):
+        self.assertEqual(import_sheet_records(), (5, 0))
+        self.assertEqual(FlightRecord.objects.count(), 5)
+        self.assertEqual(FlightRecord.objects.get(mawb="MAWB0003").pcs_awb, 13)
+
+        self.calls().clear()
+        self.assertEqual(import_sheet_records(), (0, 0))
+        # One full read, no writes
+        self.assertEqual(dict(self.calls()), {"get_all_values": 1})
+
+    def test_takes_awb_changes_from_the_sheet(self):
+        import_sheet_records()
+        self.sheet.update("A3", [["BA999"]])
+
+        self.assertEqual(import_sheet_records(), (0, 1))
+        self.assertEqual(FlightRecord.objects.get(mawb="MAWB0000").flight_number, "BA999")
+
+    def test_keeps_database_values_with_pending_outbox_writes(self):
+        import_sheet_records()
+        record = FlightRecord.objects.get(mawb="MAWB0001")
+        record.flight_number = "NEW123"
+        record.save()
+        enqueue_sheet_sync(record)
+
+        # The import runs before the drain has pushed the new flight
+        self.assertEqual(import_sheet_records(), (0, 0))
+        self.assertEqual(FlightRecord.objects.get(mawb="MAWB0001").flight_number, "NEW123")
+
+        self.assertEqual(drain_sheet_outbox(), 1)
+        self.assertEqual(self.sheet_rows()["MAWB0001"]["Flight #"], "NEW123")
+        self.assertEqual(import_sheet_records(), (0, 0))
+
+    def test_sheet_not_found_drops_the_cached_client(self):
+        get_fake_client().backend.fail("get_all_values", 404, times=1)
+        with self.assertRaises(gspread.exceptions.APIError):
+            import_sheet_records()
+        self.assertIsNone(utils._sheets_worksheet)
+        self.assertEqual(import_sheet_records(), (5, 0))
+
+
+class FetchRecordFromSheetTests(FakeSheetsTestCase):
+    def setUp(self):
+        super().setUp()
+        self.add_sheet_rows([
+            FlightRecord(mawb=f"MAWB{i:04d}", flight_number=f"BA{100 + i}", pcs_awb=10 + i)
+            for i in range(5)
+        ])
+        # Build the row index, as an earlier lookup would
+        sheet_row_index.lookup(authenticate_google_sheets(), "MAWB0000")
+
+    def test_returns_the_row_of_the_mawb(self):
+        record = fetch_record_from_sheet("MAWB0003")
+        self.assertEqual((record.mawb, record.flight_number, record.pcs_awb), ("MAWB0003", "BA103", 13))
+
+    def test_follows_rows_moved_by_hand(self):
+        # The sheet is sorted the other way round after the index was built
+        self.sheet.rows[2:] = self.sheet.rows[:1:-1]
+
+        record = fetch_record_from_sheet("MAWB0001")
+        self.assertEqual((record.mawb, record.flight_number, record.pcs_awb), ("MAWB0001", "BA101", 11))
+        self.assertEqual(sheet_row_index.lookup(authenticate_google_sheets(), "MAWB0001")[0], 6)
+
+    def test_row_deleted_by_hand_is_a_miss(self):
+        del self.sheet.rows[3]
+
+        self.assertIsNone(fetch_record_from_sheet("MAWB0001"))
+        self.assertIsNotNone(fetch_record_from_sheet("MAWB0002"))
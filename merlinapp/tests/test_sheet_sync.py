@@ -0,0 +1,38 @@
+from ..utils import sync_records_to_sheet
+from .base import FakeSheetsTestCase
+
+
+class SyncRecordsToSheetTests(FakeSheetsTestCase):
+    def setUp(self):
+        super().setUp()
+        self.records = self.create_records(3)
+        # Rows 3, 4 and 5
+        self.add_sheet_rows(self.records)
+        # The first sync builds the row index from a full read
+        sync_records_to_sheet([(self.records[0], {}, "towing")])
+        self.calls().clear()
+
+    def tow(self, record, bt_number):
+        record.bt_number = bt_number
+        sync_records_to_sheet([(record, {"bt_number": bt_number, "trolley_staff_id": "T1"}, "towing")])
+
+    def test_checks_cached_rows_before_a_section_write(self):
+        self.tow(self.records[1], "BT1")
+
+        self.assertEqual(self.sheet_rows()[self.records[1].mawb]["BT Number"], "BT1")
+        self.assertEqual(
+            (self.calls()["batch_get"], self.calls()["col_values"], self.calls()["batch_update"]), (1, 0, 1)
+        )
+
+    def test_section_writes_follow_rows_moved_by_hand(self):
+        first, second, third = self.records
+        # Someone sorts the sheet in the browser
+        self.sheet.rows[2:] = self.sheet.rows[2:][::-1]
+
+        self.tow(first, "BT1")
+
+        rows = self.sheet_rows()
+        self.assertEqual(rows[first.mawb]["BT Number"], "BT1")
+        self.assertEqual((rows[second.mawb]["BT Number"], rows[third.mawb]["BT Number"]), ("", ""))
+        # The mismatch costs one MAWB column read
+        self.assertEqual((self.calls()["batch_get"], self.calls()["col_values"]), (1, 1))
@@ -0,0 +1,63 @@
+from unittest import mock
+
+import gspread
+from django.test import SimpleTestCase
+
+from ..fake_sheets import FakeSheetsBackend, FakeWorksheet
+from ..sheets_scheduler import ScheduledProxy, SheetsScheduler
+
+
+class SheetsSchedulerTests(SimpleTestCase):
+    def setUp(self):
+        self.backend = FakeSheetsBackend()
+        self.scheduler = SheetsScheduler(60000, 60000, max_retries=3, backoff_base=1.0, backoff_max=3.0)
+        self.worksheet = ScheduledProxy(FakeWorksheet(self.backend, "SATS"), self.scheduler)
+        # Take the largest delay the jitter allows and do not actually wait
+        patcher = mock.patch("merlinapp.sheets_scheduler.random.uniform", side_effect=lambda low, high: high)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = mock.patch("merlinapp.sheets_scheduler.time.sleep")
+        self.sleep = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def sleeps(self):
+        return [call.args[0] for call in self.sleep.call_args_list]
+
+    def test_retries_quota_errors_with_exponential_backoff(self):
+        self.backend.fail("batch_update", 429, times=2)
+        self.worksheet.batch_update([{"range": "A1:B1", "values": [["a", "b"]]}])
+
+        self.assertEqual(self.backend.calls["batch_update"], 3)
+        self.assertEqual(self.sleeps(), [1.0, 2.0])
+        stats = self.scheduler.stats()
+        self.assertEqual((stats["calls"], stats["retries"], stats["failures"]), (3, 2, 0))
+        self.assertEqual(stats["throttled_seconds"], 3.0)
+
+    def test_gives_up_after_max_retries(self):
+        self.backend.fail("batch_update", 503)
+        with self.assertRaises(gspread.exceptions.APIError):
+            self.worksheet.batch_update([{"range": "A1", "values": [["a"]]}])
+
+        self.assertEqual(self.backend.calls["batch_update"], 4)
+        # Capped at backoff_max
+        self.assertEqual(self.sleeps(), [1.0, 2.0, 3.0])
+        self.assertEqual(self.scheduler.stats()["failures"], 1)
+
+    def test_does_not_retry_client_errors(self):
+        self.backend.fail("batch_update", 400)
+        with self.assertRaises(gspread.exceptions.APIError):
+            self.worksheet.batch_update([{"range": "A1", "values": [["a"]]}])
+        self.assertEqual(self.backend.calls["batch_update"], 1)
+        self.assertEqual(self.sleeps(), [])
+
+    def test_appends_are_only_retried_on_quota_errors(self):
+        self.backend.fail("append_rows", 503, times=1)
+        with self.assertRaises(gspread.exceptions.APIError):
+            self.worksheet.append_rows([["MAWB0001"]])
+        self.assertEqual(self.backend.calls["append_rows"], 1)
+        self.assertEqual(self.scheduler.stats()["retries"], 0)
+
+        self.backend.fail("append_rows", 429, times=1)
+        self.worksheet.append_rows([["MAWB0002"]])
+        self.assertEqual(self.backend.calls["append_rows"], 3)
+        self.assertEqual(self.worksheet.get_all_values(), [["MAWB0002"]])
@@ -0,0 +1,73 @@
+import threading
+from unittest import mock
+
+from django.test import SimpleTestCase
+
+from ..suggestions import MawbIndex, get_mawb_index, mawb_index
+
+
+class MawbIndexTests(SimpleTestCase):
+    def test_ranks_prefix_matches_first(self):
+        index = MawbIndex()
+        index.load(["X-A12", "A12-1", "B-A1", "a13"])
+        self.assertEqual(index.search("a1"), ["A12-1", "a13", "B-A1", "X-A12"])
+        self.assertEqual(index.search("a1", limit=1), ["A12-1"])
+
+    def test_writes_do_not_change_a_list_being_searched(self):
+        index = MawbIndex()
+        index.load(["A1", "A3"])
+        keys = index._keys
+        index.add("A2")
+        index.add_many(["A0", "A4"])
+        index.remove("A3")
+        self.assertEqual([mawb for _, mawb in keys], ["A1", "A3"])
+        self.assertEqual(index.search("A"), ["A0", "A1", "A2", "A4"])
+
+
+class GetMawbIndexTests(SimpleTestCase):
+    def setUp(self):
+        mawb_index.load(["OLD1"])
+        # Older than max_age
+        mawb_index._loaded_at -= mawb_index.max_age + 1
+        self.addCleanup(self.forget_index)
+
+    def forget_index(self):
+        mawb_index.load([])
+        mawb_index._loaded_at = None
+
+    def test_reloads_on_one_thread_while_others_search_the_previous_contents(self):
+        started, release = threading.Event(), threading.Event()
+
+        def slow_load():
+            started.set()
+            release.wait(5)
+            return {"NEW1"}
+
+        with mock.patch("merlinapp.suggestions.current_mawbs", side_effect=slow_load) as load:
+            reloader = threading.Thread(target=get_mawb_index)
+            reloader.start()
+            self.assertTrue(started.wait(5))
+            # Does not wait for the reload, nor start another one
+            self.assertEqual(get_mawb_index().search("O"), ["OLD1"])
+            release.set()
+            reloader.join(5)
+
+        self.assertEqual(load.call_count, 1)
+        self.assertEqual(get_mawb_index().search("N"), ["NEW1"])
+
+    def test_reload_keeps_a_newer_load(self):
+        def load_meanwhile():
+            mawb_index.load(["NEW1"])
+            return {"OLD2"}
+
+        self.assertFalse(mawb_index.reload(load_meanwhile))
+        self.assertEqual(mawb_index.search("1"), ["NEW1"])
+
+    def test_reload_keeps_mawbs_added_meanwhile(self):
+        def add_meanwhile():
+            mawb_index.add("NEW2")
+            return {"NEW1"}
+
+        self.assertTrue(mawb_index.reload(add_meanwhile))
+        self.assertEqual(mawb_index.search("N"), ["NEW1", "NEW2"])
+        self.assertFalse(mawb_index.is_stale())
@@ -0,0 +1,60 @@
+from django.test import TestCase
+
+from ..models import FlightRecord, FlightSummary
+
+
+class FlightSummaryTests(TestCase):
+    def setUp(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            for i in range(3):
+                FlightRecord.objects.create(mawb=f"MAWB000{i}", flight_number="BA100", pcs_awb=10)
+            FlightRecord.objects.create(mawb="MAWB0009", flight_number="BA200", pcs_awb=5)
+
+    def totals(self, flight_number):
+        summary = FlightSummary.objects.filter(flight_number=flight_number).first()
+        if summary is None:
+            return None
+        return (
+            summary.awb_count, summary.pcs_expected, summary.pcs_received,
+            summary.awbs_received, summary.open_discrepancies, summary.towing_started,
+        )
+
+    def post(self, path, data):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(path, data, content_type="application/json")
+        self.assertEqual(response.status_code, 200, response.content)
+
+    def test_new_records(self):
+        self.assertEqual(self.totals("BA100"), (3, 30, 0, 0, 0, 0))
+        self.assertEqual(self.totals("BA200"), (1, 5, 0, 0, 0, 0))
+
+    def test_updates(self):
+        self.post("/api/update/", {"mawb": "MAWB0000", "pcs_received": 8})
+        self.post("/api/update-bt/", {"mawb": "MAWB0001", "bt_number": "BT1"})
+        self.assertEqual(self.totals("BA100"), (3, 30, 8, 1, 1, 1))
+
+        self.post("/api/update/", {"mawb": "MAWB0000", "pcs_received": 10})
+        self.assertEqual(self.totals("BA100"), (3, 30, 10, 1, 0, 1))
+
+    def test_batch_updates(self):
+        self.post("/api/batch-update/", {"records": [
+            {"mawb": "MAWB0000", "pcs_received": 10},
+            {"mawb": "MAWB0001", "pcs_received": 7},
+            {"mawb": "MAWB0009", "pcs_received": 4},
+        ]})
+        self.assertEqual(self.totals("BA100"), (3, 30, 17, 2, 1, 0))
+        self.assertEqual(self.totals("BA200"), (1, 5, 4, 1, 1, 0))
+
+    def test_moves_and_deletes(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            record = FlightRecord.objects.get(mawb="MAWB0000")
+            record.flight_number = "BA200"
+            record.save()
+        self.assertEqual(self.totals("BA100"), (2, 20, 0, 0, 0, 0))
+        self.assertEqual(self.totals("BA200"), (2, 15, 0, 0, 0, 0))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            FlightRecord.objects.get(mawb="MAWB0009").delete()
+            FlightRecord.objects.filter(mawb="MAWB0000").first().delete()
+        self.assertIsNone(self.totals("BA200"))
+        self.assertEqual(self.totals("BA100"), (2, 20, 0, 0, 0, 0))
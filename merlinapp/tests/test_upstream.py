@@ -0,0 +1,65 @@
+from unittest import mock
+
+from ..models import FlightRecord, SheetSyncEntry
+from ..outbox import drain_sheet_outbox
+from ..upstream import ingest_flights
+from .base import FakeSheetsTestCase
+
+
+def feed_items(pcs_awb):
+    """(RedWatch flights, SmartKargo AWBs) for MAWBs UP001.. with the given pieces."""
+    flights = [
+        {"flight_number": f"RW{i}", "scheduled_arrival_time": "2026-10-18T10:00:00"}
+        for i in range(len(pcs_awb))
+    ]
+    awbs = [
+        {
+            "mawb": f"UP{i:03d}", "actual_arrival_time": "2026-10-18T10:30:00", "flight_origin": "JFK",
+            "flight_destination": "LHR", "pcs_awb": pcs, "gross_weight": 1500.5, "commodity_type": "Pharma",
+        }
+        for i, pcs in enumerate(pcs_awb, start=1)
+    ]
+    return flights, awbs
+
+
+class IngestFlightsTests(FakeSheetsTestCase):
+    def ingest(self, *pcs_awb):
+        with mock.patch("merlinapp.upstream.fetch_feeds", return_value=feed_items(pcs_awb)):
+            return ingest_flights(len(pcs_awb))
+
+    def pending_mawbs(self):
+        return sorted(SheetSyncEntry.objects.filter(processed_at__isnull=True).values_list("mawb", flat=True))
+
+    def test_creates_new_flights_and_queues_their_rows(self):
+        self.assertEqual(self.ingest(100, 200), (2, 0))
+
+        record = FlightRecord.objects.get(mawb="UP001")
+        self.assertEqual((record.flight_number, record.pcs_awb, record.gross_weight), ("RW0", 100, 1500.5))
+        self.assertEqual(self.pending_mawbs(), ["UP001", "UP002"])
+        drain_sheet_outbox()
+        self.assertEqual(sorted(self.sheet_rows()), ["UP001", "UP002"])
+
+    def test_only_changed_flights_are_updated_and_queued(self):
+        self.ingest(100, 200)
+        SheetSyncEntry.objects.all().delete()
+        FlightRecord.objects.filter(mawb__in=["UP001", "UP002"]).update(pcs_received=100)
+
+        self.assertEqual(self.ingest(100, 200), (0, 0))
+        self.assertEqual(self.pending_mawbs(), [])
+
+        # The AWB now expects 150 pieces: the 100 received are a discrepancy
+        self.assertEqual(self.ingest(150, 200, 50), (1, 1))
+        self.assertEqual(self.pending_mawbs(), ["UP001", "UP003"])
+        discrepancies = dict(FlightRecord.objects.values_list("mawb", "discrepancy"))
+        self.assertEqual(discrepancies, {"UP001": True, "UP002": False, "UP003": False})
+        self.assertEqual(FlightRecord.objects.get(mawb="UP001").pcs_received, 100)
+
+        # ...and none once the AWB is corrected
+        self.ingest(100)
+        self.assertFalse(FlightRecord.objects.get(mawb="UP001").discrepancy)
+
+    def test_merge_data(self):
+        with mock.patch("merlinapp.upstream.fetch_feeds", return_value=feed_items([10, 20, 30])):
+            response = self.client.post("/api/merge/", {"count": 3}, content_type="application/json")
+        self.assertEqual(response.json(), {"created": 3, "updated": 0})
+        self.assertEqual(self.client.post("/api/merge/", {"count": 0}, content_type="application/json").status_code, 400)
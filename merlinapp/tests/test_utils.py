@@ -0,0 +1,78 @@
+from unittest import mock
+
+from .. import utils
+from ..fake_sheets import get_fake_client
+from ..models import FlightRecord
+from ..utils import (
+    authenticate_google_sheets, highlight_discrepancies, invalidate_google_sheets_cache,
+    populate_sheet_with_dummy_data,
+)
+from .base import FakeSheetsTestCase
+
+
+class HandleSheetsErrorTests(FakeSheetsTestCase):
+    def setUp(self):
+        super().setUp()
+        self.add_sheet_rows(self.create_records(3))
+        self.worksheet = authenticate_google_sheets()
+
+    def test_auth_and_not_found_errors_drop_the_cached_handle(self):
+        for code in (401, 403, 404):
+            with self.subTest(code=code):
+                get_fake_client().backend.fail("get_all_values", code, times=1)
+                self.assertEqual(highlight_discrepancies(self.worksheet), 0)
+                self.assertIsNone(utils._sheets_worksheet)
+                self.assertIsNone(utils._sheets_client)
+                self.worksheet = authenticate_google_sheets()
+
+    def test_other_errors_keep_the_cached_handle(self):
+        get_fake_client().backend.fail("get_all_values", 400, times=1)
+        self.assertEqual(highlight_discrepancies(self.worksheet), 0)
+        self.assertIs(utils._sheets_worksheet, self.worksheet)
+
+
+class SheetsClientCacheTests(FakeSheetsTestCase):
+    def test_worksheet_is_opened_once(self):
+        worksheet = authenticate_google_sheets()
+        self.assertIs(authenticate_google_sheets(), worksheet)
+        self.assertEqual(self.calls()["open_by_key"], 0)
+        self.assertEqual(self.calls()["row_values"], 0)
+
+    def test_invalidate_reopens_the_worksheet(self):
+        worksheet = authenticate_google_sheets()
+        client = utils._sheets_client
+        invalidate_google_sheets_cache()
+        self.assertIsNot(authenticate_google_sheets(), worksheet)
+        self.assertIsNot(utils._sheets_client, client)
+        self.assertEqual(self.calls()["open_by_key"], 1)
+        self.assertEqual(self.calls()["row_values"], 1)
+
+    def test_force_refresh_reopens_the_worksheet(self):
+        worksheet = authenticate_google_sheets()
+        self.assertIsNot(authenticate_google_sheets(force_refresh=True), worksheet)
+        self.assertEqual(self.calls()["open_by_key"], 1)
+
+
+class PopulateSheetTests(FakeSheetsTestCase):
+    @mock.patch("merlinapp.utils.SHEET_APPEND_CHUNK_SIZE", 4)
+    def test_appends_in_chunks_and_creates_matching_records(self):
+        self.assertTrue(populate_sheet_with_dummy_data(10))
+        self.assertEqual(self.calls()["append_rows"], 3)
+        rows = self.sheet_rows()
+        self.assertEqual(len(rows), 10)
+        records = FlightRecord.objects.in_bulk(field_name="mawb")
+        self.assertEqual(set(records), set(rows))
+        for mawb, cells in rows.items():
+            self.assertEqual(records[mawb].flight_number, cells["Flight #"])
+            self.assertEqual(str(records[mawb].pcs_awb), cells["No. of Pcs (AWB)"])
+
+    def test_skips_mawbs_already_in_the_database(self):
+        existing = self.create_records(3)
+        self.assertTrue(populate_sheet_with_dummy_data(5))
+        self.assertFalse({record.mawb for record in existing} & set(self.sheet_rows()))
+        self.assertEqual(FlightRecord.objects.count(), 8)
+
+    def test_sheet_only(self):
+        self.assertTrue(populate_sheet_with_dummy_data(5, create_records=False))
+        self.assertEqual(len(self.sheet_rows()), 5)
+        self.assertFalse(FlightRecord.objects.exists())
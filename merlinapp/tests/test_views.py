@@ -0,0 +1,183 @@
+import csv
+import io
+import json
+from datetime import datetime, timedelta
+from unittest import mock
+
+from django.utils import timezone
+
+from .. import utils
+from ..fake_sheets import get_fake_client
+from ..models import FlightRecord
+from ..outbox import drain_sheet_outbox
+from ..utils import SHEETS_ERROR_MESSAGES
+from .base import FakeSheetsTestCase
+
+
+class SheetWritesTests(FakeSheetsTestCase):
+    """What the update endpoints write to the sheet once the outbox is drained."""
+    def setUp(self):
+        super().setUp()
+        self.records = self.create_records(3)
+        # Rows 3, 4 and 5
+        self.add_sheet_rows(self.records)
+        # Build the row index, as the first drain of a process would
+        drain_sheet_outbox(force=True)
+        self.client.post("/api/update/", {"mawb": "MAWB0002", "pcs_received": 1}, content_type="application/json")
+        drain_sheet_outbox()
+        self.calls().clear()
+
+    def drain(self):
+        """Drains the outbox, returning the ranges of each batch_update call."""
+        with mock.patch.object(self.sheet, "batch_update", wraps=self.sheet.batch_update) as batch_update:
+            drain_sheet_outbox()
+        return [[item["range"] for item in call.args[0]] for call in batch_update.call_args_list]
+
+    def test_update_received_writes_only_the_breakdown_columns(self):
+        response = self.client.post("/api/update/", {
+            "mawb": "MAWB0001", "pcs_received": 90, "checker_id": "C1", "team_name": "Team A",
+        }, content_type="application/json")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.calls(), {})
+
+        self.assertEqual(self.drain(), [["M4:Q4"]])
+        # One read to check the row, one write and the highlighting
+        self.assertEqual(self.calls(), {"batch_get": 1, "batch_update": 1, "batch_format": 1})
+        row = self.sheet_rows()["MAWB0001"]
+        self.assertEqual((row["No. of Pcs (Received)"], row["Checker ID"], row["Discrepancy"]), ("90", "C1", "Yes"))
+
+    def test_update_bt_number_writes_only_the_towing_columns(self):
+        response = self.client.post("/api/update-bt/", {
+            "mawb": "MAWB0001", "bt_number": "BT7", "employee_id": "T1",
+        }, content_type="application/json")
+        self.assertEqual(response.status_code, 200)
+
+        self.assertEqual(self.drain(), [["J4:L4"]])
+        self.assertEqual(self.calls(), {"batch_get": 1, "batch_update": 1})
+        row = self.sheet_rows()["MAWB0001"]
+        self.assertEqual((row["BT Number"], row["Trolley Staff ID"]), ("BT7", "T1"))
+        self.assertTrue(timezone.is_aware(datetime.fromisoformat(row["Timestamp Handover"])))
+
+    def test_batch_update_is_one_write_with_a_result_per_item(self):
+        response = self.client.post("/api/batch-update/", {
+            "records": [
+                {"mawb": "MAWB0000", "pcs_received": 100},
+                {"mawb": "MAWB0001", "pcs_received": "many"},
+                {"mawb": "MISSING", "pcs_received": 1},
+                {"mawb": "MAWB0002", "pcs_received": 99},
+            ],
+            "checker_id": "C1",
+        }, content_type="application/json")
+
+        self.assertEqual(response.json()["results"], [
+            {"mawb": "MAWB0000", "status": "success"},
+            {"mawb": "MAWB0001", "status": "error", "message": "Missing mawb or invalid pcs_received"},
+            {"mawb": "MISSING", "status": "error", "message": "MAWB MISSING not found in records"},
+            {"mawb": "MAWB0002", "status": "success"},
+        ])
+        self.assertEqual(self.drain(), [["M3:Q3", "M5:Q5"]])
+        self.assertEqual(self.calls()["batch_update"], 1)
+        rows = self.sheet_rows()
+        self.assertEqual((rows["MAWB0000"]["Discrepancy"], rows["MAWB0002"]["Discrepancy"]), ("No", "Yes"))
+
+
+class ReadEndpointTests(FakeSheetsTestCase):
+    def setUp(self):
+        super().setUp()
+        self.records = self.create_records(5)
+        FlightRecord.objects.filter(mawb="MAWB0003").update(pcs_received=90, discrepancy=True)
+
+    def age_records(self, minutes=10):
+        """Moves every updated_at back, one second apart, past the sync settle window."""
+        start = timezone.now() - timedelta(minutes=minutes)
+        for i, record in enumerate(FlightRecord.objects.order_by("id")):
+            FlightRecord.objects.filter(id=record.id).update(updated_at=start + timedelta(seconds=i))
+
+    def test_export_csv(self):
+        response = self.client.get("/api/export/", {"flight": "BA103"})
+        rows = list(csv.DictReader(io.StringIO(b"".join(response.streaming_content).decode())))
+        self.assertEqual([(row["mawb"], row["pcs_received"], row["discrepancy"]) for row in rows], [("MAWB0003", "90", "True")])
+
+    def test_export_ndjson_of_open_discrepancies(self):
+        response = self.client.get("/api/export/", {"type": "ndjson", "discrepancy": "true"})
+        lines = [json.loads(line) for line in b"".join(response.streaming_content).decode().splitlines()]
+        self.assertEqual([(line["mawb"], line["pcs_awb"], line["pcs_received"]) for line in lines], [("MAWB0003", 100, 90)])
+
+    def test_cursor_paging_has_no_gaps(self):
+        self.age_records()
+        seen = []
+        page = self.client.get("/api/records/", {"limit": 2, "fields": "mawb"}).json()
+        seen += [record["mawb"] for record in page["results"]]
+        # A record that changes while we page moves to the end instead of being skipped
+        FlightRecord.objects.get(mawb="MAWB0000").save()
+        while page["has_more"]:
+            page = self.client.get("/api/records/", {"limit": 2, "fields": "mawb", "cursor": page["next_cursor"]}).json()
+            seen += [record["mawb"] for record in page["results"]]
+        self.assertEqual(seen, ["MAWB0000", "MAWB0001", "MAWB0002", "MAWB0003", "MAWB0004", "MAWB0000"])
+        # Polling with the last cursor returns nothing new, and the same cursor
+        again = self.client.get("/api/records/", {"cursor": page["next_cursor"]}).json()
+        self.assertEqual((again["results"], again["next_cursor"]), ([], page["next_cursor"]))
+
+    def test_watermark_sync_has_no_gaps(self):
+        self.age_records()
+        snapshot = self.client.get("/api/sync/", {"limit": 2, "fields": "pcs_received"}).json()
+        self.assertTrue(snapshot["reset"])
+        mawbs = [record["mawb"] for record in snapshot["records"]]
+        response = snapshot
+        while response["has_more"]:
+            response = self.client.get("/api/sync/", {"limit": 2, "since": response["watermark"]}).json()
+            self.assertFalse(response["reset"])
+            mawbs += [record["mawb"] for record in response["records"]]
+        self.assertEqual(mawbs, [f"MAWB{i:04d}" for i in range(5)])
+
+        # Changes and deletions after the watermark come with the next sync
+        FlightRecord.objects.filter(mawb="MAWB0001").update(pcs_received=5, updated_at=timezone.now())
+        FlightRecord.objects.get(mawb="MAWB0002").delete()
+        # once they have settled
+        with mock.patch("merlinapp.sync.sync_horizon", return_value=timezone.now() + timedelta(seconds=1)):
+            delta = self.client.get("/api/sync/", {"since": response["watermark"]}).json()
+        self.assertEqual([(record["mawb"], record["pcs_received"]) for record in delta["records"]], [("MAWB0001", 5)])
+        self.assertEqual(delta["deleted"], ["MAWB0002"])
+
+    def test_metrics(self):
+        self.client.get("/api/records/", {"limit": 1})
+        self.client.get("/api/mawb-by-flight/", {"flight": "BA101"})
+        text = self.client.get("/api/metrics/").content.decode()
+
+        self.assertIn('# TYPE merlin_http_request_duration_seconds histogram', text)
+        self.assertIn('merlin_http_request_duration_seconds_count{route="api/records/",method="GET",status="200"}', text)
+        self.assertIn('merlin_http_db_queries_total{route="api/mawb-by-flight/"}', text)
+        self.assertIn('# TYPE merlin_sheets_scheduler_calls_total counter', text)
+        self.assertIn('# TYPE merlin_sheets_scheduler_throttled_seconds_total counter', text)
+        self.assertIn('# TYPE merlin_sheets_scheduler_queue_depth gauge', text)
+        self.assertIn('merlin_sheets_scheduler_max_queue_depth 0', text)
+        self.assertIn('merlin_push_subscribers 0', text)
+
+
+class SheetsErrorTests(FakeSheetsTestCase):
+    """Requests for a MAWB that is only in the sheet, when Google rejects the read."""
+    def setUp(self):
+        super().setUp()
+        self.add_sheet_rows([FlightRecord(mawb="MAWB0001", flight_number="BA100", pcs_awb=10)])
+
+    def test_auth_errors_are_a_clear_503(self):
+        for code, path, data in (
+            (403, "/api/update/", {"mawb": "MAWB0001", "pcs_received": 9}),
+            (401, "/api/update-bt/", {"mawb": "MAWB0001", "bt_number": "BT7"}),
+        ):
+            with self.subTest(path=path):
+                get_fake_client().backend.fail("get_all_values", code, times=1)
+                response = self.client.post(path, data, content_type="application/json")
+                self.assertEqual(response.status_code, 503)
+                self.assertEqual(response.json(), {"error": SHEETS_ERROR_MESSAGES[code]})
+                self.assertIsNone(utils._sheets_worksheet)
+
+        # The next request starts from scratch
+        response = self.client.post("/api/update/", {"mawb": "MAWB0001", "pcs_received": 9}, content_type="application/json")
+        self.assertEqual(response.status_code, 200)
+
+    def test_other_errors_are_still_a_500(self):
+        get_fake_client().backend.fail("get_all_values", 400, times=1)
+        response = self.client.post("/api/update/", {"mawb": "MAWB0001", "pcs_received": 9}, content_type="application/json")
+        self.assertEqual(response.status_code, 500)
+        self.assertIsNotNone(utils._sheets_worksheet)
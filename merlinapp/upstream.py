@@ -0,0 +1,209 @@
+"""
+Upstream flight feeds (RedWatch and SmartKargo) and their ingestion.
+
+Each feed is an adapter with a fetch(count) method returning a list of
+dicts. UPSTREAM_BACKEND selects the implementation:
+'local' generates the data in-process, exactly like the /api/redwatch/
+and /api/smartkargo/ stub views, and 'http' fetches it from
+REDWATCH_FEED_URL / SMARTKARGO_FEED_URL over a pooled session.
+ingest_flights() fetches both feeds concurrently, merges them and upserts
+the flights in bulk, queueing one batched sheet sync.
+"""
+import logging
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from .db import atomic_write
+from .models import FlightRecord
+from .outbox import enqueue_sheet_syncs
+from .push import push_changed_mawbs
+from .sheet_import import AWB_FIELDS, PARSERS, discrepancy_expression
+from .suggestions import mawb_index
+from .summaries import refresh_flight_summaries
+
+logger = logging.getLogger(__name__)
+
+REDWATCH_FIELDS = ["flight_number", "scheduled_arrival_time"]
+SMARTKARGO_FIELDS = [
+    "actual_arrival_time", "mawb", "flight_origin", "flight_destination",
+    "pcs_awb", "gross_weight", "commodity_type",
+]
+
+
+def random_flight_number():
+    # generate a random flight number based on current time (STA simulation)
+    base = datetime.now().strftime('%H%M')
+    return f"RW{base}{random.randint(100, 999)}"
+
+
+def dummy_redwatch_flight():
+    """One random RedWatch flight, as served by the redwatch_api stub."""
+    return {
+        "flight_number": random_flight_number(),
+        "scheduled_arrival_time": (datetime.now() + timedelta(minutes=random.randint(30,120))).isoformat()
+    }
+
+
+def dummy_smartkargo_awb():
+    """One random SmartKargo AWB, as served by the smartkargo_api stub."""
+    now = datetime.now()
+    return {
+        "actual_arrival_time": (now + timedelta(minutes=random.randint(20,100))).isoformat(),
+        "mawb": f"MAWB{random.randint(1000, 9999)}",
+        "flight_origin": random.choice(["JFK", "LAX", "ORD", "ATL"]),
+        "flight_destination": random.choice(["LHR", "CDG", "FRA", "DXB"]),
+        "pcs_awb": random.randint(50, 300),
+        "gross_weight": round(random.uniform(1000.0, 5000.0), 2),
+        "commodity_type": random.choice(["Electronics", "Clothing", "Automobile", "Pharma"]),
+    }
+
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session():
+    """
+    Returns the process-wide requests session. Its connection pool is sized
+    for UPSTREAM_POOL_SIZE concurrent requests per host, and idempotent GETs
+    are retried on connection errors and 5xx responses.
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            pool_size = getattr(settings, 'UPSTREAM_POOL_SIZE', 10)
+            retries = Retry(total=2, backoff_factor=0.2, status_forcelist=[502, 503, 504], allowed_methods=["GET"])
+            adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retries)
+            session = requests.Session()
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            _session = session
+        return _session
+
+
+class LocalFeed:
+    """Generates feed items in-process; stands in for a feed with no server."""
+    def __init__(self, name, generate):
+        self.name = name
+        self.generate = generate
+
+    def fetch(self, count):
+        return [self.generate() for _ in range(count)]
+
+
+class HttpFeed:
+    """Fetches `count` items from a feed URL that accepts ?count=."""
+    def __init__(self, name, url):
+        self.name = name
+        self.url = url
+
+    def fetch(self, count):
+        response = get_session().get(
+            self.url,
+            params={"count": count},
+            timeout=getattr(settings, 'UPSTREAM_TIMEOUT', (3.05, 10)),
+        )
+        response.raise_for_status()
+        data = response.json()
+        # A feed without ?count= support returns a single item
+        return data if isinstance(data, list) else [data]
+
+
+def get_feeds():
+    """Returns the (RedWatch, SmartKargo) adapters selected by UPSTREAM_BACKEND."""
+    if getattr(settings, 'UPSTREAM_BACKEND', 'local') == 'http':
+        return (
+            HttpFeed("RedWatch", settings.REDWATCH_FEED_URL),
+            HttpFeed("SmartKargo", settings.SMARTKARGO_FEED_URL),
+        )
+    return (
+        LocalFeed("RedWatch", dummy_redwatch_flight),
+        LocalFeed("SmartKargo", dummy_smartkargo_awb),
+    )
+
+
+def fetch_feeds(count):
+    """Fetches `count` items from both feeds concurrently."""
+    redwatch, smartkargo = get_feeds()
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        rw_future = executor.submit(redwatch.fetch, count)
+        sk_future = executor.submit(smartkargo.fetch, count)
+        return rw_future.result(), sk_future.result()
+
+
+def merge_feeds(flights, awbs):
+    """
+    Pairs RedWatch flights with SmartKargo AWBs in order and parses each
+    field into a FlightRecord value. Later duplicates of a MAWB win.
+    """
+    merged = {}
+    for flight, awb in zip(flights, awbs):
+        mawb = awb.get("mawb")
+        if not mawb:
+            continue
+        merged[mawb] = {
+            field: PARSERS[field](source.get(field))
+            for source, fields in ((flight, REDWATCH_FIELDS), (awb, SMARTKARGO_FIELDS))
+            for field in fields
+            if field != "mawb"
+        }
+    return merged
+
+
+def ingest_flights(count=None, batch_size=500):
+    """
+    Fetches `count` flights (default UPSTREAM_FLIGHTS_PER_POLL) from both
+    feeds and upserts the ones that are new or whose AWB information
+    changed into FlightRecord, keyed on MAWB, queueing sheet syncs for
+    them, all in one transaction. Returns (created, updated).
+    """
+    if count is None:
+        count = getattr(settings, 'UPSTREAM_FLIGHTS_PER_POLL', 100)
+    flights, awbs = fetch_feeds(count)
+    merged = merge_feeds(flights, awbs)
+    if not merged:
+        return 0, 0
+
+    awb_fields = list(AWB_FIELDS.values())
+    with atomic_write():
+        existing = {
+            record.mawb: record
+            for record in FlightRecord.objects.filter(mawb__in=list(merged)).only('mawb', *awb_fields)
+        }
+        # Feeds repeat flights from poll to poll; leave unchanged ones alone
+        records = [
+            FlightRecord(mawb=mawb, **fields) for mawb, fields in merged.items()
+            if mawb not in existing or any(getattr(existing[mawb], field) != fields[field] for field in awb_fields)
+        ]
+        updated = [record.mawb for record in records if record.mawb in existing]
+        if records:
+            FlightRecord.objects.bulk_create(
+                records,
+                batch_size=batch_size,
+                update_conflicts=True,
+                unique_fields=['mawb'],
+                update_fields=awb_fields + ['updated_at'],
+            )
+            # pcs_awb may have changed under an existing pcs_received
+            if updated:
+                FlightRecord.objects.filter(mawb__in=updated).update(discrepancy=discrepancy_expression())
+            enqueue_sheet_syncs(records)
+            previous_flights = {mawb: record.flight_number for mawb, record in existing.items()}
+            # Refresh the new and the previous flights
+            refresh_flight_summaries(
+                {record.flight_number for record in records} | {previous_flights[mawb] for mawb in updated}
+            )
+            push_changed_mawbs([record.mawb for record in records], previous_flights=previous_flights)
+    # bulk_create does not send post_save
+    mawb_index.add_many(merged)
+
+    created = len(records) - len(updated)
+    logger.info("Ingested %d flights (%d created, %d updated)", len(merged), created, len(updated))
+    return created, len(updated)
@@ -1,8 +1,11 @@
 from django.urls import path
+from . import async_views
 from .views import (
     redwatch_api, smartkargo_api, merge_data, update_received,
-    mawb_suggestions, populate_dummy_data, trolley_login,
-    flight_suggestions, mawb_by_flight, update_bt_number
+    batch_update_received, mawb_suggestions, populate_dummy_data, trolley_login,
+    flight_suggestions, mawb_by_flight, update_bt_number, flight_summary,
+    scan_rate, handover_latency, export_records, list_records, sync_records,
+    metrics
 )
 
 urlpatterns = [
@@ -10,10 +13,25 @@ urlpatterns = [
     path('smartkargo/', smartkargo_api, name='smartkargo_api'),
     path('merge/', merge_data, name='merge_data'),
     path('update/', update_received, name='update_received'),
+    path('batch-update/', batch_update_received, name='batch_update_received'),
     path('mawb-suggestions/', mawb_suggestions, name='mawb_suggestions'),
     path('populate/', populate_dummy_data, name='populate_dummy_data'),
     path('trolley-login/', trolley_login, name='trolley_login'),
     path('flight-suggestions/', flight_suggestions, name='flight_suggestions'),
     path('mawb-by-flight/', mawb_by_flight, name='mawb_by_flight'),
     path('update-bt/', update_bt_number, name='update_bt_number'),
+    path('flight-summary/', flight_summary, name='flight_summary'),
+    path('scan-rate/', scan_rate, name='scan_rate'),
+    path('handover-latency/', handover_latency, name='handover_latency'),
+    path('export/', export_records, name='export_records'),
+    path('records/', list_records, name='list_records'),
+    path('sync/', sync_records, name='sync_records'),
+    path('metrics/', metrics, name='metrics'),
+    # Async variants for ASGI deployments
+    path('async/update/', async_views.update_received, name='async_update_received'),
+    path('async/update-bt/', async_views.update_bt_number, name='async_update_bt_number'),
+    path('async/mawb-suggestions/', async_views.mawb_suggestions, name='async_mawb_suggestions'),
+    path('async/flight-suggestions/', async_views.flight_suggestions, name='async_flight_suggestions'),
+    path('async/mawb-by-flight/', async_views.mawb_by_flight, name='async_mawb_by_flight'),
+    path('async/events/', async_views.record_events, name='async_record_events'),
 ]
@@ -1,9 +1,17 @@
 import os
+import re
 import gspread
 from google.oauth2.service_account import Credentials
+from gspread.utils import rowcol_to_a1
+from django.conf import settings
+from django.utils import timezone
+from .metrics import instrument_sheets_client
+from .sheets_scheduler import scheduled
+from .suggestions import mawb_index
 import random
 from datetime import datetime, timedelta
 import string
+import threading
 import time
 
 # Define the scope and authenticate with Google Sheets
@@ -18,11 +26,134 @@ CREDENTIALS_FILE = "myproject-23c78-40861029cd7b.json"
 SPREADSHEET_ID = '1emelv_ISXeKylC04rlO6givV96bpVsj-4cyE0ek3sLs'
 WORKSHEET_NAME = 'SATS'
 
-# Authenticate and initialize Google Sheets API
-def authenticate_google_sheets():
-    creds = Credentials.from_service_account_file(CREDENTIALS_FILE, scopes=SCOPES)
-    client = gspread.authorize(creds)
+# Title row (row 1) and column headers (row 2) of the worksheet
+SHEET_TITLE_ROW = ["AWB Information", "", "", "", "", "", "", "", "", "Towing", "", "", "Breakdown", "", "", "", ""]
+SHEET_HEADERS = [
+    "Flight #", "Scheduled Arrival Time", "Actual Arrival Time", 
+    "MAWB", "Flight Origin", "Flight Destination", 
+    "No. of Pcs (AWB)", "Gross Weight", "Commodity Type", 
+    "BT Number", "Timestamp Handover", "Trolley Staff ID",
+    "No. of Pcs (Received)", "Discrepancy", "Checker ID", "Team Name", 
+    "Timestamp Breakdown (CPCS)"
+]
+
+# Columns written by each kind of update: the flight feed fills the AWB
+# information, trolley staff the towing columns and checkers the breakdown ones
+SHEET_SECTIONS = {
+    "awb": SHEET_HEADERS[:9],
+    "towing": SHEET_HEADERS[9:12],
+    "breakdown": SHEET_HEADERS[12:],
+}
+
+class SheetColumns:
+    """
+    Header -> column number registry of the worksheet. It is loaded once from
+    the header row when the worksheet is opened, so writes can target exactly
+    the columns they change.
+    """
+    def __init__(self, headers):
+        self.load(headers)
+    
+    def load(self, headers):
+        self.headers = list(headers)
+        self.positions = {header: col for col, header in enumerate(self.headers, start=1) if header}
+        self.last_column = rowcol_to_a1(1, len(self.headers)).rstrip("0123456789")
+    
+    def column(self, header):
+        return self.positions[header]
+    
+    def row_range(self, row_number):
+        """A1 range of a whole row, e.g. 'A5:Q5'."""
+        return f"A{row_number}:{self.last_column}{row_number}"
+    
+    def to_row(self, cells):
+        """Orders a {header: value} dict as a sheet row."""
+        return [cells.get(header, "") for header in self.headers]
+    
+    def to_cells(self, row):
+        """Turns a sheet row into a {header: value} dict."""
+        return {header: row[col - 1] if col <= len(row) else "" for header, col in self.positions.items()}
+    
+    def ranges(self, row_number, cells):
+        """
+        Splits {header: value} into (A1 range, values) pairs, one per run of
+        adjacent columns, so a section update becomes a single range write.
+        """
+        runs = []
+        for col, value in sorted((self.positions[header], value) for header, value in cells.items()):
+            if runs and runs[-1][1] == col - 1:
+                runs[-1][1] = col
+                runs[-1][2].append(value)
+            else:
+                runs.append([col, col, [value]])
+        return [
+            (f"{rowcol_to_a1(row_number, first)}:{rowcol_to_a1(row_number, last)}", [values])
+            for first, last, values in runs
+        ]
+
+sheet_columns = SheetColumns(SHEET_HEADERS)
+
+# Process-wide cache of the authorized client and the validated worksheet.
+# The lock makes sure concurrent requests only authenticate once.
+_sheets_lock = threading.RLock()
+_sheets_client = None
+_sheets_worksheet = None
+
+def write_sheet_headers(worksheet, append=False):
+    """Writes the category title row and the column header row."""
+    if not append:
+        # First clear the existing content of the first two rows to avoid conflicts
+        worksheet.batch_clear(["A1:Q2"])
+    
+    # Add the category headers in row 1
+    worksheet.update('A1:Q1', [SHEET_TITLE_ROW])
     
+    # Merge cells for category headers
+    worksheet.merge_cells('A1:I1')  # AWB Information
+    worksheet.merge_cells('J1:L1')  # Towing
+    worksheet.merge_cells('M1:Q1')  # Breakdown
+    
+    # Format the header row
+    worksheet.format('A1:Q1', {
+        "backgroundColor": {"red": 0.9, "green": 0.9, "blue": 0.9},
+        "horizontalAlignment": "CENTER",
+        "textFormat": {"bold": True, "fontSize": 12}
+    })
+    
+    # Add the column headers in row 2
+    if append:
+        worksheet.append_row(SHEET_HEADERS)
+    else:
+        worksheet.update('A2:Q2', [SHEET_HEADERS])
+    
+    # Format the column headers
+    worksheet.format('A2:Q2', {
+        "backgroundColor": {"red": 0.95, "green": 0.95, "blue": 0.95},
+        "textFormat": {"bold": True}
+    })
+
+def get_sheets_client():
+    """
+    Returns the process-wide gspread client, authorizing it on first use.
+    The client wraps an AuthorizedSession, which refreshes the access token
+    by itself when it expires, so it can be kept for the life of the process.
+    With SHEETS_BACKEND = 'fake' the in-process fake from fake_sheets is used.
+    """
+    global _sheets_client
+    with _sheets_lock:
+        if _sheets_client is None:
+            if getattr(settings, 'SHEETS_BACKEND', 'google') == 'fake':
+                from .fake_sheets import get_fake_client
+                client = get_fake_client()
+            else:
+                creds = Credentials.from_service_account_file(CREDENTIALS_FILE, scopes=SCOPES)
+                client = gspread.authorize(creds)
+            # Every API call made through the client waits for quota and retries when throttled
+            _sheets_client = scheduled(instrument_sheets_client(client))
+        return _sheets_client
+
+def open_worksheet(client):
+    """Opens the worksheet and makes sure its header rows are in place."""
     # Get the spreadsheet
     spreadsheet = client.open_by_key(SPREADSHEET_ID)
     
@@ -30,124 +161,239 @@ def authenticate_google_sheets():
     try:
         worksheet = spreadsheet.worksheet(WORKSHEET_NAME)
         
-        # Check if we need to update the headers for existing worksheet
-        headers = worksheet.row_values(1)
-        # If we need to update headers or we're setting up the first time
-        if "Checker ID" not in headers or "Team Name" not in headers or "Timestamp Breakdown (CPCS)" not in headers or "BT Number" not in headers or "Timestamp Handover" not in headers or "Trolley Staff ID" not in headers:
+        # The column headers live in row 2 (row 1 holds the merged category titles)
+        headers = worksheet.row_values(2)
+        if any(header not in headers for header in SHEET_HEADERS):
             print("Updating headers to add missing columns")
-            
-            # First clear the existing content of the first two rows to avoid conflicts
-            worksheet.batch_clear(["A1:Q2"])
-            
-            # Add the category headers in row 1
-            title_row = ["AWB Information", "", "", "", "", "", "", "", "", "Towing", "", "", "Breakdown", "", "", "", ""]
-            worksheet.update('A1:Q1', [title_row])
-            
-            # Merge cells for category headers
-            worksheet.merge_cells('A1:I1')  # AWB Information
-            worksheet.merge_cells('J1:L1')  # Towing
-            worksheet.merge_cells('M1:Q1')  # Breakdown
-            
-            # Format the header row
-            worksheet.format('A1:Q1', {
-                "backgroundColor": {"red": 0.9, "green": 0.9, "blue": 0.9},
-                "horizontalAlignment": "CENTER",
-                "textFormat": {"bold": True, "fontSize": 12}
-            })
-            
-            # Add the column headers in row 2
-            headers = [
-                "Flight #", "Scheduled Arrival Time", "Actual Arrival Time", 
-                "MAWB", "Flight Origin", "Flight Destination", 
-                "No. of Pcs (AWB)", "Gross Weight", "Commodity Type", 
-                "BT Number", "Timestamp Handover", "Trolley Staff ID",
-                "No. of Pcs (Received)", "Discrepancy", "Checker ID", "Team Name", 
-                "Timestamp Breakdown (CPCS)"
-            ]
-            worksheet.update('A2:Q2', [headers])
-            
-            # Format the column headers
-            worksheet.format('A2:Q2', {
-                "backgroundColor": {"red": 0.95, "green": 0.95, "blue": 0.95},
-                "textFormat": {"bold": True}
-            })
+            write_sheet_headers(worksheet)
+            headers = SHEET_HEADERS
     
     except gspread.exceptions.WorksheetNotFound:
         # Create the worksheet with appropriate headers
         worksheet = spreadsheet.add_worksheet(title=WORKSHEET_NAME, rows=1000, cols=17)
-        
-        # Add the category headers in row 1
-        title_row = ["AWB Information", "", "", "", "", "", "", "", "", "Towing", "", "", "Breakdown", "", "", "", ""]
-        worksheet.update('A1:Q1', [title_row])
-        
-        # Merge cells for category headers
-        worksheet.merge_cells('A1:I1')  # AWB Information
-        worksheet.merge_cells('J1:L1')  # Towing
-        worksheet.merge_cells('M1:Q1')  # Breakdown
-        
-        # Format the header row
-        worksheet.format('A1:Q1', {
-            "backgroundColor": {"red": 0.9, "green": 0.9, "blue": 0.9},
-            "horizontalAlignment": "CENTER",
-            "textFormat": {"bold": True, "fontSize": 12}
-        })
-        
-        # Add the column headers in row 2
-        headers = [
-            "Flight #", "Scheduled Arrival Time", "Actual Arrival Time", 
-            "MAWB", "Flight Origin", "Flight Destination", 
-            "No. of Pcs (AWB)", "Gross Weight", "Commodity Type", 
-            "BT Number", "Timestamp Handover", "Trolley Staff ID",
-            "No. of Pcs (Received)", "Discrepancy", "Checker ID", "Team Name", 
-            "Timestamp Breakdown (CPCS)"
-        ]
-        worksheet.append_row(headers)
-        
-        # Format the column headers
-        worksheet.format('A2:Q2', {
-            "backgroundColor": {"red": 0.95, "green": 0.95, "blue": 0.95},
-            "textFormat": {"bold": True}
-        })
-        
+        write_sheet_headers(worksheet, append=True)
+        headers = SHEET_HEADERS
         print(f"Created new worksheet: {WORKSHEET_NAME}")
     
+    sheet_columns.load(headers)
     return worksheet
 
-def check_discrepancy(pcs_awb, pcs_received):
-    """Returns 'Yes' if there's a discrepancy, otherwise 'No'."""
-    return "Yes" if pcs_awb is not None and pcs_received is not None and pcs_awb != pcs_received else "No"
+# Authenticate and initialize Google Sheets API
+def authenticate_google_sheets(force_refresh=False):
+    """
+    Returns the worksheet where records are stored.
+    Authentication and the header check only happen on the first call in
+    this process (or after invalidate_google_sheets_cache()); every other
+    call returns the cached handle without any network round-trip.
+    """
+    global _sheets_worksheet
+    worksheet = _sheets_worksheet
+    if worksheet is not None and not force_refresh:
+        return worksheet
+    
+    with _sheets_lock:
+        if force_refresh:
+            invalidate_google_sheets_cache()
+        if _sheets_worksheet is None:
+            _sheets_worksheet = open_worksheet(get_sheets_client())
+        return _sheets_worksheet
+
+def invalidate_google_sheets_cache():
+    """Drops the cached client and worksheet so the next call re-authenticates."""
+    global _sheets_client, _sheets_worksheet
+    with _sheets_lock:
+        _sheets_client = None
+        _sheets_worksheet = None
+    sheet_row_index.invalidate()
 
-def update_google_sheet(record, checker_id=None, team_name=None, bt_number=None, timestamp_start=None, trolley_staff_id=None):
+# What API clients are told when Google rejects our credentials or the sheet is gone
+SHEETS_ERROR_MESSAGES = {
+    401: "Google Sheets rejected the service account credentials",
+    403: "The service account has no access to the Google Sheet",
+    404: "The Google Sheet was not found",
+}
+
+def handle_sheets_error(e):
     """
-    Updates the Google Sheet with the latest FlightRecord data.
-    If the record (identified by its MAWB) exists, update its row.
-    Otherwise, append a new row.
+    Invalidates the cached handle when Google rejects our credentials or
+    the worksheet is gone, so the next request starts from scratch.
+    Returns the message to give API clients for such an error, or None.
     """
-    # Get worksheet (authenticate if needed)
-    try:
-        worksheet = authenticate_google_sheets()
-    except Exception as e:
-        print(f"Error authenticating with Google Sheets: {e}")
-        return
+    if isinstance(e, gspread.exceptions.APIError) and getattr(e, 'code', None) in SHEETS_ERROR_MESSAGES:
+        print(f"Invalidating cached Google Sheets client after error: {e}")
+        invalidate_google_sheets_cache()
+        return SHEETS_ERROR_MESSAGES[e.code]
+    return None
+
+# Maximum number of rows sent in a single append_rows call
+SHEET_APPEND_CHUNK_SIZE = 1000
+
+# Data rows start below the title row and the column header row
+FIRST_DATA_ROW = 3
+
+def pad_row(values):
+    """Pads a row read from the sheet (trailing empty cells are omitted) to the full width."""
+    return list(values) + [""] * (len(sheet_columns.headers) - len(values))
+
+class SheetRowIndex:
+    """
+    Process-wide MAWB -> (row number, row values) index of the worksheet.
+    It is built from one full read, kept current as we write rows, and
+    revalidated by fetching only the MAWB column when a lookup misses or
+    the index is older than max_age seconds.
+    """
+    def __init__(self, max_age=300):
+        self.max_age = max_age
+        self._lock = threading.RLock()
+        self._rows = None  # MAWB -> row number
+        self._values = {}  # MAWB -> list of cell values (None if unknown)
+        self._checked_at = 0
     
-    # Determine discrepancy
-    discrepancy = check_discrepancy(record.pcs_awb, record.pcs_received)
-    record.discrepancy = (discrepancy == "Yes")
-    record.save()
+    def _build(self, worksheet):
+        self.load(worksheet.get_all_values())
+    
+    def load(self, data):
+        """Rebuilds the index from a full read of the sheet (get_all_values())."""
+        rows, values = {}, {}
+        mawb_column = sheet_columns.column("MAWB")
+        for row_number, row in enumerate(data[FIRST_DATA_ROW - 1:], start=FIRST_DATA_ROW):
+            mawb = row[mawb_column - 1] if len(row) >= mawb_column else ""
+            if mawb:
+                rows[mawb] = row_number
+                values[mawb] = pad_row(row)
+        with self._lock:
+            self._rows, self._values = rows, values
+            self._checked_at = time.monotonic()
+        mawb_index.add_many(rows)
+    
+    def _revalidate(self, worksheet):
+        column = worksheet.col_values(sheet_columns.column("MAWB"))
+        rows = {}
+        for row_number, mawb in enumerate(column[FIRST_DATA_ROW - 1:], start=FIRST_DATA_ROW):
+            if mawb:
+                rows[mawb] = row_number
+        # Keep cached contents only for rows that did not move
+        self._values = {
+            mawb: self._values.get(mawb) if self._rows.get(mawb) == row_number else None
+            for mawb, row_number in rows.items()
+        }
+        self._rows = rows
+        self._checked_at = time.monotonic()
+        mawb_index.add_many(rows)
     
-    # Add current timestamp for completion
-    current_timestamp = datetime.now().isoformat()
+    def lookup_many(self, worksheet, mawbs, with_values=None, verify=False):
+        """
+        Returns {mawb: (row number, row values)} for the given MAWBs that are in the sheet.
+        The index is revalidated at most once, and the contents of rows we have not
+        seen yet are fetched together in one batch_get call. Pass with_values to
+        only fetch contents for those MAWBs; the others may come back with None.
+        With verify, row numbers taken from the index are checked before they are
+        returned: the MAWB cells of those rows are read in the same batch_get call,
+        and if any of them holds another MAWB (the sheet was sorted, or rows were
+        inserted or deleted by hand) the index is revalidated.
+        """
+        with self._lock:
+            if self._rows is None:
+                self._build(worksheet)
+                verify = False
+            elif any(mawb not in self._rows for mawb in mawbs) or time.monotonic() - self._checked_at > self.max_age:
+                self._revalidate(worksheet)
+                verify = False
+            
+            found = self._fetch(worksheet, mawbs, with_values, verify)
+            if found is None:
+                self._revalidate(worksheet)
+                found = self._fetch(worksheet, mawbs, with_values, False)
+            return found
+    
+    def _fetch(self, worksheet, mawbs, with_values, verify):
+        """
+        The lookup_many result from the current index, after reading the missing
+        contents (and with verify, the MAWB cells of the other rows) in one
+        batch_get call. Returns None if verify finds a row that has moved.
+        """
+        found = {mawb: self._rows[mawb] for mawb in mawbs if mawb in self._rows}
+        wanted = found if with_values is None else [mawb for mawb in found if mawb in with_values]
+        missing = [mawb for mawb in wanted if self._values.get(mawb) is None]
+        unchecked = [mawb for mawb in found if mawb not in missing] if verify else []
+        if missing or unchecked:
+            mawb_column = sheet_columns.column("MAWB")
+            value_ranges = worksheet.batch_get(
+                [sheet_columns.row_range(found[mawb]) for mawb in missing]
+                + [rowcol_to_a1(found[mawb], mawb_column) for mawb in unchecked]
+            )
+            rows = [pad_row(value_range[0] if value_range else []) for value_range in value_ranges[:len(missing)]]
+            cells = [value_range[0][0] if value_range and value_range[0] else "" for value_range in value_ranges[len(missing):]]
+            if verify and (
+                any(row[mawb_column - 1] != mawb for mawb, row in zip(missing, rows))
+                or any(cell != mawb for mawb, cell in zip(unchecked, cells))
+            ):
+                return None
+            for mawb, row in zip(missing, rows):
+                self._values[mawb] = row
+        return {mawb: (row_number, self._values.get(mawb)) for mawb, row_number in found.items()}
+    
+    def lookup(self, worksheet, mawb):
+        """Returns (row number, row values) for a MAWB, or (None, None) if it is not in the sheet."""
+        return self.lookup_many(worksheet, [mawb]).get(mawb, (None, None))
+    
+    def store(self, mawb, row_number, values):
+        """Records the row we just wrote for a MAWB."""
+        with self._lock:
+            if self._rows is None:
+                return
+            self._rows[mawb] = row_number
+            self._values[mawb] = list(values)
     
-    # Get all records from the sheet
+    def known_mawbs(self):
+        """Returns the MAWBs currently in the index, without touching the sheet."""
+        with self._lock:
+            return list(self._rows or ())
+    
+    def store_cells(self, mawb, cells):
+        """Patches the cached values of a row after a partial write."""
+        with self._lock:
+            values = self._values.get(mawb)
+            if values is None:
+                return
+            for header, value in cells.items():
+                values[sheet_columns.column(header) - 1] = value
+    
+    def invalidate(self):
+        """Forgets everything; the next lookup rebuilds from a full read."""
+        with self._lock:
+            self._rows = None
+            self._values = {}
+
+sheet_row_index = SheetRowIndex()
+
+def appended_row_number(response):
+    """Extracts the row number from the response of an append_row() call."""
     try:
-        # Skip the first 2 rows (title and header rows)
-        records = worksheet.get_all_records(head=2)
-    except Exception as e:
-        print("Error fetching records from Google Sheet:", e)
-        records = []
+        updated_range = response["updates"]["updatedRange"]
+        return int(re.search(r"![A-Z]+(\d+)", updated_range).group(1))
+    except (KeyError, TypeError, AttributeError, ValueError):
+        return None
+
+# Row backgrounds used to flag discrepancies
+DISCREPANCY_FORMAT = {"backgroundColor": {"red": 1, "green": 0.8, "blue": 0.8}}
+CLEAR_FORMAT = {"backgroundColor": {"red": 1, "green": 1, "blue": 1}}
+
+def check_discrepancy(pcs_awb, pcs_received):
+    """Returns 'Yes' if there's a discrepancy, otherwise 'No'."""
+    return "Yes" if pcs_awb is not None and pcs_received is not None and pcs_awb != pcs_received else "No"
+
+def build_sheet_cells(record, existing_record=None, checker_id=None, team_name=None, bt_number=None, timestamp_start=None, trolley_staff_id=None, timestamp_breakdown=None):
+    """
+    Builds the {header: value} cells of the full sheet row for a FlightRecord.
+    Towing or breakdown values that are not passed in are preserved from
+    existing_record (the current sheet row as a header -> value dict).
+    """
+    discrepancy = check_discrepancy(record.pcs_awb, record.pcs_received)
+    pcs_received = record.pcs_received
     
-    # Find the existing record in the sheet to preserve data
-    existing_record = next((r for r in records if r.get("MAWB") == record.mawb), None)
+    # Timestamp for completion, taken when the scan was made if we know it
+    current_timestamp = timestamp_breakdown or datetime.now().isoformat()
     
     # If we're updating only piece count (breakdown) information, 
     # preserve existing towing data
@@ -155,127 +401,208 @@ def update_google_sheet(record, checker_id=None, team_name=None, bt_number=None,
         bt_number = existing_record.get("BT Number", "")
         timestamp_start = existing_record.get("Timestamp Handover", "")
         trolley_staff_id = existing_record.get("Trolley Staff ID", "")
-        print(f"Preserving existing towing data: BT={bt_number}, Staff={trolley_staff_id}")
     
     # Similarly, if we're only updating towing info, preserve breakdown data
     if existing_record and not checker_id and not team_name:
-        if not record.pcs_received and existing_record.get("No. of Pcs (Received)"):
+        if not pcs_received and existing_record.get("No. of Pcs (Received)"):
             try:
-                record.pcs_received = int(existing_record.get("No. of Pcs (Received)"))
+                pcs_received = int(existing_record.get("No. of Pcs (Received)"))
             except (ValueError, TypeError):
                 print(f"Warning: Could not parse received pieces: {existing_record.get('No. of Pcs (Received)')}")
         
-        if not checker_id:
-            checker_id = existing_record.get("Checker ID", "")
-        
-        if not team_name:
-            team_name = existing_record.get("Team Name", "")
+        checker_id = existing_record.get("Checker ID", "")
+        team_name = existing_record.get("Team Name", "")
         
         breakdown_timestamp = existing_record.get("Timestamp Breakdown (CPCS)", "")
         if breakdown_timestamp and not record.pcs_received:
             current_timestamp = breakdown_timestamp
     
     # Prepare the row data with all values preserved
-    row_data = [
-        record.flight_number or "",
-        record.scheduled_arrival_time.isoformat() if hasattr(record.scheduled_arrival_time, 'isoformat') else record.scheduled_arrival_time or "",
-        record.actual_arrival_time.isoformat() if hasattr(record.actual_arrival_time, 'isoformat') else record.actual_arrival_time or "",
-        record.mawb,
-        record.flight_origin or "",
-        record.flight_destination or "",
-        str(record.pcs_awb) if record.pcs_awb is not None else "",
-        str(record.gross_weight) if record.gross_weight is not None else "",
-        record.commodity_type or "",
-        bt_number or "",    # BT Number
-        timestamp_start or "", # Timestamp Handover
-        trolley_staff_id or "",  # Trolley Staff ID
-        str(record.pcs_received) if record.pcs_received is not None else "",
-        discrepancy,
-        checker_id or "",
-        team_name or "",
-        current_timestamp if record.pcs_received is not None else "",  # Timestamp Breakdown (CPCS)
-    ]
-    
-    # Find the row where the MAWB matches (add 3 to account for header rows)
-    row_index = next((idx + 3 for idx, row in enumerate(records) if row.get("MAWB") == record.mawb), None)
+    return {
+        "Flight #": record.flight_number or "",
+        "Scheduled Arrival Time": record.scheduled_arrival_time.isoformat() if hasattr(record.scheduled_arrival_time, 'isoformat') else record.scheduled_arrival_time or "",
+        "Actual Arrival Time": record.actual_arrival_time.isoformat() if hasattr(record.actual_arrival_time, 'isoformat') else record.actual_arrival_time or "",
+        "MAWB": record.mawb,
+        "Flight Origin": record.flight_origin or "",
+        "Flight Destination": record.flight_destination or "",
+        "No. of Pcs (AWB)": str(record.pcs_awb) if record.pcs_awb is not None else "",
+        "Gross Weight": str(record.gross_weight) if record.gross_weight is not None else "",
+        "Commodity Type": record.commodity_type or "",
+        "BT Number": bt_number or "",
+        "Timestamp Handover": timestamp_start or "",
+        "Trolley Staff ID": trolley_staff_id or "",
+        "No. of Pcs (Received)": str(pcs_received) if pcs_received is not None else "",
+        "Discrepancy": discrepancy,
+        "Checker ID": checker_id or "",
+        "Team Name": team_name or "",
+        "Timestamp Breakdown (CPCS)": current_timestamp if pcs_received is not None else "",
+    }
 
-    try:
-        if row_index:
-            # Update the existing row
-            worksheet.update(f"A{row_index}:Q{row_index}", [row_data])
-            print(f"Updated row {row_index} for MAWB: {record.mawb}")
-        else:
-            # Append a new row
-            worksheet.append_row(row_data)
-            print(f"Appended new row for MAWB: {record.mawb}")
-        
-        # Reset all formatting first to remove any previous highlights
-        clear_formatting(worksheet, row_index if row_index else worksheet.row_count)
-        
-        # Then apply highlighting for discrepancies if needed
-        highlight_discrepancies(worksheet)
-    except Exception as e:
-        print(f"Error updating Google Sheet: {e}")
+def build_section_cells(record, section, fields):
+    """Builds only the cells of one section ('awb', 'towing' or 'breakdown')."""
+    cells = build_sheet_cells(record, None, **fields)
+    return {header: cells[header] for header in SHEET_SECTIONS[section]}
 
-def clear_formatting(worksheet, row_index):
-    """Clear formatting for a specific row."""
+def sync_records_to_sheet(items):
+    """
+    Writes many FlightRecords to the sheet at once.
+    items is a list of (record, fields, section) triples, where fields holds
+    the keyword arguments of build_sheet_cells. An item with a section only
+    writes that section's columns of an existing row, so it does not need the
+    row's contents and cannot clobber columns owned by other updates; an item
+    without one rewrites the whole row, preserving what it does not set. New
+    MAWBs are always appended as full rows. Later items for the same MAWB
+    build on earlier ones, so each MAWB ends up as a single row write. The
+    target rows are checked (and missing contents read) in one batch_get
+    call, existing rows go out in one batch_update call, new rows in one
+    append_rows call and the highlighting in one batch_format call. Errors
+    are raised to the caller.
+    """
+    worksheet = authenticate_google_sheets()
+    mawbs = {record.mawb for record, _, _ in items}
+    full_row_mawbs = {record.mawb for record, _, section in items if not section}
+    # Section writes no longer carry the MAWB, so make sure the cached row
+    # numbers still point at the right rows before writing to them
+    found = sheet_row_index.lookup_many(worksheet, mawbs, with_values=full_row_mawbs, verify=True)
+    
+    plans = {}  # MAWB -> {"row", "base", "cells", "full"}, in first-seen order
+    for record, fields, section in items:
+        plan = plans.get(record.mawb)
+        if plan is None:
+            row_index, existing_row = found.get(record.mawb, (None, None))
+            plan = plans[record.mawb] = {
+                "row": row_index,
+                "base": sheet_columns.to_cells(existing_row) if existing_row else {},
+                "cells": {},
+                # New rows have to be appended whole
+                "full": row_index is None,
+            }
+        
+        if section and not plan["full"]:
+            plan["cells"].update(build_section_cells(record, section, fields))
+        else:
+            existing_record = {**plan["base"], **plan["cells"]} or None
+            plan["cells"] = build_sheet_cells(record, existing_record, **fields)
+            plan["full"] = True
+    
+    updates = []  # {"range", "values"} for batch_update
+    appends = []  # (MAWB, row values) for append_rows
+    written = {}  # row number -> cells written
+    for mawb, plan in plans.items():
+        if plan["row"] is None:
+            appends.append((mawb, sheet_columns.to_row(plan["cells"])))
+        elif plan["full"]:
+            updates.append({"range": sheet_columns.row_range(plan["row"]), "values": [sheet_columns.to_row(plan["cells"])]})
+        else:
+            updates.extend({"range": range_name, "values": values} for range_name, values in sheet_columns.ranges(plan["row"], plan["cells"]))
+    
     try:
-        worksheet.format(f"A{row_index}:Q{row_index}", {
-            "backgroundColor": {"red": 1, "green": 1, "blue": 1}  # White background
-        })
+        if updates:
+            worksheet.batch_update(updates)
+            for mawb, plan in plans.items():
+                if plan["row"] is None:
+                    continue
+                if plan["full"]:
+                    sheet_row_index.store(mawb, plan["row"], sheet_columns.to_row(plan["cells"]))
+                else:
+                    sheet_row_index.store_cells(mawb, plan["cells"])
+                written[plan["row"]] = plan["cells"]
+        
+        if appends:
+            response = worksheet.append_rows([row_data for _, row_data in appends])
+            first_row = appended_row_number(response)
+            if first_row:
+                for offset, (mawb, row_data) in enumerate(appends):
+                    sheet_row_index.store(mawb, first_row + offset, row_data)
+                    written[first_row + offset] = plans[mawb]["cells"]
+            else:
+                sheet_row_index.invalidate()
     except Exception as e:
-        print(f"Error clearing formatting: {e}")
+        handle_sheets_error(e)
+        sheet_row_index.invalidate()
+        raise
+    
+    # Only the rows we just wrote can have changed colour, and only if their
+    # discrepancy column was written
+    formats = [
+        {"range": sheet_columns.row_range(row_index), "format": DISCREPANCY_FORMAT if cells["Discrepancy"] == "Yes" else CLEAR_FORMAT}
+        for row_index, cells in written.items() if "Discrepancy" in cells
+    ]
+    if formats:
+        try:
+            worksheet.batch_format(formats)
+        except Exception as e:
+            print(f"Error highlighting rows: {e}")
+    
+    print(f"Synced {len(items)} updates to Google Sheet ({len(plans) - len(appends)} rows updated, {len(appends)} appended)")
 
 def highlight_discrepancies(worksheet):
     """
-    Highlights rows where 'No. of Pcs (AWB)' and 'No. of Pcs (Received)' do not match.
-    Removes highlighting from rows where discrepancies have been resolved.
+    Repaints every data row: red where 'No. of Pcs (AWB)' and 'No. of Pcs (Received)'
+    do not match, white everywhere else. Runs of rows with the same colour are
+    merged and sent in a single batch_format call. Regular updates only repaint
+    the row they touch, so this is for occasional maintenance
+    (manage.py repaint_discrepancies). Returns the number of rows painted.
     """
     try:
         data = worksheet.get_all_values()
         if not data or len(data) < 3:  # Need at least header rows plus one data row
-            return
+            return 0
             
         # Get the column header row (row 2)
         header = data[1]  # Index 1 is the second row
-        pcs_awb_col = header.index("No. of Pcs (AWB)") + 1 if "No. of Pcs (AWB)" in header else None
-        pcs_received_col = header.index("No. of Pcs (Received)") + 1 if "No. of Pcs (Received)" in header else None
-        discrepancy_col = header.index("Discrepancy") + 1 if "Discrepancy" in header else None
-        
-        if not pcs_awb_col or not pcs_received_col or not discrepancy_col:
+        if "Discrepancy" not in header:
             print("Missing required columns in spreadsheet")
-            return
-
-        # Define format rules
-        red_background = {
-            "backgroundColor": {"red": 1, "green": 0.8, "blue": 0.8}
-        }
+            return 0
+        discrepancy_col = header.index("Discrepancy")
         
-        white_background = {
-            "backgroundColor": {"red": 1, "green": 1, "blue": 1}
-        }
-
-        # Start from row 3 (skip header rows)
+        # Group consecutive rows with the same colour into one range
+        formats = []
+        run_start, run_flag = None, None
+        last_row = len(data)
         for i, row in enumerate(data[2:], start=3):
-            try:
-                # Check if there's a discrepancy in this row
-                discrepancy = row[discrepancy_col - 1]
-                
-                if discrepancy == "Yes":
-                    # Apply red background for discrepancy
-                    worksheet.format(f"A{i}:Q{i}", red_background)
-                else:
-                    # Remove highlighting for rows without discrepancy
-                    worksheet.format(f"A{i}:Q{i}", white_background)
-            except (ValueError, IndexError) as e:
-                print(f"Error processing row {i}: {e}")
-                continue  # Skip invalid rows
+            flag = len(row) > discrepancy_col and row[discrepancy_col] == "Yes"
+            if flag != run_flag:
+                if run_start is not None:
+                    formats.append((run_start, i - 1, run_flag))
+                run_start, run_flag = i, flag
+        formats.append((run_start, last_row, run_flag))
+        
+        worksheet.batch_format([
+            {"range": f"A{start}:Q{end}", "format": DISCREPANCY_FORMAT if flag else CLEAR_FORMAT}
+            for start, end, flag in formats
+        ])
+        return last_row - 2
     except Exception as e:
         print(f"Error highlighting discrepancies: {e}")
+        handle_sheets_error(e)
+        return 0
+
+def clear_sheet_data(worksheet):
+    """Deletes every data row, keeping the two header rows."""
+    records = worksheet.get_all_values()
+    if len(records) > 2:  # Now we have 2 header rows
+        worksheet.delete_rows(3, len(records))  # Start from row 3
+        print("Cleared existing data from sheet")
+    sheet_row_index.invalidate()
 
-def generate_random_mawb():
+def warm_up_google_sheets():
+    """
+    Authenticates and builds the MAWB row index ahead of the first request.
+    Meant to run in a background thread after startup.
+    """
+    started = time.monotonic()
+    try:
+        worksheet = authenticate_google_sheets()
+        sheet_row_index.lookup_many(worksheet, [])
+        print(f"Google Sheets warm-up finished in {time.monotonic() - started:.2f}s")
+    except Exception as e:
+        print(f"Google Sheets warm-up failed: {e}")
+        handle_sheets_error(e)
+
+def generate_random_mawb(digits=4):
     """Generate a random MAWB number."""
-    return f"MAWB{''.join(random.choices(string.digits, k=4))}"
+    return f"MAWB{''.join(random.choices(string.digits, k=digits))}"
 
 def generate_random_flight_number():
     """Generate a random flight number."""
@@ -302,73 +629,110 @@ def generate_random_commodity():
                   "Documents", "General Cargo"]
     return random.choice(commodities)
 
-def populate_sheet_with_dummy_data(num_records=20):
+def generate_dummy_rows(num_records, exclude=()):
+    """
+    Builds num_records rows of dummy sheet data in memory, with MAWB numbers
+    that are unique among themselves and not in exclude.
+    """
+    # Use more MAWB digits for large batches so unique numbers are easy to find
+    digits = max(4, len(str(num_records * 10)))
+    mawbs = set()
+    while len(mawbs) < num_records:
+        mawb = generate_random_mawb(digits)
+        if mawb not in exclude:
+            mawbs.add(mawb)
+    
+    rows = []
+    for mawb in mawbs:
+        # Generate scheduled and actual arrival times
+        sta = generate_random_date_time()
+        # Actual arrival time is usually close to scheduled
+        ata = datetime.fromisoformat(sta) + timedelta(minutes=random.randint(-60, 120))
+        ata = ata.isoformat()
+        
+        # Generate random AWB pieces but leave received pieces empty
+        pcs_awb = random.randint(1, 100)
+        
+        # Other random data
+        flight_number = generate_random_flight_number()
+        origin = generate_random_location()
+        destination = generate_random_location()
+        while destination == origin:  # Ensure different origin and destination
+            destination = generate_random_location()
+        
+        gross_weight = round(random.uniform(10, 2000), 2)
+        commodity = generate_random_commodity()
+        
+        # Create the row data with updated column order and names
+        rows.append([
+            flight_number,
+            sta,
+            ata,
+            mawb,
+            origin,
+            destination,
+            str(pcs_awb),
+            str(gross_weight),
+            commodity,
+            "",  # Empty "BT Number"
+            "",  # Empty "Timestamp Handover"
+            "",  # Empty "Trolley Staff ID"
+            "",  # Empty "No. of Pcs (Received)"
+            "No",  # No discrepancy since pieces received is empty
+            "",  # Empty "Checker ID"
+            "",  # Empty "Team Name"
+            ""   # Empty "Timestamp Breakdown (CPCS)"
+        ])
+    return rows
+
+def populate_sheet_with_dummy_data(num_records=20, create_records=True):
     """
     Populate the Google Sheet with dummy data.
-    This is useful for testing and demonstration purposes.
+    This is useful for testing, demonstration and load-testing purposes.
+    All rows are built in memory and written with one append_rows call per
+    SHEET_APPEND_CHUNK_SIZE rows; matching FlightRecords are bulk-inserted
+    unless create_records is False.
     """
+    from .models import FlightRecord
+    from .push import push_changed_mawbs
+    from .summaries import refresh_flight_summaries
+    
     try:
         print("Authenticating with Google Sheets...")
         worksheet = authenticate_google_sheets()
         
         print(f"Populating with {num_records} dummy records...")
+        existing = set(FlightRecord.objects.values_list('mawb', flat=True)) if create_records else ()
+        rows = generate_dummy_rows(num_records, exclude=existing)
         
-        for _ in range(num_records):
-            # Generate scheduled and actual arrival times
-            sta = generate_random_date_time()
-            # Actual arrival time is usually close to scheduled
-            ata = datetime.fromisoformat(sta) + timedelta(minutes=random.randint(-60, 120))
-            ata = ata.isoformat()
-            
-            # Generate random AWB pieces but leave received pieces empty
-            pcs_awb = random.randint(1, 100)
-            
-            # Other random data
-            mawb = generate_random_mawb()
-            flight_number = generate_random_flight_number()
-            origin = generate_random_location()
-            destination = generate_random_location()
-            while destination == origin:  # Ensure different origin and destination
-                destination = generate_random_location()
-            
-            gross_weight = round(random.uniform(10, 2000), 2)
-            commodity = generate_random_commodity()
-            
-            # No discrepancy calculation since pieces received is empty
-            discrepancy = "No"
-            
-            # Create the row data with updated column order and names
-            row_data = [
-                flight_number,
-                sta,
-                ata,
-                mawb,
-                origin,
-                destination,
-                str(pcs_awb),
-                str(gross_weight),
-                commodity,
-                "",  # Empty "BT Number"
-                "",  # Empty "Timestamp Handover"
-                "",  # Empty "Trolley Staff ID"
-                "",  # Empty "No. of Pcs (Received)"
-                discrepancy,
-                "",  # Empty "Checker ID"
-                "",  # Empty "Team Name"
-                ""   # Empty "Timestamp Breakdown (CPCS)"
-            ]
-            
-            # Add row to sheet
-            worksheet.append_row(row_data)
-            print(f"Added row with MAWB: {mawb}, Pieces AWB: {pcs_awb}")
-            
-            # Short delay to avoid rate limits
-            time.sleep(0.5)
-            
+        for start in range(0, len(rows), SHEET_APPEND_CHUNK_SIZE):
+            worksheet.append_rows(rows[start:start + SHEET_APPEND_CHUNK_SIZE])
+        sheet_row_index.invalidate()
         print(f"Successfully added {num_records} dummy records to the sheet.")
+        
+        if create_records:
+            FlightRecord.objects.bulk_create([
+                FlightRecord(
+                    flight_number=row[0],
+                    scheduled_arrival_time=timezone.make_aware(datetime.fromisoformat(row[1])),
+                    actual_arrival_time=timezone.make_aware(datetime.fromisoformat(row[2])),
+                    mawb=row[3],
+                    flight_origin=row[4],
+                    flight_destination=row[5],
+                    pcs_awb=int(row[6]),
+                    gross_weight=float(row[7]),
+                    commodity_type=row[8],
+                )
+                for row in rows
+            ], batch_size=500, ignore_conflicts=True)
+            mawb_index.add_many(row[3] for row in rows)
+            refresh_flight_summaries(row[0] for row in rows)
+            push_changed_mawbs(row[3] for row in rows)
+            print(f"Created {num_records} matching flight records.")
         return True
     except Exception as e:
         print(f"Error populating sheet with dummy data: {e}")
+        handle_sheets_error(e)
         import traceback
         traceback.print_exc()
         return False
@@ -1,75 +1,187 @@
-import random
-from datetime import datetime, timedelta
+from datetime import timedelta
+import requests
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
-from .models import FlightRecord
-from .serializers import FlightRecordSerializer
-from .utils import update_google_sheet, authenticate_google_sheets
+from .db import atomic_write
+from .export import CONTENT_TYPES, STREAMS, export_queryset
+from .metrics import render_metrics
+from .models import FlightRecord, ScanEvent
+from .serializers import FlightRecordReadSerializer, FlightRecordSerializer
+from .outbox import enqueue_sheet_sync, enqueue_sheet_syncs
+from .pagination import keyset_page
+from .push import push_records
+from .scans import SCAN_GROUPS, breakdown_event, handover_latencies, scans_per_minute, towing_event
+from .sheet_import import fetch_record_from_sheet
+from .suggestions import get_mawb_index
+from .sync import changes_since
+from .summaries import get_flight_summaries, refresh_flight_summaries
+from .upstream import dummy_redwatch_flight, dummy_smartkargo_awb, ingest_flights
+from .utils import check_discrepancy, handle_sheets_error
 import logging
 
 logger = logging.getLogger(__name__)
 
-def random_flight_number():
-    # generate a random flight number based on current time (STA simulation)
-    base = datetime.now().strftime('%H%M')
-    return f"RW{base}{random.randint(100, 999)}"
+def parse_limit(params, default, maximum):
+    """Reads ?limit= from the query params, clamped to 1..maximum. Raises ValueError if it is not a number."""
+    try:
+        limit = int(params.get('limit', default))
+    except (ValueError, TypeError):
+        raise ValueError("limit must be a number")
+    return min(max(limit, 1), maximum)
+
+def parse_query_datetime(params, param):
+    """Reads an optional ISO datetime query param as an aware datetime. Raises ValueError if it cannot be parsed."""
+    value = params.get(param)
+    if not value:
+        return None
+    parsed = parse_datetime(value)
+    if parsed is None:
+        raise ValueError(f"{param} must be an ISO datetime")
+    return parsed if timezone.is_aware(parsed) else timezone.make_aware(parsed)
+
+def arrival_window_filters(params):
+    """
+    Builds actual arrival time filters from the optional ?arrival_after= and
+    ?arrival_before= ISO datetimes. Raises ValueError if one cannot be parsed.
+    """
+    filters = {}
+    for param, lookup in (('arrival_after', 'actual_arrival_time__gte'), ('arrival_before', 'actual_arrival_time__lt')):
+        value = parse_query_datetime(params, param)
+        if value:
+            filters[lookup] = value
+    return filters
+
+def time_window(params, default_minutes=60, max_hours=24):
+    """
+    Reads the ?start= and ?end= ISO datetimes of an aggregate query; by
+    default the last `default_minutes`. Raises ValueError if they cannot be
+    parsed or span more than `max_hours`.
+    """
+    end = parse_query_datetime(params, 'end') or timezone.now()
+    start = parse_query_datetime(params, 'start') or end - timedelta(minutes=default_minutes)
+    if start >= end:
+        raise ValueError("start must be before end")
+    if end - start > timedelta(hours=max_hours):
+        raise ValueError(f"The window can span at most {max_hours} hours")
+    return start, end
+
+def parse_fields(params):
+    """
+    Reads the optional ?fields=mawb,pcs_received,... of the record list
+    endpoints; all fields when it is absent. Raises ValueError on unknown fields.
+    """
+    if not params.get('fields'):
+        return FlightRecordReadSerializer.FIELDS
+    fields = list(dict.fromkeys(field.strip() for field in params['fields'].split(',') if field.strip()))
+    unknown = set(fields) - set(FlightRecordReadSerializer.FIELDS)
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(sorted(unknown))}")
+    return fields
+
+def feed_count(request):
+    """Reads the optional ?count= of the stub feeds (1..1000); None when it is absent."""
+    if 'count' not in request.query_params:
+        return None
+    try:
+        count = int(request.query_params['count'])
+    except ValueError:
+        raise ValueError("count must be a number")
+    return min(max(count, 1), 1000)
+
+def save_received(record, pcs_received, checker_id, team_name):
+    """
+    Records the pieces received for a MAWB, then saves it, logs the scan and
+    queues the Google Sheet update together. Only the breakdown columns are written,
+    so towing data in the sheet is left alone.
+    """
+    record.pcs_received = pcs_received
+    record.discrepancy = check_discrepancy(record.pcs_awb, record.pcs_received) == "Yes"
+    with atomic_write():
+        record.save()
+        breakdown_event(record, checker_id, team_name).save()
+        enqueue_sheet_sync(
+            record, "breakdown", checker_id=checker_id, team_name=team_name,
+            timestamp_breakdown=timezone.now().isoformat(),
+        )
+
+def save_bt_number(record, bt_number, employee_id):
+    """
+    Records the BT number a trolley guy towed a MAWB with, then saves it,
+    logs the scan and queues the Google Sheet update together. Only the towing columns are
+    written, so breakdown data in the sheet is left alone. Returns the
+    handover timestamp.
+    """
+    record.bt_number = bt_number
+    record.trolley_staff_id = employee_id
+    record.timestamp_start = timezone.now()
+    record.discrepancy = check_discrepancy(record.pcs_awb, record.pcs_received) == "Yes"
+    
+    # Timestamp of the BT number submission
+    timestamp_start = record.timestamp_start.isoformat()
+    with atomic_write():
+        record.save()
+        towing_event(record, employee_id).save()
+        enqueue_sheet_sync(
+            record, "towing", bt_number=bt_number, timestamp_start=timestamp_start,
+            trolley_staff_id=employee_id,
+        )
+    return timestamp_start
 
 @api_view(['GET'])
 def redwatch_api(request):
-    """Dummy API to return a random flight number (RedWatch)."""
-    flight_number = random_flight_number()
-    data = {
-        "flight_number": flight_number,
-        "scheduled_arrival_time": (datetime.now() + timedelta(minutes=random.randint(30,120))).isoformat()
-    }
-    return Response(data)
+    """
+    Dummy API to return a random flight number (RedWatch).
+    With ?count=N it returns a list of N flights.
+    """
+    try:
+        count = feed_count(request)
+    except ValueError as e:
+        return Response({"error": str(e)}, status=400)
+    if count is None:
+        return Response(dummy_redwatch_flight())
+    return Response([dummy_redwatch_flight() for _ in range(count)])
 
 @api_view(['GET'])
 def smartkargo_api(request):
-    """Dummy API to return random flight details (SmartKargo)."""
-    now = datetime.now()
-    data = {
-        "actual_arrival_time": (now + timedelta(minutes=random.randint(20,100))).isoformat(),
-        "mawb": f"MAWB{random.randint(1000, 9999)}",
-        "flight_origin": random.choice(["JFK", "LAX", "ORD", "ATL"]),
-        "flight_destination": random.choice(["LHR", "CDG", "FRA", "DXB"]),
-        "pcs_awb": random.randint(50, 300),
-        "gross_weight": round(random.uniform(1000.0, 5000.0), 2),
-        "commodity_type": random.choice(["Electronics", "Clothing", "Automobile", "Pharma"]),
-    }
-    return Response(data)
+    """
+    Dummy API to return random flight details (SmartKargo).
+    With ?count=N it returns a list of N AWBs.
+    """
+    try:
+        count = feed_count(request)
+    except ValueError as e:
+        return Response({"error": str(e)}, status=400)
+    if count is None:
+        return Response(dummy_smartkargo_awb())
+    return Response([dummy_smartkargo_awb() for _ in range(count)])
 
 @api_view(['POST'])
 def merge_data(request):
     """
-    Calls both dummy APIs, merges their data, saves into the FlightRecord,
-    and updates the real Google Sheet.
-    """
-    # Get RedWatch data
-    rw_response = redwatch_api(request)
-    sk_response = smartkargo_api(request)
-    
-    # Merge data into one record
-    merged_data = {
-        "flight_number": rw_response.data.get("flight_number"),
-        "scheduled_arrival_time": rw_response.data.get("scheduled_arrival_time"),
-        "actual_arrival_time": sk_response.data.get("actual_arrival_time"),
-        "mawb": sk_response.data.get("mawb"),
-        "flight_origin": sk_response.data.get("flight_origin"),
-        "flight_destination": sk_response.data.get("flight_destination"),
-        "pcs_awb": sk_response.data.get("pcs_awb"),
-        "gross_weight": sk_response.data.get("gross_weight"),
-        "commodity_type": sk_response.data.get("commodity_type"),
-        "pcs_received": None,  # to be updated by ground staff
-    }
+    Fetches a batch of flights from RedWatch and SmartKargo, merges them,
+    upserts them into FlightRecord and queues the Google Sheet update.
+    Optional JSON: {"count": <flights to fetch>}, defaulting to
+    UPSTREAM_FLIGHTS_PER_POLL.
+    """
+    count = request.data.get("count")
+    if count is not None:
+        try:
+            count = int(count)
+        except (ValueError, TypeError):
+            return Response({"error": "count must be a number"}, status=400)
+        if count < 1:
+            return Response({"error": "count must be positive"}, status=400)
+    
+    try:
+        created, updated = ingest_flights(count)
+    except requests.RequestException as e:
+        logger.error(f"Upstream feed error: {e}")
+        return Response({"error": f"Upstream feed error: {e}"}, status=502)
     
-    serializer = FlightRecordSerializer(data=merged_data)
-    if serializer.is_valid():
-        record = serializer.save()
-        # Update the Google Sheet with the new record
-        update_google_sheet(record)
-        return Response(serializer.data)
-    return Response(serializer.errors, status=400)
+    return Response({"created": created, "updated": updated})
 
 
 @api_view(['POST'])
@@ -93,88 +205,33 @@ def update_received(request):
     if not mawb or pcs_received is None:
         return Response({"error": "Missing mawb or pcs_received"}, status=400)
     
+    try:
+        pcs_received = int(pcs_received)
+    except (ValueError, TypeError):
+        return Response({"error": "pcs_received must be a number"}, status=400)
+    
     try:
         # First try to find it in the database
         try:
             record = FlightRecord.objects.get(mawb=mawb)
             print(f"Found record in database for MAWB: {mawb}")
         except FlightRecord.DoesNotExist:
-            # If not in database, create a new record from sheet data
+            # If not in database (not imported yet), create a new record from its sheet row
             print(f"Record not found in database, creating new record for MAWB: {mawb}")
-            
-            # Get data from the sheet - specify head=2 to use second row as headers
-            worksheet = authenticate_google_sheets()
-            sheet_records = worksheet.get_all_records(head=2)
-            
-            # Find the record with matching MAWB
-            sheet_record = next((r for r in sheet_records if r.get("MAWB") == mawb), None)
-            
-            if not sheet_record:
+            record = fetch_record_from_sheet(mawb)
+            if record is None:
                 return Response({"error": f"MAWB {mawb} not found in records"}, status=404)
-            
-            # Parse datetime strings if they exist
-            scheduled_arrival = None
-            actual_arrival = None
-            
-            try:
-                if sheet_record.get("Scheduled Arrival Time"):
-                    scheduled_arrival = datetime.fromisoformat(sheet_record.get("Scheduled Arrival Time"))
-            except (ValueError, TypeError):
-                print(f"Warning: Could not parse Scheduled Arrival Time: {sheet_record.get('Scheduled Arrival Time')}")
-                
-            try:
-                if sheet_record.get("Actual Arrival Time"):
-                    actual_arrival = datetime.fromisoformat(sheet_record.get("Actual Arrival Time"))
-            except (ValueError, TypeError):
-                print(f"Warning: Could not parse Actual Arrival Time: {sheet_record.get('Actual Arrival Time')}")
-            
-            # Convert string numbers to integers/floats
-            pcs_awb = None
-            if sheet_record.get("No. of Pcs (AWB)"):
-                try:
-                    pcs_awb = int(sheet_record.get("No. of Pcs (AWB)"))
-                except (ValueError, TypeError):
-                    print(f"Warning: Could not parse AWB pieces: {sheet_record.get('No. of Pcs (AWB)')}")
-            
-            gross_weight = None
-            if sheet_record.get("Gross Weight"):
-                try:
-                    gross_weight = float(sheet_record.get("Gross Weight"))
-                except (ValueError, TypeError):
-                    print(f"Warning: Could not parse Gross Weight: {sheet_record.get('Gross Weight')}")
-            
-            # Create a new database record
-            record = FlightRecord(
-                mawb=mawb,
-                flight_number=sheet_record.get("Flight #"),
-                scheduled_arrival_time=scheduled_arrival,
-                actual_arrival_time=actual_arrival,
-                flight_origin=sheet_record.get("Flight Origin"),
-                flight_destination=sheet_record.get("Flight Destination"),
-                pcs_awb=pcs_awb,
-                gross_weight=gross_weight,
-                commodity_type=sheet_record.get("Commodity Type"),
-            )
         
         # Update the pieces received
-        record.pcs_received = pcs_received
-        record.save()
-        
-        # Update the Google Sheet
-        print(f"Updating Google Sheet for MAWB: {mawb}")
-        
-        # Get BT data from the record
-        bt_number = record.bt_number
-        timestamp_start = record.timestamp_start.isoformat() if record.timestamp_start else None
-        trolley_staff_id = record.trolley_staff_id
-        
-        # Pass all data when updating
-        update_google_sheet(record, checker_id, team_name, bt_number, timestamp_start, trolley_staff_id)
+        save_received(record, pcs_received, checker_id, team_name)
         
         serializer = FlightRecordSerializer(record)
         return Response({"status": "success", "data": serializer.data})
     
     except Exception as e:
+        message = handle_sheets_error(e)
+        if message:
+            return Response({"error": message}, status=503)
         print(f"Error updating record: {e}")
         import traceback
         traceback.print_exc()
@@ -182,21 +239,64 @@ def update_received(request):
 
 @api_view(['POST'])
 def batch_update_received(request):
-    """Update multiple records at once"""
+    """
+    Update multiple records at once, e.g. when a checker closes out a ULD.
+    Expected JSON: {
+        "records": [{"mawb": "<MAWB#>", "pcs_received": <number>}, ...],
+        "checker_id": "<ID>",
+        "team_name": "<Team>"
+    }
+    All records are fetched in one query, saved with one bulk update and
+    queued for the sheet with one insert, in a single transaction.
+    Returns a result per item.
+    """
     records = request.data.get("records", [])
-    results = []
+    checker_id = request.data.get("checker_id", "")
+    team_name = request.data.get("team_name", "")
     
+    if not isinstance(records, list):
+        return Response({"error": "records must be a list"}, status=400)
+    
+    results = []
+    updates = {}  # MAWB -> pcs_received, last one wins
     for record_data in records:
-        mawb = record_data.get("mawb")
-        pcs_received = record_data.get("pcs_received")
-        
+        mawb = record_data.get("mawb") if isinstance(record_data, dict) else None
         try:
-            record = FlightRecord.objects.get(mawb=mawb)
-            record.pcs_received = pcs_received
-            update_google_sheet(record)
-            results.append({"mawb": mawb, "status": "success"})
-        except Exception as e:
-            results.append({"mawb": mawb, "status": "error", "message": str(e)})
+            pcs_received = int(record_data.get("pcs_received"))
+        except (AttributeError, ValueError, TypeError):
+            pcs_received = None
+        if not mawb or pcs_received is None:
+            results.append({"mawb": mawb, "status": "error", "message": "Missing mawb or invalid pcs_received"})
+            continue
+        updates[mawb] = pcs_received
+        results.append({"mawb": mawb, "status": "success"})
+    
+    try:
+        with atomic_write():
+            found = FlightRecord.objects.in_bulk(list(updates), field_name='mawb')
+            now = timezone.now()
+            for mawb, record in found.items():
+                record.pcs_received = updates[mawb]
+                record.discrepancy = check_discrepancy(record.pcs_awb, record.pcs_received) == "Yes"
+                record.updated_at = now  # bulk_update does not apply auto_now
+            FlightRecord.objects.bulk_update(found.values(), ['pcs_received', 'discrepancy', 'updated_at'], batch_size=500)
+            enqueue_sheet_syncs(
+                found.values(), "breakdown", checker_id=checker_id, team_name=team_name,
+                timestamp_breakdown=timezone.now().isoformat(),
+            )
+            ScanEvent.objects.bulk_create([breakdown_event(record, checker_id, team_name) for record in found.values()])
+            # bulk_update sends no post_save
+            refresh_flight_summaries(record.flight_number for record in found.values())
+            push_records(found.values())
+    except Exception as e:
+        print(f"Error updating records in bulk: {e}")
+        import traceback
+        traceback.print_exc()
+        return Response({"error": str(e)}, status=500)
+    
+    for result in results:
+        if result["status"] == "success" and result["mawb"] not in found:
+            result.update(status="error", message=f"MAWB {result['mawb']} not found in records")
     
     return Response({"results": results})
 
@@ -205,36 +305,22 @@ def mawb_suggestions(request):
     """
     Returns a list of MAWB numbers that match the query.
     This endpoint is used for autocomplete suggestions in the frontend.
+    Matches are served from an in-memory index: MAWBs starting with the
+    query come first, then other MAWBs containing it. ?limit= caps the
+    number of results (default 20, max 100).
     """
     query = request.query_params.get('query', '').strip()
-    print(f"Received MAWB suggestion request with query: '{query}'")
     
     if not query:
-        print("Empty query, returning empty list")
         return Response([])
     
     try:
-        print("Attempting to authenticate with Google Sheets...")
-        # Get worksheet
-        worksheet = authenticate_google_sheets()
-        
-        print("Fetching all records from sheet...")
-        # Get all records - specify head=2 to use second row as headers
-        records = worksheet.get_all_records(head=2)
-        print(f"Found {len(records)} records in the sheet")
-        
-        # Extract MAWB numbers
-        mawbs = [record.get('MAWB', '') for record in records if record.get('MAWB')]
-        print(f"Extracted {len(mawbs)} MAWB numbers: {mawbs[:5]}...")
-        
-        # Filter based on query
-        filtered_mawbs = [mawb for mawb in mawbs if query.lower() in mawb.lower()]
-        print(f"Filtered to {len(filtered_mawbs)} matching MAWB numbers: {filtered_mawbs[:5]}...")
-        
-        # Return unique MAWB numbers
-        result = list(set(filtered_mawbs))
-        print(f"Returning {len(result)} unique MAWB numbers")
-        return Response(result)
+        limit = parse_limit(request.query_params, 20, 100)
+    except ValueError as e:
+        return Response({"error": str(e)}, status=400)
+    
+    try:
+        return Response(get_mawb_index().search(query, limit))
     except Exception as e:
         print(f"Error fetching MAWB suggestions: {e}")
         import traceback
@@ -246,25 +332,33 @@ def populate_dummy_data(request):
     """
     Endpoint to clear and repopulate the Google Sheet with dummy data.
     The pieces received field will be left empty for all records.
+    Optional JSON: { "num_records": <number> } (default 20, max 10000)
     """
     try:
-        from .utils import authenticate_google_sheets, populate_sheet_with_dummy_data
+        num_records = int(request.data.get("num_records", 20))
+    except (ValueError, TypeError):
+        return Response({"status": "error", "message": "num_records must be a number"}, status=400)
+    if not 1 <= num_records <= 10000:
+        return Response({"status": "error", "message": "num_records must be between 1 and 10000"}, status=400)
+    
+    try:
+        from .utils import authenticate_google_sheets, clear_sheet_data, populate_sheet_with_dummy_data
         
         # Get worksheet
         worksheet = authenticate_google_sheets()
         
         # Clear existing data (keep headers)
-        records = worksheet.get_all_values()
-        if len(records) > 2:  # Now we have 2 header rows
-            # Clear all rows except headers
-            worksheet.delete_rows(3, len(records))  # Start from row 3
-            print("Cleared existing data from sheet")
+        clear_sheet_data(worksheet)
         
         # Populate with new dummy data
-        populate_sheet_with_dummy_data(num_records=20)  # Generate 20 records
+        if not populate_sheet_with_dummy_data(num_records=num_records):
+            return Response({"status": "error", "message": "Failed to populate sheet"}, status=500)
         
-        return Response({"status": "success", "message": "Sheet populated with dummy data"})
+        return Response({"status": "success", "message": f"Sheet populated with {num_records} dummy records"})
     except Exception as e:
+        message = handle_sheets_error(e)
+        if message:
+            return Response({"status": "error", "message": message}, status=503)
         print(f"Error repopulating sheet: {e}")
         import traceback
         traceback.print_exc()
@@ -308,35 +402,31 @@ def flight_suggestions(request):
     """
     Returns a list of flight numbers that match the query.
     This endpoint is used for autocomplete suggestions in the trolley interface.
+    Flights starting with the query come first, from a range scan of the
+    index. Only when they do not fill the limit are they followed by other
+    flights containing the query, which reads every flight number in the
+    index. Both are in flight number order.
+    Optional: ?limit= (default 20, max 100), ?arrival_after=, ?arrival_before=.
     """
     query = request.query_params.get('query', '').strip()
-    print(f"Received flight suggestion request with query: '{query}'")
     
     if not query:
-        print("Empty query, returning empty list")
         return Response([])
     
     try:
-        print("Attempting to authenticate with Google Sheets...")
-        # Get worksheet
-        worksheet = authenticate_google_sheets()
-        
-        print("Fetching all records from sheet...")
-        # Get all records - specifying we want to use the second row as headers
-        records = worksheet.get_all_records(head=2)
-        print(f"Found {len(records)} records in the sheet")
-        
-        # Extract flight numbers
-        flights = [record.get('Flight #', '') for record in records if record.get('Flight #')]
-        print(f"Extracted {len(flights)} flight numbers")
-        
-        # Filter based on query
-        filtered_flights = [flight for flight in flights if query.lower() in flight.lower()]
-        print(f"Filtered to {len(filtered_flights)} matching flight numbers")
+        limit = parse_limit(request.query_params, 20, 100)
+        window = arrival_window_filters(request.query_params)
+    except ValueError as e:
+        return Response({"error": str(e)}, status=400)
+    
+    try:
+        flights = FlightRecord.objects.filter(**window).order_by('flight_number').values_list('flight_number', flat=True).distinct()
         
-        # Return unique flight numbers
-        result = list(set(filtered_flights))
-        print(f"Returning {len(result)} unique flight numbers")
+        # Flight numbers are upper case, so a prefix is a range on the index
+        prefix = query.upper()
+        result = list(flights.filter(flight_number__gte=prefix, flight_number__lt=prefix + '\uffff')[:limit])
+        if len(result) < limit:
+            result += list(flights.filter(flight_number__icontains=query).exclude(flight_number__in=result)[:limit - len(result)])
         return Response(result)
     except Exception as e:
         print(f"Error fetching flight suggestions: {e}")
@@ -347,34 +437,25 @@ def flight_suggestions(request):
 @api_view(['GET'])
 def mawb_by_flight(request):
     """
-    Returns a list of MAWB numbers for a specific flight.
+    Returns a list of MAWB numbers for a specific flight, in MAWB order.
     This is used when a trolley guy selects a flight and needs to see associated AWBs.
+    Optional: ?limit= (default 500, max 2000), ?arrival_after=, ?arrival_before=.
     """
     flight = request.query_params.get('flight', '').strip()
-    print(f"Received MAWB by flight request with flight: '{flight}'")
     
     if not flight:
-        print("Empty flight parameter, returning empty list")
         return Response([])
     
     try:
-        print("Attempting to authenticate with Google Sheets...")
-        # Get worksheet
-        worksheet = authenticate_google_sheets()
-        
-        print("Fetching all records from sheet...")
-        # Get all records - specify head=2 to use second row as headers
-        records = worksheet.get_all_records(head=2)
-        print(f"Found {len(records)} records in the sheet")
-        
-        # Filter records by flight number
-        flight_records = [r for r in records if r.get('Flight #') == flight]
-        print(f"Found {len(flight_records)} records for flight {flight}")
-        
-        # Extract MAWB numbers
-        mawbs = [record.get('MAWB', '') for record in flight_records if record.get('MAWB')]
-        
-        return Response(mawbs)
+        limit = parse_limit(request.query_params, 500, 2000)
+        window = arrival_window_filters(request.query_params)
+    except ValueError as e:
+        return Response({"error": str(e)}, status=400)
+    
+    try:
+        # Served by the (flight_number, mawb) index
+        mawbs = FlightRecord.objects.filter(flight_number=flight, **window).order_by('mawb').values_list('mawb', flat=True)
+        return Response(list(mawbs[:limit]))
     except Exception as e:
         print(f"Error fetching MAWBs by flight: {e}")
         import traceback
@@ -406,76 +487,15 @@ def update_bt_number(request):
             record = FlightRecord.objects.get(mawb=mawb)
             print(f"Found record in database for MAWB: {mawb}")
         except FlightRecord.DoesNotExist:
-            # If not in database, create a new record from sheet data
+            # If not in database (not imported yet), create a new record from its sheet row
             print(f"Record not found in database, creating new record for MAWB: {mawb}")
-            
-            # Get data from the sheet
-            worksheet = authenticate_google_sheets()
-            sheet_records = worksheet.get_all_records(head=2)
-            
-            # Find the record with matching MAWB
-            sheet_record = next((r for r in sheet_records if r.get("MAWB") == mawb), None)
-            
-            if not sheet_record:
+            record = fetch_record_from_sheet(mawb)
+            if record is None:
                 return Response({"error": f"MAWB {mawb} not found in records"}, status=404)
-            
-            # Parse datetime strings if they exist
-            scheduled_arrival = None
-            actual_arrival = None
-            
-            try:
-                if sheet_record.get("Scheduled Arrival Time"):
-                    scheduled_arrival = datetime.fromisoformat(sheet_record.get("Scheduled Arrival Time"))
-            except (ValueError, TypeError):
-                print(f"Warning: Could not parse Scheduled Arrival Time: {sheet_record.get('Scheduled Arrival Time')}")
-                
-            try:
-                if sheet_record.get("Actual Arrival Time"):
-                    actual_arrival = datetime.fromisoformat(sheet_record.get("Actual Arrival Time"))
-            except (ValueError, TypeError):
-                print(f"Warning: Could not parse Actual Arrival Time: {sheet_record.get('Actual Arrival Time')}")
-            
-            # Convert string numbers to integers/floats
-            pcs_awb = None
-            if sheet_record.get("No. of Pcs (AWB)"):
-                try:
-                    pcs_awb = int(sheet_record.get("No. of Pcs (AWB)"))
-                except (ValueError, TypeError):
-                    print(f"Warning: Could not parse AWB pieces: {sheet_record.get('No. of Pcs (AWB)')}")
-            
-            gross_weight = None
-            if sheet_record.get("Gross Weight"):
-                try:
-                    gross_weight = float(sheet_record.get("Gross Weight"))
-                except (ValueError, TypeError):
-                    print(f"Warning: Could not parse Gross Weight: {sheet_record.get('Gross Weight')}")
-            
-            # Create a new database record
-            record = FlightRecord(
-                mawb=mawb,
-                flight_number=sheet_record.get("Flight #"),
-                scheduled_arrival_time=scheduled_arrival,
-                actual_arrival_time=actual_arrival,
-                flight_origin=sheet_record.get("Flight Origin"),
-                flight_destination=sheet_record.get("Flight Destination"),
-                pcs_awb=pcs_awb,
-                gross_weight=gross_weight,
-                commodity_type=sheet_record.get("Commodity Type"),
-                pcs_received=sheet_record.get("No. of Pcs (Received)") or None,
-            )
         
         # Update the BT number
-        record.bt_number = bt_number
-        record.trolley_staff_id = employee_id
-        record.timestamp_start = datetime.now()
-        record.save()
-        
-        # Generate timestamp for BT number submission
-        timestamp_start = datetime.now().isoformat()
-        
-        # Update the Google Sheet
-        print(f"Updating Google Sheet with BT number for MAWB: {mawb}")
-        update_google_sheet(record, None, None, bt_number, timestamp_start, employee_id)
+        print(f"Queueing Google Sheet update with BT number for MAWB: {mawb}")
+        timestamp_start = save_bt_number(record, bt_number, employee_id)
         
         return Response({
             "status": "success", 
@@ -484,7 +504,173 @@ def update_bt_number(request):
         })
     
     except Exception as e:
+        message = handle_sheets_error(e)
+        if message:
+            return Response({"error": message}, status=503)
         print(f"Error updating BT number: {e}")
         import traceback
         traceback.print_exc()
         return Response({"error": str(e)}, status=500)
+
+@api_view(['GET'])
+def flight_summary(request):
+    """
+    Returns per-flight totals for the supervisor dashboard: AWB count, pieces
+    expected and received, open discrepancies and towing started.
+    ?flight= takes one flight number or up to 100 comma-separated ones; the
+    summaries are served from the cache or the FlightSummary table, so the
+    cost per flight does not depend on the number of AWBs.
+    Unknown flights are left out.
+    """
+    flights = [flight.strip() for flight in request.query_params.get('flight', '').split(',') if flight.strip()]
+    
+    if not flights:
+        return Response({"error": "flight is required"}, status=400)
+    if len(flights) > 100:
+        return Response({"error": "At most 100 flights per request"}, status=400)
+    
+    summaries = get_flight_summaries(flights)
+    return Response([summaries[flight] for flight in dict.fromkeys(flights) if flight in summaries])
+
+@api_view(['GET'])
+def scan_rate(request):
+    """
+    Returns scans per minute in a time window, per team or per checker.
+    Optional: ?start=, ?end= (ISO datetimes; default the last hour, at most
+    24 hours), ?kind=breakdown|towing (default breakdown),
+    ?group_by=team|checker (default team).
+    """
+    kind = request.query_params.get('kind', ScanEvent.BREAKDOWN)
+    group_by = request.query_params.get('group_by', 'team')
+    
+    if kind not in (ScanEvent.BREAKDOWN, ScanEvent.TOWING):
+        return Response({"error": "kind must be breakdown or towing"}, status=400)
+    if group_by not in SCAN_GROUPS:
+        return Response({"error": "group_by must be team or checker"}, status=400)
+    try:
+        start, end = time_window(request.query_params)
+    except ValueError as e:
+        return Response({"error": str(e)}, status=400)
+    
+    return Response({
+        "start": start,
+        "end": end,
+        "rows": list(scans_per_minute(start, end, kind, group_by)),
+    })
+
+@api_view(['GET'])
+def handover_latency(request):
+    """
+    Returns the time from handover (first towing scan) to breakdown (first
+    pieces-received scan) for MAWBs broken down in a time window, longest
+    first. Optional: ?start=, ?end= (default the last hour, at most 24
+    hours), ?flight=, ?limit= (default 100, max 1000).
+    """
+    try:
+        start, end = time_window(request.query_params)
+        limit = parse_limit(request.query_params, 100, 1000)
+    except ValueError as e:
+        return Response({"error": str(e)}, status=400)
+    
+    rows = list(handover_latencies(start, end, request.query_params.get('flight'))[:limit])
+    for row in rows:
+        row["latency"] = row["latency"].total_seconds()
+    return Response({"start": start, "end": end, "rows": rows})
+
+@api_view(['GET'])
+def export_records(request):
+    """
+    Streams FlightRecords for end-of-shift reconciliation.
+    ?type=csv|ndjson (default csv; ?format= is taken by DRF), optional
+    ?flight=, ?arrival_after=, ?arrival_before=, ?discrepancy=true for open
+    discrepancies only. The response is gzipped on the fly when the client
+    accepts it.
+    """
+    export_type = request.query_params.get('type', 'csv')
+    if export_type not in STREAMS:
+        return Response({"error": "type must be csv or ndjson"}, status=400)
+    try:
+        window = arrival_window_filters(request.query_params)
+    except ValueError as e:
+        return Response({"error": str(e)}, status=400)
+    
+    records = export_queryset(
+        flight_number=request.query_params.get('flight', '').strip(),
+        discrepancy_only=request.query_params.get('discrepancy', '').lower() in ('1', 'true', 'yes'),
+        **window,
+    )
+    response = StreamingHttpResponse(STREAMS[export_type](records), content_type=CONTENT_TYPES[export_type])
+    filename = f"flight-records-{timezone.now():%Y%m%d-%H%M}.{export_type}"
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+@api_view(['GET'])
+def list_records(request):
+    """
+    Lists FlightRecords in (updated_at, id) order, one page at a time.
+    Pass the returned next_cursor as ?cursor= to get the following page;
+    polling with the last cursor returns the records changed since.
+    Optional: ?fields=mawb,pcs_received,... (only these columns are read
+    and returned), ?flight=, ?limit= (default 100, max 1000).
+    """
+    try:
+        fields = parse_fields(request.query_params)
+        limit = parse_limit(request.query_params, 100, 1000)
+    except ValueError as e:
+        return Response({"error": str(e)}, status=400)
+    
+    # The cursor needs updated_at and id whatever is returned
+    records = FlightRecord.objects.only('id', 'updated_at', *fields)
+    flight = request.query_params.get('flight', '').strip()
+    if flight:
+        records = records.filter(flight_number=flight)
+    
+    try:
+        page, next_cursor, has_more = keyset_page(records, request.query_params.get('cursor'), limit)
+    except ValueError as e:
+        return Response({"error": str(e)}, status=400)
+    
+    return Response({
+        "results": FlightRecordReadSerializer(page, many=True, fields=fields).data,
+        "next_cursor": next_cursor,
+        "has_more": has_more,
+    })
+
+@api_view(['GET'])
+def sync_records(request):
+    """
+    Delta sync for handhelds that keep a local copy of the records and look
+    MAWBs and flights up locally instead of per keystroke. Pass the
+    watermark of the previous response as ?since=; without it (or when it
+    is too old, "reset": true) the response is a full snapshot. Drop the
+    "deleted" MAWBs, then upsert the "records" by MAWB, and call again at
+    once while has_more is true. Optional: ?fields= (mawb is always
+    included), ?limit= (default 1000, max 5000).
+    """
+    try:
+        since = parse_query_datetime(request.query_params, 'since')
+        fields = parse_fields(request.query_params)
+        limit = parse_limit(request.query_params, 1000, 5000)
+    except ValueError as e:
+        return Response({"error": str(e)}, status=400)
+    # Clients key their copy on the MAWB
+    if 'mawb' not in fields:
+        fields = ['mawb'] + fields
+    
+    changes = changes_since(since, limit, fields)
+    return Response({
+        "records": FlightRecordReadSerializer(changes["records"], many=True, fields=fields).data,
+        "deleted": changes["deleted"],
+        "watermark": FlightRecordReadSerializer.datetime_field.to_representation(changes["watermark"]),
+        "has_more": changes["has_more"],
+        "reset": changes["reset"],
+    })
+
+@api_view(['GET'])
+def metrics(request):
+    """
+    Request latency histograms, database and Sheets usage per route, and the
+    Sheets scheduler and push counters of this process, in Prometheus text
+    format for scraping.
+    """
+    return HttpResponse(render_metrics(), content_type="text/plain; version=0.0.4; charset=utf-8")